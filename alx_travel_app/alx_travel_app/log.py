@@ -0,0 +1,173 @@
+"""
+Non-blocking, structured logging.
+
+Loggers hand records to ``BoundedQueueHandler``, which only puts them on an
+in-memory queue; a ``QueueListener`` thread formats them and does the slow
+I/O (a size- or time-rotated JSON log file, and the console). The queue is
+bounded: when the writer falls behind, new records are dropped and counted
+in ``log_records_dropped_total`` instead of blocking request threads.
+
+Records carry the id of the request that produced them, set by
+``RequestIDMiddleware``.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import weakref
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from .metrics import REGISTRY
+
+request_id_var = ContextVar('request_id', default=None)
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'log_records_dropped_total', 'Log records dropped because the logging queue was full.',
+)
+
+# Attributes every LogRecord has; anything else was passed with ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIDFilter(logging.Filter):
+    """Add the current request id to records as ``request_id``"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records for a background ``QueueListener`` and drop them when the
+    queue is full
+
+    Either pass the target ``handlers`` or let the handler build them from
+    ``filename`` (rotated at ``max_bytes``, or at ``when`` if given, keeping
+    ``backup_count`` files) and ``console``.
+    """
+
+    def __init__(self, handlers=None, filename=None, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 when=None, console=False, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.addFilter(RequestIDFilter())
+        if handlers is None:
+            handlers = self.build_handlers(filename, max_bytes, backup_count, when, console)
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._unreported = 0
+        self._drop_lock = threading.Lock()
+        self.listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+        # The listener thread does not survive fork(); restart it in workers
+        # forked after logging was configured (e.g. gunicorn --preload).
+        ref = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: ref() and ref()._restart_listener())
+
+    @staticmethod
+    def build_handlers(filename, max_bytes, backup_count, when, console):
+        handlers = []
+        if filename:
+            if when:
+                file_handler = logging.handlers.TimedRotatingFileHandler(
+                    filename, when=when, backupCount=backup_count, encoding='utf-8', utc=True,
+                )
+            else:
+                file_handler = logging.handlers.RotatingFileHandler(
+                    filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8',
+                )
+            file_handler.setFormatter(JSONFormatter())
+            handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('%(levelname)s %(asctime)s %(name)s [%(request_id)s] %(message)s'))
+            handlers.append(console_handler)
+        return handlers
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while the arguments are
+        # still current, but keep ``extra`` fields for the JSON formatter.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._unreported:
+            self._report_drops()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+                self._unreported += 1
+            LOG_RECORDS_DROPPED.inc()
+
+    def _report_drops(self):
+        with self._drop_lock:
+            if not self._unreported:
+                return
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f'Dropped {self._unreported} log records: logging queue full',
+                    'dropped': self._unreported, 'request_id': None,
+                }))
+            except queue.Full:
+                return
+            self._unreported = 0
+
+    def _restart_listener(self):
+        self._drop_lock = threading.Lock()
+        self.queue = self.listener.queue = queue.Queue(self.queue_size)
+        self.listener._thread = None
+        self.listener.start()
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+            self.listener.start()
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        super().close()
+
+
+class _Listener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail when stopping with a full queue
+        self.queue.put(self._sentinel)
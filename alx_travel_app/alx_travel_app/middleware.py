@@ -0,0 +1,182 @@
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .log import request_id_var
+from .metrics import REQUEST_DB_DURATION, REQUEST_DB_QUERIES, REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID_RE = re.compile(r'[A-Za-z0-9._:-]{1,128}')
+
+
+class BaseMiddleware:
+    """
+    Middleware that runs natively in both WSGI and ASGI stacks
+
+    Subclasses implement ``before(request)`` and ``after(request, response,
+    state)``; the value returned by ``before`` is passed on as ``state``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.before(request)
+        return self.after(request, self.get_response(request), state)
+
+    async def __acall__(self, request):
+        state = self.before(request)
+        return self.after(request, await self.get_response(request), state)
+
+
+class RequestIDMiddleware(BaseMiddleware):
+    """
+    Tag the request, its log records and its response with a request id
+
+    An ``X-Request-ID`` set by the proxy is reused when it looks sane;
+    otherwise a new id is generated.
+    """
+
+    def before(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID_RE.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        # Left set until request_finished: Django logs 4xx/5xx responses
+        # after the middleware chain has returned.
+        request_id_var.set(request_id)
+
+    def after(self, request, response, state):
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
+@receiver(request_finished)
+def _clear_request_id(sender, **kwargs):
+    request_id_var.set(None)
+
+
+_query_recorder = ContextVar('query_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    Totals query count and time for the current request, grouped by SQL
+
+    Statements are parameterized, so grouping by SQL text folds repeated
+    lookups (an N+1) into one line of the slow-request breakdown.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def record(self, alias, sql, duration):
+        self.count += 1
+        self.duration += duration
+        count, total = self.statements.get((alias, sql), (0, 0.0))
+        self.statements[(alias, sql)] = (count + 1, total + duration)
+
+    def breakdown(self, limit=10):
+        """The ``limit`` statements that took the longest in total"""
+        statements = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {'alias': alias, 'sql': sql[:300], 'count': count, 'duration_ms': round(total * 1000, 1)}
+            for (alias, sql), (count, total) in statements[:limit]
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _query_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(context['connection'].alias, sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection):
+    """
+    Add the recording wrapper to ``connection`` once
+
+    The recorder is found through a context variable rather than installed
+    per request, because under ASGI the ORM runs on executor threads whose
+    connections the middleware cannot reach; context variables follow the
+    request onto those threads.
+    """
+    if _record_query not in connection.execute_wrappers:
+        # Outermost, so temporary execute_wrapper() blocks can pop theirs
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@receiver(connection_created)
+def _install_on_connect(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+class RequestMetricsMiddleware(BaseMiddleware):
+    """
+    Record latency, query count and query time per route, and log requests
+    slower than ``SLOW_REQUEST_THRESHOLD_MS`` with their slowest queries
+
+    Keep it near the top of ``MIDDLEWARE`` so the timing covers the stack.
+    """
+
+    def before(self, request):
+        # Connections opened before this module was imported missed the
+        # connection_created hook
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        queries = QueryRecorder()
+        token = _query_recorder.set(queries)
+        return queries, token, time.perf_counter()
+
+    def after(self, request, response, state):
+        queries, token, start = state
+        duration = time.perf_counter() - start
+        _query_recorder.reset(token)
+
+        # Label by route pattern, not path, to keep the series bounded
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        REQUEST_DURATION.observe(duration, route=route, method=request.method, status=response.status_code)
+        REQUEST_DB_QUERIES.observe(queries.count, route=route, method=request.method)
+        REQUEST_DB_DURATION.observe(queries.duration, route=route, method=request.method)
+
+        threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if threshold and duration * 1000 >= threshold:
+            self.log_slow_request(request, response, duration, queries)
+        return response
+
+    def log_slow_request(self, request, response, duration, queries):
+        breakdown = queries.breakdown()
+        lines = [
+            f"Slow request: {request.method} {request.path} {response.status_code} took {duration * 1000:.1f} ms, "
+            f"{queries.count} queries in {queries.duration * 1000:.1f} ms"
+        ]
+        lines += [f"  {q['count']}x {q['duration_ms']} ms [{q['alias']}] {q['sql']}" for q in breakdown]
+        logger.warning('\n'.join(lines), extra={
+            'duration_ms': round(duration * 1000, 1),
+            'db_queries': queries.count,
+            'db_duration_ms': round(queries.duration * 1000, 1),
+            'queries': breakdown,
+        })
@@ -29,6 +29,30 @@ CHAPA_SECRET_KEY = os.getenv("CHAPA_SECRET_KEY")
 CHAPA_PUBLIC_KEY = os.getenv("CHAPA_PUBLIC_KEY")
 CHAPA_ENCRYPTION_KEY = os.getenv("CHAPA_ENCRYPTION_KEY")
 
+# Chapa gateway client (listings.chapa)
+CHAPA_BASE_URL = os.getenv("CHAPA_BASE_URL", "https://api.chapa.co/v1")
+CHAPA_CONNECT_TIMEOUT = float(os.getenv("CHAPA_CONNECT_TIMEOUT", "3.05"))
+CHAPA_READ_TIMEOUT = float(os.getenv("CHAPA_READ_TIMEOUT", "10"))
+CHAPA_POOL_SIZE = int(os.getenv("CHAPA_POOL_SIZE", "20"))
+# Circuit breaker: open after this many failed calls in a row (0 disables),
+# retry after CHAPA_BREAKER_RESET seconds; calls slower than
+# CHAPA_SLOW_CALL_MS count as failures (0 disables)
+CHAPA_BREAKER_FAILURES = int(os.getenv("CHAPA_BREAKER_FAILURES", "5"))
+CHAPA_BREAKER_RESET = float(os.getenv("CHAPA_BREAKER_RESET", "30"))
+CHAPA_SLOW_CALL_MS = float(os.getenv("CHAPA_SLOW_CALL_MS", "5000"))
+# Outbound calls per second across all workers (0 disables), counted in
+# fixed windows of CHAPA_RATE_BURST calls (listings.resilience)
+CHAPA_RATE_LIMIT = float(os.getenv("CHAPA_RATE_LIMIT", "0"))
+CHAPA_RATE_BURST = int(os.getenv("CHAPA_RATE_BURST", "0")) or None
+# Cache holding the breaker and limiter state; use a shared backend
+# (CACHE_BACKEND) so all worker processes see it
+CHAPA_CACHE_ALIAS = os.getenv("CHAPA_CACHE_ALIAS", "default")
+# Verifies callback signatures when set (listings.webhooks)
+CHAPA_WEBHOOK_SECRET = os.getenv("CHAPA_WEBHOOK_SECRET", "")
+# Serve the payment endpoints with the async views (listings.async_views);
+# use with the ASGI application
+PAYMENT_VIEWS_ASYNC = os.getenv("PAYMENT_VIEWS_ASYNC", "False").lower() == "true"
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -62,6 +86,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "alx_travel_app.middleware.RequestIDMiddleware",
+    "alx_travel_app.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -76,7 +102,7 @@ ROOT_URLCONF = "alx_travel_app.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -94,13 +120,69 @@ WSGI_APPLICATION = "alx_travel_app.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from DATABASE_* variables (SQLite by default). Setting
+# DATABASE_REPLICA_HOST or DATABASE_REPLICA_NAME adds a "replica" alias that
+# inherits the remaining DATABASE_* values; read-only endpoints are routed to
+# it by alx_travel_app.db_routers.
+
+
+def database_config(prefix, base=None):
+    base = base or {}
+    engine = os.getenv(f"{prefix}_ENGINE", base.get("ENGINE", "django.db.backends.sqlite3"))
+    config = {
+        "ENGINE": engine,
+        "NAME": os.getenv(f"{prefix}_NAME", base.get("NAME", BASE_DIR / "db.sqlite3")),
+        "USER": os.getenv(f"{prefix}_USER", base.get("USER", "")),
+        "PASSWORD": os.getenv(f"{prefix}_PASSWORD", base.get("PASSWORD", "")),
+        "HOST": os.getenv(f"{prefix}_HOST", base.get("HOST", "")),
+        "PORT": os.getenv(f"{prefix}_PORT", base.get("PORT", "")),
+        # Persistent connections, re-checked before reuse
+        "CONN_MAX_AGE": int(os.getenv(f"{prefix}_CONN_MAX_AGE", base.get("CONN_MAX_AGE", 60))),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
+    }
+    if os.getenv(f"{prefix}_TEST_NAME"):
+        # Test database name; SQLite's default in-memory one cannot take concurrent writers
+        config["TEST"] = {"NAME": os.getenv(f"{prefix}_TEST_NAME")}
+    if engine.endswith("sqlite3"):
+        config["OPTIONS"]["timeout"] = int(os.getenv(f"{prefix}_TIMEOUT", "20"))
+    elif os.getenv("DATABASE_POOL", "False").lower() == "true":
+        # psycopg connection pool (Django 5.1+, psycopg[pool]); replaces CONN_MAX_AGE
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "20")),
+        }
+    return config
+
+
 DATABASES = {
+    "default": database_config("DATABASE"),
+}
+
+if os.getenv("DATABASE_REPLICA_HOST") or os.getenv("DATABASE_REPLICA_NAME"):
+    DATABASES["replica"] = database_config("DATABASE_REPLICA", base=DATABASES["default"])
+
+DATABASE_ROUTERS = ["alx_travel_app.db_routers.PrimaryReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "alx-travel-app"),
     }
 }
 
+# Cache alias and TTL (seconds) for the payment polling endpoints (listings.cache)
+API_CACHE_ALIAS = os.getenv("API_CACHE_ALIAS", "default")
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "30"))
+
+# How long (seconds) quotes stay memoized; rate changes retire them sooner (listings.pricing)
+QUOTE_CACHE_TTL = int(os.getenv("QUOTE_CACHE_TTL", "3600"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -165,29 +247,49 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@alxtravelapp.com')
 
+# Background tasks (listings.tasks)
+TASK_QUEUE_EAGER = os.getenv('TASK_QUEUE_EAGER', 'False').lower() == 'true'
+TASK_MAX_ATTEMPTS = int(os.getenv('TASK_MAX_ATTEMPTS', '5'))
+TASK_RETRY_BACKOFF = float(os.getenv('TASK_RETRY_BACKOFF', '30'))
+TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', '300'))
+
+# Request metrics (alx_travel_app.metrics); requests slower than this are
+# logged with a query breakdown, 0 disables the slow-request log
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '500'))
+
 # Logging Configuration
+# Records are queued and written by a background thread (alx_travel_app.log):
+# JSON lines to LOG_FILE, rotated at LOG_MAX_BYTES or, if LOG_ROTATE_WHEN is
+# set (e.g. "midnight"), on that schedule. When the queue of LOG_QUEUE_SIZE
+# records is full, new records are dropped and counted.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'django.log',
-        },
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
+        'queue': {
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
+            'class': 'alx_travel_app.log.BoundedQueueHandler',
+            'filename': os.getenv('LOG_FILE', 'django.log'),
+            'max_bytes': int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            'backup_count': int(os.getenv('LOG_BACKUP_COUNT', '5')),
+            'when': os.getenv('LOG_ROTATE_WHEN') or None,
+            'console': os.getenv('LOG_CONSOLE', 'True').lower() == 'true',
+            'queue_size': int(os.getenv('LOG_QUEUE_SIZE', '10000')),
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'listings': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'alx_travel_app': {
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
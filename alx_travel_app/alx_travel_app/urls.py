@@ -18,8 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/', include('listings.urls')),
     path('chapa-webhook', include('django_chapa.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
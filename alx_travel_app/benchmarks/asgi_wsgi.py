@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+Compare the payment endpoints served over WSGI and ASGI
+
+Starts a slow fake Chapa gateway, then for each mode runs the app in a
+server subprocess and drives POST /api/payments/initiate/ from many
+concurrent connections:
+
+  wsgi        sync views on gunicorn (gthread, --threads worker threads)
+  asgi-sync   sync views on uvicorn (Django gives each request a thread)
+  asgi-async  async views (PAYMENT_VIEWS_ASYNC) on uvicorn
+
+With a slow gateway the WSGI throughput is capped near threads / latency.
+Both ASGI modes keep every connection in flight and are instead bound by
+the CPU of their single process; the async views do it without a thread
+per waiting request. Needs gunicorn and uvicorn.
+
+Usage (from the project directory):
+    python -m benchmarks.asgi_wsgi --latency 0.2 --concurrency 64 --requests 640
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import django
+import requests as http
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from listings.fake_chapa import FakeChapaServer
+from listings.models import Booking, Listing
+
+from .booking_load import percentile
+
+User = get_user_model()
+
+MODES = {
+    'wsgi': (False, 'gunicorn'),
+    'asgi-sync': (False, 'uvicorn'),
+    'asgi-async': (True, 'uvicorn'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, threads):
+    if server == 'gunicorn':
+        return [
+            'gunicorn', 'alx_travel_app.wsgi:application', '--bind', f'127.0.0.1:{port}',
+            '--workers', '1', '--worker-class', 'gthread', '--threads', str(threads), '--log-level', 'warning',
+        ]
+    return [
+        'uvicorn', 'alx_travel_app.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', '1', '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def start_server(mode, port, args, gateway, database, log_dir):
+    async_views, server = MODES[mode]
+    env = dict(
+        os.environ,
+        DATABASE_NAME=database,
+        CHAPA_BASE_URL=gateway.url,
+        CHAPA_SECRET_KEY='test',
+        CHAPA_POOL_SIZE=str(args.concurrency),
+        PAYMENT_VIEWS_ASYNC=str(async_views),
+        SLOW_REQUEST_THRESHOLD_MS='0',
+        LOG_CONSOLE='False',
+        LOG_FILE=os.path.join(log_dir, f'{mode}.log'),
+    )
+    process = subprocess.Popen(server_command(server, port, args.threads), cwd=settings.BASE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{server} exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{server} did not start')
+
+
+def drive(port, booking_ids, requests, concurrency):
+    # One keep-alive session per thread. An httpx.AsyncClient this size
+    # spends more time checking its idle connections than sending requests.
+    url = f'http://127.0.0.1:{port}/api/payments/initiate/'
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'session'):
+            local.session = http.Session()
+        start = time.perf_counter()
+        try:
+            status = local.session.post(url, json={'booking_id': booking_ids[i % len(booking_ids)]}, timeout=60).status_code
+        except http.RequestException:
+            status = None
+        return status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(concurrency)))  # warm up
+        start = time.perf_counter()
+        results = list(pool.map(one, range(requests)))
+        return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake gateway latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=64, help='concurrent client connections')
+    parser.add_argument('--requests', type=int, default=640)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn worker threads for the wsgi mode')
+    parser.add_argument('--modes', default=','.join(MODES), help=f'comma-separated subset of {", ".join(MODES)}')
+    args = parser.parse_args()
+
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        sys.exit(f"Unknown modes: {', '.join(sorted(unknown))}")
+    missing = sorted(server for server in {MODES[mode][1] for mode in modes} if shutil.which(server) is None)
+    if missing:
+        sys.exit(f"Install {', '.join(sorted(missing))} to run this benchmark")
+
+    setup_test_environment()
+    # A file-backed test database shared with the server subprocesses
+    connection.settings_dict['TEST']['NAME'] = str(settings.BASE_DIR / 'asgi_wsgi.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    database = connection.settings_dict['NAME']
+    log_dir = tempfile.mkdtemp()
+    try:
+        host = User.objects.create_user(username='benchhost')
+        guest = User.objects.create_user(username='benchguest', email='guest@example.com')
+        listing = Listing.objects.create(host=host, name='Bench', description='', location='Bench', pricepernight=100)
+        booking_ids = [
+            str(Booking.objects.create(
+                property=listing, user=guest, total_amount=100,
+                check_in_date=date(2030, 1, 1) + timedelta(days=2 * i),
+                check_out_date=date(2030, 1, 2) + timedelta(days=2 * i),
+            ).pk)
+            for i in range(20)
+        ]
+        connection.close()
+
+        print(f"{args.requests} x POST /api/payments/initiate/, {args.concurrency} connections, "
+              f"gateway latency {args.latency * 1000:.0f} ms")
+        with FakeChapaServer(latency=args.latency) as gateway:
+            for mode in modes:
+                port = free_port()
+                process = start_server(mode, port, args, gateway, database, log_dir)
+                try:
+                    results, elapsed = drive(port, booking_ids, args.requests, args.concurrency)
+                finally:
+                    process.terminate()
+                    process.wait(10)
+                latencies = [latency * 1000 for _, latency in results]
+                errors = sum(1 for status, _ in results if status != 200)
+                print(f"{mode:>10}: {len(results) / elapsed:8.1f} req/s  p50 {statistics.median(latencies):7.1f} ms  "
+                      f"p99 {percentile(latencies, 99):7.1f} ms  errors {errors}")
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Load test for POST /api/bookings/
+
+Many concurrent clients try to book random, overlapping date ranges on a
+handful of listings. The run uses a throwaway test database, then checks
+that no two active bookings overlap and reports latency percentiles.
+
+Usage (from the project directory):
+    python -m benchmarks.booking_load --clients 32 --attempts 25 --listings 3
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from listings.models import Booking, Listing
+
+User = get_user_model()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_client(user, listing_ids, attempts, horizon, seed):
+    rng = random.Random(seed)
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    results = []
+    try:
+        for _ in range(attempts):
+            check_in = date(2030, 1, 1) + timedelta(days=rng.randrange(horizon))
+            check_out = check_in + timedelta(days=rng.randint(1, 5))
+            start = time.perf_counter()
+            response = client.post('/api/bookings/', {
+                'property': rng.choice(listing_ids),
+                'check_in_date': check_in.isoformat(),
+                'check_out_date': check_out.isoformat(),
+            })
+            results.append((response.status_code, time.perf_counter() - start))
+    finally:
+        connection.close()
+    return results
+
+
+def count_double_bookings():
+    overlapping = Booking.objects.filter(
+        property=OuterRef('property'),
+        status__in=Booking.ACTIVE_STATUSES,
+        check_in_date__lt=OuterRef('check_out_date'),
+        check_out_date__gt=OuterRef('check_in_date'),
+    ).exclude(pk=OuterRef('pk'))
+    return Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES).filter(Exists(overlapping)).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=25, help='booking attempts per client')
+    parser.add_argument('--listings', type=int, default=3)
+    parser.add_argument('--horizon', type=int, default=60, help='days over which check-in dates are spread')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    if connection.vendor == 'sqlite':
+        # A file-backed database so every client thread gets its own connection
+        connection.settings_dict['TEST']['NAME'] = str(settings.BASE_DIR / 'booking_load.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        host = User.objects.create_user(username='loadhost')
+        listing_ids = [
+            str(Listing.objects.create(
+                host=host, name=f'Load {i}', description='', location='Load', pricepernight=100,
+            ).pk)
+            for i in range(args.listings)
+        ]
+        users = [User.objects.create_user(username=f'load{i}') for i in range(args.clients)]
+        connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            futures = [
+                pool.submit(run_client, user, listing_ids, args.attempts, args.horizon, args.seed + i)
+                for i, user in enumerate(users)
+            ]
+            results = [r for f in futures for r in f.result()]
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency * 1000 for _, latency in results]
+        codes = [code for code, _ in results]
+        double_bookings = count_double_bookings()
+
+        print(f"{len(results)} attempts from {args.clients} clients on {args.listings} listings "
+              f"({connection.vendor}) in {elapsed:.2f}s = {len(results) / elapsed:.1f} req/s")
+        print(f"created {codes.count(201)}, conflicts {codes.count(409)}, "
+              f"errors {len(codes) - codes.count(201) - codes.count(409)}")
+        print(f"latency ms: p50 {statistics.median(latencies):.1f}  p90 {percentile(latencies, 90):.1f}  "
+              f"p99 {percentile(latencies, 99):.1f}  max {max(latencies):.1f}")
+        print(f"double bookings: {double_bookings}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    sys.exit(1 if double_bookings else 0)
+
+
+if __name__ == '__main__':
+    main()
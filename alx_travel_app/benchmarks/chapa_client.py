@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark the Chapa client against a local fake gateway
+
+Compares requests per second for:
+  - bare requests.get per call (the original view code, no session)
+  - the pooled ChapaClient shared across worker threads
+  - the AsyncChapaClient driven from a single event loop
+
+Usage (from the project directory):
+    python -m benchmarks.chapa_client --calls 2000 --concurrency 20 --latency 0.005
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+import requests
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+django.setup()
+
+from listings.chapa import AsyncChapaClient, ChapaClient
+from listings.fake_chapa import FakeChapaServer
+
+
+def run_threaded(call, calls, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for response in pool.map(call, range(calls)):
+            assert response.status_code == 200
+    return time.perf_counter() - start
+
+
+def bench_bare_requests(server, calls, concurrency):
+    headers = {'Authorization': 'Bearer test', 'Content-Type': 'application/json'}
+    return run_threaded(
+        lambda i: requests.get(f'{server.url}/transaction/verify/tx_{i}', headers=headers),
+        calls, concurrency,
+    )
+
+
+def bench_pooled_client(server, calls, concurrency):
+    client = ChapaClient(base_url=server.url, secret_key='test', pool_size=concurrency)
+    try:
+        return run_threaded(lambda i: client.verify(f'tx_{i}'), calls, concurrency)
+    finally:
+        client.close()
+
+
+def bench_async_client(server, calls, concurrency):
+    async def main():
+        client = AsyncChapaClient(base_url=server.url, secret_key='test', pool_size=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with semaphore:
+                response = await client.verify(f'tx_{i}')
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+        return elapsed
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.005, help='fake gateway latency in seconds')
+    args = parser.parse_args()
+
+    benches = [
+        ('bare requests (no session)', bench_bare_requests),
+        ('pooled ChapaClient', bench_pooled_client),
+        ('AsyncChapaClient', bench_async_client),
+    ]
+
+    print(f"{args.calls} verify calls, concurrency {args.concurrency}, gateway latency {args.latency * 1000:.1f}ms")
+    print("-" * 60)
+    for label, bench in benches:
+        with FakeChapaServer(latency=args.latency) as server:
+            elapsed = bench(server, args.calls, args.concurrency)
+            connections = server.connections
+        print(f"{label:<30} {args.calls / elapsed:>9.1f} req/s   {connections:>5} connections")
+
+
+if __name__ == '__main__':
+    main()
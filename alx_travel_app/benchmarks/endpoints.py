@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""
+Benchmark the payment endpoints and compare them against a stored baseline
+
+For each scale the run seeds an emptied test database (seed command: the
+scale is the number of bookings, each with a payment), starts a fake Chapa
+gateway and drives these endpoints in-process through the test client:
+
+  initiate  POST /api/payments/initiate/
+  verify    POST /api/payments/verify/ (verification runs inline)
+  callback  POST /api/payments/callback/
+  status    GET  /api/payments/<payment_id>/
+
+Each endpoint gets --rounds rounds of --requests timed requests, keeping
+the fastest round's latency percentiles, throughput and queries per
+request, then a shorter pass under tracemalloc for the peak memory one
+request allocates.
+
+Results are compared with the baseline (benchmarks/baselines/endpoints.json)
+and the exit status is 1 when any endpoint got worse than --tolerance
+allows, or ran more queries. --save-baseline replaces the baseline with
+this run; baselines hold timings, so record them on the machine that
+compares against them.
+
+Usage (from the project directory):
+    python -m benchmarks.endpoints --scales 1k,10k --requests 200
+    python -m benchmarks.endpoints --save-baseline
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+
+from listings.fake_chapa import FakeChapaServer
+from listings.management.commands.seed import parse_count
+from listings.models import Booking, Listing, Payment
+
+from .booking_load import percentile
+
+User = get_user_model()
+
+BASELINE = Path(__file__).resolve().parent / 'baselines' / 'endpoints.json'
+ENDPOINTS = ('initiate', 'verify', 'callback', 'status')
+# Metrics checked against the baseline -> True when higher is better. p99
+# is reported but too noisy over a few hundred requests to gate on.
+METRICS = {'p50_ms': False, 'p95_ms': False, 'rps': True, 'queries': False, 'peak_kb': False}
+
+
+def seed(bookings):
+    call_command(
+        'seed', users=max(10, bookings // 10), listings=max(5, bookings // 20), bookings=bookings,
+        payments=bookings, stdout=io.StringIO(),
+    )
+
+
+def open_payments(count):
+    """
+    Create ``count`` processing payments to drive the endpoints with
+
+    Each gets a new pending booking of its own, so every verify takes the
+    same path (payment completed, booking confirmed).
+    """
+    listing = Listing.objects.order_by('pk').first()
+    user = User.objects.order_by('pk').first()
+    bookings = Booking.objects.bulk_create([
+        Booking(
+            property=listing, user=user, total_amount=300,
+            check_in_date=date(2040, 1, 1) + timedelta(days=2 * i),
+            check_out_date=date(2040, 1, 2) + timedelta(days=2 * i),
+        )
+        for i in range(count)
+    ])
+    return Payment.objects.bulk_create([
+        Payment(
+            booking_ref=booking, amount=300, payment_status='processing',
+            transaction_id=f'tx_bench_{uuid.uuid4().hex[:12]}',
+        )
+        for booking in bookings
+    ])
+
+
+def requests_for(endpoint, payment):
+    """The request an endpoint is driven with for one target"""
+    if endpoint == 'initiate':
+        return 'post', '/api/payments/initiate/', {'booking_id': str(payment.booking_ref_id)}
+    if endpoint == 'verify':
+        return 'post', '/api/payments/verify/', {'tx_ref': payment.transaction_id}
+    if endpoint == 'callback':
+        return 'post', '/api/payments/callback/', {
+            'event': 'charge.success', 'tx_ref': payment.transaction_id, 'status': 'success',
+        }
+    return 'get', f'/api/payments/{payment.payment_id}/', None
+
+
+def send(client, request):
+    method, path, data = request
+    if method == 'get':
+        return client.get(path)
+    return client.post(path, data=json.dumps(data), content_type='application/json')
+
+
+def timed_round(client, endpoint, payments):
+    latencies, queries = [], 0
+    start = time.perf_counter()
+    for payment in payments:
+        reset_queries()  # the query log keeps only the last 9000
+        with CaptureQueriesContext(connection) as captured:
+            began = time.perf_counter()
+            response = send(client, requests_for(endpoint, payment))
+            latencies.append((time.perf_counter() - began) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{endpoint}: HTTP {response.status_code} {response.content[:200]!r}')
+        queries += len(captured)
+    elapsed = time.perf_counter() - start
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'rps': round(len(latencies) / elapsed, 1),
+        'queries': round(queries / len(latencies), 2),
+    }
+
+
+def peak_memory(client, endpoint, payments):
+    """Most memory allocated while serving any one of the requests, in KB"""
+    peak = 0
+    tracemalloc.start()
+    try:
+        for payment in payments:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            send(client, requests_for(endpoint, payment))
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def measure(client, endpoint, payments, args):
+    send(client, requests_for(endpoint, payments[0]))  # first-request imports and connection setup
+    timed = payments[1:1 + args.rounds * args.requests]
+    rounds = [
+        timed_round(client, endpoint, timed[i * args.requests:(i + 1) * args.requests])
+        for i in range(args.rounds)
+    ]
+    # Like timeit, keep the fastest round: slower ones measure interference
+    best = min(rounds, key=lambda result: result['p50_ms'])
+    return dict(best, peak_kb=peak_memory(client, endpoint, payments[1 + args.rounds * args.requests:]))
+
+
+def run_scale(scale, args):
+    caches['default'].clear()
+    seed(scale)
+    payments = open_payments(1 + args.rounds * args.requests + args.traced)
+    client = Client()
+    client.force_login(User.objects.create_user(username=f'bench{scale}'))
+
+    results = {}
+    for endpoint in ENDPOINTS:
+        results[endpoint] = measure(client, endpoint, payments, args)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the metrics that are worse than the baseline allows"""
+    regressions = []
+    for scale, endpoints in results.items():
+        for endpoint, metrics in endpoints.items():
+            base = baseline.get(scale, {}).get(endpoint)
+            if base is None:
+                continue
+            for metric, higher_is_better in METRICS.items():
+                if metric not in base:
+                    continue
+                old, new = base[metric], metrics[metric]
+                if metric == 'queries':
+                    worse = new > old
+                elif higher_is_better:
+                    worse = new < old / (1 + tolerance)
+                else:
+                    worse = new > old * (1 + tolerance)
+                change = (new - old) / old if old else 0.0
+                if worse:
+                    regressions.append((scale, endpoint, metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1k,10k', help='comma-separated booking counts, e.g. 1k,10k,100k')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint and round')
+    parser.add_argument('--rounds', type=int, default=3, help='timed rounds per endpoint; the fastest is kept')
+    parser.add_argument('--traced', type=int, default=20, help='requests per endpoint run under tracemalloc')
+    parser.add_argument('--latency', type=float, default=0.0, help='fake gateway latency in seconds')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown before a regression, 0.5 = 50%%')
+    args = parser.parse_args()
+    scales = {label: parse_count(label) for label in args.scales.split(',')}
+
+    setup_test_environment()
+    results = {}
+    with FakeChapaServer(latency=args.latency) as gateway, override_settings(
+        CHAPA_BASE_URL=gateway.url, CHAPA_SECRET_KEY='test', CHAPA_WEBHOOK_SECRET='',
+        TASK_QUEUE_EAGER=True, SLOW_REQUEST_THRESHOLD_MS=float('inf'),
+    ):
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            for label, scale in scales.items():
+                call_command('flush', interactive=False, verbosity=0)
+                results[label] = run_scale(scale, args)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    baseline = json.loads(args.baseline.read_text())['results'] if args.baseline.exists() else {}
+    print(f"{args.requests} requests per endpoint, gateway latency {args.latency * 1000:.0f} ms ({connection.vendor})")
+    print(f"{'scale':>6} {'endpoint':<9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} "
+          f"{'queries':>8} {'peak KB':>8}")
+    for label, endpoints in results.items():
+        for endpoint, metrics in endpoints.items():
+            base = baseline.get(label, {}).get(endpoint)
+            delta = f"  p95 {(metrics['p95_ms'] / base['p95_ms'] - 1):+.0%} vs baseline" if base else ''
+            print(f"{label:>6} {endpoint:<9} {metrics['p50_ms']:8.2f} {metrics['p95_ms']:8.2f} "
+                  f"{metrics['p99_ms']:8.2f} {metrics['rps']:8.1f} {metrics['queries']:8.2f} "
+                  f"{metrics['peak_kb']:8.1f}{delta}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'machine': f'{platform.python_implementation()} {platform.python_version()} on {platform.machine()}',
+            'database': connection.vendor,
+            'requests': args.requests,
+            'results': results,
+        }, indent=2) + '\n')
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for scale, endpoint, metric, old, new, change in regressions:
+        print(f"REGRESSION {scale} {endpoint} {metric}: {old} -> {new} ({change:+.0%})")
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Simulate a Chapa outage and measure how long workers stay stuck on it
+
+Worker threads call verify in a loop through one ChapaClient while the fake
+gateway goes through three phases: healthy, outage (every call hangs past
+the read timeout) and recovered. For each phase it reports calls made,
+calls that reached the gateway, and worker occupancy: the share of worker
+time spent waiting on Chapa. Runs once with the circuit breaker disabled
+and once with it enabled.
+
+Usage (from the project directory):
+    python -m benchmarks.gateway_outage --workers 16 --phase 3 --read-timeout 0.5
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')
+django.setup()
+
+from django.core.cache import caches
+from django.conf import settings
+from django.test.utils import override_settings
+
+from listings.chapa import ChapaClient, ChapaError
+from listings.fake_chapa import FakeChapaServer
+
+PHASES = ('healthy', 'outage', 'recovered')
+
+
+def run(server, args):
+    client = ChapaClient(base_url=server.url, secret_key='test', read_timeout=args.read_timeout,
+                         pool_size=args.workers)
+    calls = []  # (start, end, ok) per call
+    done = threading.Event()
+
+    def worker():
+        i = 0
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                ok = client.verify(f'tx_{i}').status_code == 200
+            except ChapaError:
+                ok = False
+            calls.append((start, time.perf_counter(), ok))
+            if not ok:
+                time.sleep(args.pause)  # the caller's own handling of a failure
+            i += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    windows, gateway_calls = {}, {}
+    for phase in PHASES:
+        reached, start = len(server.calls), time.perf_counter()
+        server.latency = args.read_timeout * 4 if phase == 'outage' else args.latency
+        time.sleep(args.phase)
+        gateway_calls[phase] = len(server.calls) - reached
+        windows[phase] = (start, time.perf_counter())
+    done.set()
+    for thread in threads:
+        thread.join()
+    client.close()
+
+    for phase in PHASES:
+        phase_start, phase_end = windows[phase]
+        started = [(start, end, ok) for start, end, ok in calls if phase_start <= start < phase_end]
+        # Time waiting on Chapa within the phase, including calls that straddle it
+        busy = sum(max(0.0, min(end, phase_end) - max(start, phase_start)) for start, end, _ in calls)
+        occupancy = busy / (args.workers * (phase_end - phase_start))
+        print(f"  {phase:<10} {len(started):>7} calls  {sum(ok for _, _, ok in started):>7} ok  "
+              f"{gateway_calls[phase]:>7} reached gateway  occupancy {occupancy:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--phase', type=float, default=3.0, help='seconds per phase')
+    parser.add_argument('--latency', type=float, default=0.01, help='healthy gateway latency in seconds')
+    parser.add_argument('--read-timeout', type=float, default=0.5)
+    parser.add_argument('--pause', type=float, default=0.05, help='worker pause after a failed call')
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.phase:.0f}s per phase, read timeout {args.read_timeout * 1000:.0f} ms")
+    for label, failures in (('breaker disabled', 0), ('breaker enabled', 5)):
+        # Short enough to probe during the outage and close soon after it
+        with override_settings(CHAPA_BREAKER_FAILURES=failures, CHAPA_BREAKER_RESET=args.phase / 2):
+            caches[settings.CHAPA_CACHE_ALIAS].clear()
+            print(label)
+            with FakeChapaServer(latency=args.latency) as server:
+                run(server, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,70 @@
 from django.contrib import admin
-from .models import Listing, Booking, Payment, Review
+from .models import DailyRevenue, Listing, Booking, Payment, RateSeason, Review, Task, WebhookEvent
+from .pagination import EstimatedCountPaginator
+from .search import filter_listings
+
+class RateSeasonInline(admin.TabularInline):
+    model = RateSeason
+    extra = 0
 
 @admin.register(Listing)
 class ListingAdmin(admin.ModelAdmin):
-    list_display = ['property_id', 'name', 'location', 'pricepernight', 'host', 'created_at']
+    list_display = ['property_id', 'name', 'location', 'pricepernight', 'weekend_price', 'avg_rating', 'review_count', 'host', 'created_at']
     list_filter = ['created_at', 'location']
+    list_select_related = ['host']
+    # Searched through the full-text index (see get_search_results)
     search_fields = ['name', 'location', 'description']
-    readonly_fields = ['property_id', 'created_at', 'updated_at']
+    raw_id_fields = ['host']
+    readonly_fields = ['property_id', 'avg_rating', 'review_count', 'created_at', 'updated_at']
+    inlines = [RateSeasonInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_listings(queryset, search_term), False
+
+# Booking and Payment tables grow without bound: changelists join what
+# __str__ needs, skip exact counts, search only with index-friendly lookups
+# and drill down by created_at through its index (see templatetags.admin_dates).
+class CurrencyFilter(admin.SimpleListFilter):
+    """Currencies taken from the revenue rollups instead of a DISTINCT over payments"""
+    title = 'currency'
+    parameter_name = 'currency'
+
+    def lookups(self, request, model_admin):
+        currencies = DailyRevenue.objects.order_by('currency').values_list('currency', flat=True).distinct()
+        return [(currency, currency) for currency in currencies]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(currency=self.value())
+        return queryset
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ['booking_id', 'user', 'property', 'status', 'check_in_date', 'check_out_date', 'total_amount', 'created_at']
     list_filter = ['status', 'created_at', 'check_in_date']
-    search_fields = ['user__username', 'user__email', 'property__name']
+    list_select_related = ['user', 'property']
+    search_fields = ['=user__username', '=user__email', '^property__name']
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/listings/indexed_change_list.html'
+    ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user', 'property']
     readonly_fields = ['booking_id', 'created_at', 'updated_at']
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['payment_id', 'booking_ref', 'amount', 'payment_status', 'payment_method', 'transaction_id', 'created_at']
-    list_filter = ['payment_status', 'payment_method', 'created_at', 'currency']
-    search_fields = ['transaction_id', 'chapa_transaction_id', 'booking_ref__user__email']
+    list_filter = ['payment_status', 'payment_method', 'created_at', CurrencyFilter]
+    list_select_related = ['booking_ref__user', 'booking_ref__property']
+    search_fields = ['transaction_id__startswith', 'chapa_transaction_id__startswith', '=booking_ref__user__email']
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/listings/indexed_change_list.html'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['booking_ref']
     readonly_fields = ['payment_id', 'created_at', 'updated_at']
     
     def get_readonly_fields(self, request, obj=None):
@@ -31,7 +76,23 @@ class PaymentAdmin(admin.ModelAdmin):
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['user', 'property', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
+    list_select_related = ['user', 'property']
     search_fields = ['user__username', 'property__name', 'comment']
+    raw_id_fields = ['user', 'property']
     readonly_fields = ['created_at']
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['key', 'name', 'status', 'attempts', 'run_at', 'updated_at']
+    list_filter = ['status', 'name']
+    search_fields = ['key']
+    readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['tx_ref', 'event', 'status', 'received_at', 'processed_at']
+    list_filter = ['status', 'event']
+    search_fields = ['tx_ref']
+    readonly_fields = ['tx_ref', 'signature', 'event', 'payload', 'received_at', 'processed_at']
+
 # Register your models here.
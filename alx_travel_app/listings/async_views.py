@@ -0,0 +1,151 @@
+"""
+Async versions of the payment views, for ASGI deployments.
+
+They behave exactly like their counterparts in ``listings.views`` but await
+the database through the async ORM and Chapa through ``AsyncChapaClient``,
+so a request waiting on the gateway does not hold a worker thread. Enable
+them with ``PAYMENT_VIEWS_ASYNC=True`` and serve ``alx_travel_app.asgi``;
+under WSGI Django has to run each one in its own event loop, which is slower
+than the sync views.
+"""
+import json
+import logging
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .chapa import ChapaError, get_async_client
+from .models import Booking, Payment
+from .payments import transition
+from .tasks import enqueue
+from .views import _checkout_payload, _gateway_unreachable, _initiation_response, _payment_fields
+from .webhooks import InvalidWebhook, aingest
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentInitiateView(View):
+    """
+    API endpoint to initiate payment with Chapa
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            booking_id = data.get('booking_id')
+
+            if not booking_id:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Booking ID is required'
+                }, status=400)
+
+            try:
+                booking = await Booking.objects.select_related('user', 'property').aget(booking_id=booking_id)
+            except Booking.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Booking not found'
+                }, status=404)
+
+            tx_ref = f"tx_{uuid.uuid4().hex[:16]}"
+            payment = await Payment.objects.acreate(**_payment_fields(booking, tx_ref))
+
+            try:
+                response = await get_async_client().initialize(_checkout_payload(request, booking, tx_ref))
+            except ChapaError as e:
+                result, (new_status, fields) = _gateway_unreachable(e)
+            else:
+                result, (new_status, fields) = _initiation_response(payment, response, tx_ref)
+            await sync_to_async(transition)(payment, new_status, **fields)
+            return result
+
+        except Exception as e:
+            logger.error(f"Payment initiation error: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': 'Internal server error'
+            }, status=500)
+
+
+class PaymentVerifyView(View):
+    """
+    API endpoint to verify payment status with Chapa
+
+    Verification runs in the background (see ``listings.tasks``); the response
+    reports the payment's current status and is 202 while it is still settling.
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body)
+            tx_ref = data.get('tx_ref')
+
+            if not tx_ref:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Transaction reference is required'
+                }, status=400)
+
+            try:
+                payment = await Payment.objects.aget(transaction_id=tx_ref)
+            except Payment.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Payment not found'
+                }, status=404)
+
+            if payment.payment_status in ('pending', 'processing'):
+                await sync_to_async(enqueue)('verify_payment', tx_ref, tx_ref=tx_ref)
+
+            # Re-read in case the task ran inline (TASK_QUEUE_EAGER)
+            payment = await Payment.objects.select_related('booking_ref').aget(pk=payment.pk)
+            settled = payment.payment_status not in ('pending', 'processing')
+
+            return JsonResponse({
+                'success': True,
+                'payment_status': payment.payment_status,
+                'booking_status': payment.booking_ref.status,
+                'message': 'Payment status updated successfully' if settled else 'Payment verification queued'
+            }, status=200 if settled else 202)
+
+        except Exception as e:
+            logger.error(f"Payment verification error: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'error': 'Internal server error'
+            }, status=500)
+
+
+class PaymentCallbackView(View):
+    """
+    Webhook endpoint for Chapa payment callbacks
+    """
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    async def post(self, request):
+        try:
+            # Store the event and acknowledge; run_tasks verifies the payment
+            await aingest(request.body, request.headers)
+            return JsonResponse({'success': True})
+
+        except InvalidWebhook as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Payment callback error: {str(e)}")
+            return JsonResponse({'success': False}, status=500)
@@ -0,0 +1,56 @@
+"""
+Booking creation that is safe under concurrent requests.
+
+The listing row is locked with ``SELECT ... FOR UPDATE`` so attempts on the
+same listing run one after another, availability is checked against the
+``BookedNight`` index, and the unique (listing, night) constraint rejects
+anything that still slips through.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .models import BookedNight, Booking, Listing
+from .pricing import quote_stay
+
+
+class BookingConflict(Exception):
+    """Raised when the requested nights are already booked"""
+
+
+def is_available(listing, check_in, check_out):
+    """Check whether ``listing`` has no booked night in [check_in, check_out)"""
+    return not BookedNight.objects.filter(
+        listing=listing, night__gte=check_in, night__lt=check_out,
+    ).exists()
+
+
+def book_listing(user, listing_id, check_in, check_out):
+    """
+    Create a pending booking of ``listing_id`` for ``user``
+
+    Raises ``Listing.DoesNotExist`` for an unknown listing and
+    ``BookingConflict`` when any night is taken.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'sqlite':
+            # SQLite ignores FOR UPDATE. Writing first takes the database
+            # write lock up front, so concurrent bookings queue on the busy
+            # timeout instead of failing to upgrade a read lock.
+            Listing.objects.filter(pk=listing_id).update(pricepernight=F('pricepernight'))
+        listing = Listing.objects.select_for_update().get(pk=listing_id)
+        if not is_available(listing, check_in, check_out):
+            raise BookingConflict('The listing is not available for the selected dates')
+
+        booking = Booking(
+            property=listing,
+            user=user,
+            check_in_date=check_in,
+            check_out_date=check_out,
+            total_amount=quote_stay(listing, check_in, check_out)['total'],
+        )
+        try:
+            with transaction.atomic():
+                booking.save()
+        except IntegrityError:
+            raise BookingConflict('The listing is not available for the selected dates')
+    return booking
@@ -0,0 +1,103 @@
+"""
+Read-through cache for the payment polling endpoints.
+
+``get_payment_status`` and ``get_booking_payments`` are polled while a user
+waits on Chapa checkout. Their serialized payloads are cached for
+``API_CACHE_TTL`` seconds together with an ETag, so repeat polls skip the
+database and serialization, and clients sending ``If-None-Match`` get an
+empty 304. The batch endpoints read the same entries with one cache
+round trip and build all the misses with one query. Entries are
+invalidated when a change to a Payment or Booking commits (see
+``listings.signals``); code that bypasses ``save()`` with ``update()`` or
+``bulk_update()`` must call ``invalidate_payments`` itself. Payloads are
+built from the primary: a replica still behind the invalidating commit
+would put the old payload back for a full TTL.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Payment
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def payment_status_key(payment_id):
+    return f'payment-status:{payment_id}'
+
+
+def booking_payments_key(booking_id):
+    return f'booking-payments:{booking_id}'
+
+
+def make_entry(data):
+    """The ``{'data', 'etag'}`` entry for a payload"""
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    return {'data': data, 'etag': f'"{hashlib.sha1(body).hexdigest()}"'}
+
+
+def read_through(key, build):
+    """
+    Return the cached ``{'data', 'etag'}`` entry for ``key``, calling
+    ``build()`` for the payload on a miss
+    """
+    cache = get_cache()
+    entry = cache.get(key)
+    if entry is None:
+        entry = make_entry(build())
+        cache.set(key, entry, settings.API_CACHE_TTL)
+    return entry
+
+
+def read_through_many(keys, build):
+    """
+    Entries for ``keys`` (id -> cache key) in one cache read, keyed by id
+
+    ``build(ids)`` returns ``{id: payload}`` for the misses; ids it leaves
+    out are not found and are missing from the result too.
+    """
+    cache = get_cache()
+    found = cache.get_many(keys.values())
+    entries = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [pk for pk in keys if pk not in entries]
+    if missing:
+        built = {pk: make_entry(data) for pk, data in build(missing).items()}
+        cache.set_many({keys[pk]: entry for pk, entry in built.items()}, settings.API_CACHE_TTL)
+        entries.update(built)
+    return entries
+
+
+def conditional_response(request, entry):
+    """Respond 304 when the client already holds the entry's ETag"""
+    headers = {'ETag': entry['etag'], 'Cache-Control': 'private, no-cache'}
+    if_none_match = request.headers.get('If-None-Match', '')
+    if entry['etag'] in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry['data'], headers=headers)
+
+
+def invalidate_payments(payment_ids=(), booking_ids=()):
+    """Drop cached payloads for the given payments and bookings once the write commits"""
+    keys = [payment_status_key(pk) for pk in payment_ids]
+    keys += [booking_payments_key(pk) for pk in booking_ids]
+    if keys:
+        # A poll before the commit would cache the old payload again
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def invalidate_bookings(booking_ids):
+    """Drop bookings' cached payloads, including their payments' nested copies"""
+    if not booking_ids:
+        return
+    invalidate_payments(
+        payment_ids=Payment.objects.filter(booking_ref__in=booking_ids).values_list('pk', flat=True),
+        booking_ids=booking_ids,
+    )
@@ -0,0 +1,221 @@
+"""
+HTTP client for the Chapa payment gateway.
+
+One keep-alive session is shared per process, so initiate and verify calls
+reuse pooled connections instead of opening a new TLS connection per request,
+and every call is bounded by the connect/read timeouts from settings.
+``AsyncChapaClient`` exposes the same calls for async views.
+
+Calls pass through a circuit breaker and, when ``CHAPA_RATE_LIMIT`` is set,
+a rate limiter (see ``listings.resilience``); refused calls raise
+``GatewayUnavailable`` at once instead of waiting on a failing gateway.
+"""
+import asyncio
+import threading
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from alx_travel_app.metrics import observe_outbound
+
+from .resilience import CircuitBreaker, FixedWindowLimiter, Rejected
+
+
+class ChapaError(Exception):
+    """Raised when the gateway cannot be reached or does not answer in time"""
+
+
+class GatewayUnavailable(ChapaError):
+    """Raised without calling the gateway while it is failing or rate limited"""
+
+    def __init__(self, message, retry_after=0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _client_options(base_url=None, secret_key=None, connect_timeout=None,
+                    read_timeout=None, pool_size=None):
+    return {
+        'base_url': (base_url or settings.CHAPA_BASE_URL).rstrip('/'),
+        'secret_key': secret_key if secret_key is not None else settings.CHAPA_SECRET_KEY,
+        'connect_timeout': connect_timeout if connect_timeout is not None else settings.CHAPA_CONNECT_TIMEOUT,
+        'read_timeout': read_timeout if read_timeout is not None else settings.CHAPA_READ_TIMEOUT,
+        'pool_size': pool_size if pool_size is not None else settings.CHAPA_POOL_SIZE,
+    }
+
+
+class _Guarded:
+    """Circuit breaker and rate limiting shared by both clients"""
+
+    def _setup_guards(self):
+        cache = caches[settings.CHAPA_CACHE_ALIAS]
+        self.breaker = self.limiter = None
+        if settings.CHAPA_BREAKER_FAILURES:
+            self.breaker = CircuitBreaker(
+                'chapa', cache,
+                failure_threshold=settings.CHAPA_BREAKER_FAILURES,
+                reset_timeout=settings.CHAPA_BREAKER_RESET,
+                slow_call=settings.CHAPA_SLOW_CALL_MS / 1000 or None,
+            )
+        if settings.CHAPA_RATE_LIMIT:
+            self.limiter = FixedWindowLimiter('chapa', cache, settings.CHAPA_RATE_LIMIT, settings.CHAPA_RATE_BURST)
+
+    def _guard(self):
+        """The breaker's context manager for one call; raises if refused"""
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            return self.breaker.call() if self.breaker is not None else _Unguarded()
+        except Rejected as e:
+            raise GatewayUnavailable(str(e), e.retry_after) from e
+
+    @staticmethod
+    def _check_status(call, status_code):
+        # Client errors are ours; throttling and server errors are the gateway's
+        if status_code >= 500 or status_code == 429:
+            call.fail()
+
+
+class _Unguarded:
+
+    def fail(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class ChapaClient(_Guarded):
+    """
+    Blocking Chapa client backed by a pooled ``requests.Session``
+    """
+
+    def __init__(self, **options):
+        options = _client_options(**options)
+        self._setup_guards()
+        self.base_url = options['base_url']
+        self.timeout = (options['connect_timeout'], options['read_timeout'])
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=options['pool_size'])
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f"Bearer {options['secret_key']}",
+            'Content-Type': 'application/json',
+        })
+
+    def initialize(self, payload):
+        """Create a hosted checkout for ``payload``"""
+        return self._request('initialize', 'POST', '/transaction/initialize', json=payload)
+
+    def verify(self, tx_ref):
+        """Fetch the gateway status of ``tx_ref``"""
+        return self._request('verify', 'GET', f'/transaction/verify/{tx_ref}')
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, operation, method, path, **kwargs):
+        with self._guard() as call, observe_outbound('chapa', operation):
+            try:
+                response = self.session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:
+                raise ChapaError(str(e)) from e
+            self._check_status(call, response.status_code)
+            return response
+
+
+class AsyncChapaClient(_Guarded):
+    """
+    Non-blocking Chapa client backed by a pooled ``httpx.AsyncClient``
+    """
+
+    def __init__(self, **options):
+        import httpx
+
+        self._transport_error = httpx.HTTPError
+        options = _client_options(**options)
+        self._setup_guards()
+        self.base_url = options['base_url']
+        self.client = httpx.AsyncClient(
+            headers={
+                'Authorization': f"Bearer {options['secret_key']}",
+                'Content-Type': 'application/json',
+            },
+            timeout=httpx.Timeout(options['read_timeout'], connect=options['connect_timeout']),
+            limits=httpx.Limits(
+                max_connections=options['pool_size'],
+                max_keepalive_connections=options['pool_size'],
+            ),
+        )
+
+    async def initialize(self, payload):
+        """Create a hosted checkout for ``payload``"""
+        return await self._request('initialize', 'POST', '/transaction/initialize', json=payload)
+
+    async def verify(self, tx_ref):
+        """Fetch the gateway status of ``tx_ref``"""
+        return await self._request('verify', 'GET', f'/transaction/verify/{tx_ref}')
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, operation, method, path, **kwargs):
+        with self._guard() as call, observe_outbound('chapa', operation):
+            try:
+                response = await self.client.request(method, f'{self.base_url}{path}', **kwargs)
+            except self._transport_error as e:
+                raise ChapaError(str(e) or e.__class__.__name__) from e
+            self._check_status(call, response.status_code)
+            return response
+
+
+_client = None
+_client_lock = threading.Lock()
+# httpx connections belong to the event loop that opened them, so async
+# clients are cached per loop rather than per process.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Return the process-wide pooled ``ChapaClient``"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ChapaClient()
+    return _client
+
+
+def get_async_client():
+    """Return the ``AsyncChapaClient`` bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncChapaClient()
+    return client
+
+
+def reset_clients():
+    """Drop cached clients so the next call picks up current settings"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+    _async_clients.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('CHAPA_'):
+        reset_clients()
@@ -0,0 +1,36 @@
+"""
+System checks for settings the listings app cannot work around at runtime.
+"""
+from django.conf import settings
+from django.core import checks
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def _guard_cache_is_local():
+    cache = settings.CACHES.get(settings.CHAPA_CACHE_ALIAS, {})
+    return cache.get('BACKEND') == LOCMEM_CACHE
+
+
+@checks.register(checks.Tags.caches)
+def check_rate_limit_cache(app_configs, **kwargs):
+    """``CHAPA_RATE_LIMIT`` is a budget for all workers, so it needs a shared cache"""
+    if settings.CHAPA_RATE_LIMIT and _guard_cache_is_local():
+        return [checks.Warning(
+            'CHAPA_RATE_LIMIT is enforced per process: the CHAPA_CACHE_ALIAS cache is a LocMemCache.',
+            hint='Point CACHE_BACKEND (or CHAPA_CACHE_ALIAS) at a shared cache such as Redis or Memcached.',
+            id='listings.W001',
+        )]
+    return []
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_circuit_breaker_cache(app_configs, **kwargs):
+    """Each process behind a LocMemCache trips its own breaker"""
+    if settings.CHAPA_BREAKER_FAILURES and _guard_cache_is_local():
+        return [checks.Warning(
+            'The Chapa circuit breaker is per process: the CHAPA_CACHE_ALIAS cache is a LocMemCache.',
+            hint='Point CACHE_BACKEND (or CHAPA_CACHE_ALIAS) at a shared cache such as Redis or Memcached.',
+            id='listings.W002',
+        )]
+    return []
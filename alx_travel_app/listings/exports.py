@@ -0,0 +1,99 @@
+"""
+Streaming CSV and NDJSON exports of bookings and payments.
+
+Rows are read with ``values_list()`` through ``QuerySet.iterator()``, so no
+model instances are built and the database driver fetches ``chunk_size``
+rows at a time (a server-side cursor on PostgreSQL). Lines are encoded as
+they are read and handed out in blocks of about 64 KB, which keeps memory
+flat however many rows are exported; the HTTP view wraps the generator in a
+``StreamingHttpResponse`` and the ``export`` command writes it to a file.
+"""
+import csv
+import io
+from datetime import datetime, time, timedelta, timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+
+from .models import Booking, Payment
+
+EXPORTS = {
+    'bookings': (Booking, 'status', [
+        ('booking_id', 'booking_id'),
+        ('property_id', 'property_id'),
+        ('property_name', 'property__name'),
+        ('user_id', 'user_id'),
+        ('user_email', 'user__email'),
+        ('check_in_date', 'check_in_date'),
+        ('check_out_date', 'check_out_date'),
+        ('total_amount', 'total_amount'),
+        ('status', 'status'),
+        ('created_at', 'created_at'),
+    ]),
+    'payments': (Payment, 'payment_status', [
+        ('payment_id', 'payment_id'),
+        ('booking_id', 'booking_ref_id'),
+        ('transaction_id', 'transaction_id'),
+        ('amount', 'amount'),
+        ('currency', 'currency'),
+        ('payment_status', 'payment_status'),
+        ('payment_method', 'payment_method'),
+        ('payment_date', 'payment_date'),
+        ('created_at', 'created_at'),
+    ]),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+BLOCK_SIZE = 64 * 1024
+
+
+def export_rows(kind, start=None, end=None, statuses=(), using=None, chunk_size=2000):
+    """
+    Yield the export columns of ``kind`` created on the UTC days ``start``
+    to ``end`` (inclusive), optionally only with the given ``statuses``
+    """
+    model, status_field, columns = EXPORTS[kind]
+    rows = model.objects.using(using or router.db_for_read(model)).order_by('created_at', 'pk')
+    if start is not None:
+        rows = rows.filter(created_at__gte=datetime.combine(start, time.min, timezone.utc))
+    if end is not None:
+        rows = rows.filter(created_at__lt=datetime.combine(end + timedelta(days=1), time.min, timezone.utc))
+    if statuses:
+        rows = rows.filter(**{f'{status_field}__in': statuses})
+    return rows.values_list(*(lookup for _, lookup in columns)).iterator(chunk_size=chunk_size)
+
+
+def render(kind, rows, fmt):
+    """Encode ``rows`` of ``kind`` as ``fmt``, yielding blocks of bytes"""
+    names = [name for name, _ in EXPORTS[kind][2]]
+    lines = _csv_lines(names, rows) if fmt == 'csv' else _ndjson_lines(names, rows)
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block).encode()
+            block, size = [], 0
+    if block:
+        yield ''.join(block).encode()
+
+
+def _csv_lines(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= BLOCK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_lines(names, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
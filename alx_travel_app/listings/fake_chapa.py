@@ -0,0 +1,140 @@
+"""
+Local stand-in for the Chapa API, used by the tests and the benchmarks.
+
+It serves ``/v1/transaction/initialize`` and ``/v1/transaction/verify/<tx_ref>``
+over keep-alive HTTP on a background thread, with a configurable latency
+so slow-gateway behaviour can be reproduced without network access.
+"""
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _ChapaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this Nagle's
+        # algorithm stalls every keep-alive response on a delayed ACK.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.fake.record_connection()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self._respond(self.server.fake.handle('POST', self.path, body))
+
+    def do_GET(self):
+        self._respond(self.server.fake.handle('GET', self.path, None))
+
+    def _respond(self, result):
+        status_code, payload = result
+        data = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ChapaHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops bursts of new connections, which then
+    # stall for a SYN retransmit and distort benchmark latencies.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here.
+        pass
+
+
+class FakeChapaServer:
+    """
+    In-process fake Chapa gateway
+
+    ``latency`` delays every response, ``verify_status`` is the status reported
+    for transactions without an explicit ``set_status`` and ``error_status``
+    makes every call fail with that HTTP status.
+    """
+
+    def __init__(self, latency=0.0, verify_status='success', error_status=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.verify_status = verify_status
+        self.error_status = error_status
+        self.statuses = {}
+        self.calls = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _ChapaHTTPServer((host, port), _ChapaHandler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def set_status(self, tx_ref, status):
+        self.statuses[tx_ref] = status
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def handle(self, method, path, body):
+        with self._lock:
+            self.calls.append((method, path))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_status:
+            return self.error_status, {'message': 'Gateway error', 'status': 'failed', 'data': None}
+
+        if method == 'POST' and path == '/v1/transaction/initialize':
+            tx_ref = body.get('tx_ref')
+            if not tx_ref:
+                return 400, {'message': 'tx_ref is required', 'status': 'failed', 'data': None}
+            self.statuses.setdefault(tx_ref, self.verify_status)
+            return 200, {
+                'message': 'Hosted Link',
+                'status': 'success',
+                'data': {'checkout_url': f'https://checkout.chapa.co/checkout/payment/{tx_ref}'},
+            }
+
+        prefix = '/v1/transaction/verify/'
+        if method == 'GET' and path.startswith(prefix):
+            tx_ref = path[len(prefix):]
+            return 200, {
+                'message': 'Payment details',
+                'status': 'success',
+                'data': {
+                    'tx_ref': tx_ref,
+                    'reference': f'AP{tx_ref[-10:]}',
+                    'status': self.statuses.get(tx_ref, self.verify_status),
+                    'currency': 'ETB',
+                },
+            }
+
+        return 404, {'message': 'Not found', 'status': 'failed', 'data': None}
@@ -0,0 +1,168 @@
+"""
+Proximity search over listing coordinates without GIS extensions.
+
+Each listing with coordinates stores its geohash (``GEOHASH_PRECISION``
+characters, a cell of about 5 m). A geohash names a cell of a fixed grid,
+every prefix names the enclosing cell, and all hashes inside a cell sort
+together, so "listings in cell c" is a range scan on the geohash index,
+from ``c`` up to the first hash after the cell (``next_cell``). Both
+bounds are made of geohash characters, which sort the same way under
+every collation. A bounding box is covered with at most ``MAX_CELLS``
+cells of the finest precision that allows it; the rows found
+in those ranges are then checked against the exact box (from the index,
+which also holds the coordinates), and for a radius search against the
+great-circle distance, which only runs on candidates.
+"""
+import math
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Func, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+# Upper bound on the index ranges one search scans; more, smaller cells
+# fit the box more tightly
+MAX_CELLS = 32
+# Areas with fewer listings in their cells than this are searched cell first
+SELECTIVE_CANDIDATES = 5000
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    bits, chars, even = 0, [], True
+    for i in range(precision * 5):
+        # Bits alternate between longitude and latitude, longitude first
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        if i % 5 == 4:
+            chars.append(BASE32[bits])
+            bits = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees"""
+    lng_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def _spans(low, high, size, origin):
+    return range(math.floor((low - origin) / size), math.floor((high - origin) / size) + 1)
+
+
+def covering_cells(south, west, north, east):
+    """Geohash prefixes whose cells together cover the box"""
+    # A box across the antimeridian is two boxes
+    boxes = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = _spans(south, min(north, 90.0 - height / 2), height, -90.0)
+        columns = [
+            column for low, high in boxes
+            for column in _spans(low, min(high, 180.0 - width / 2), width, -180.0)
+        ]
+        if len(rows) * len(columns) <= MAX_CELLS or precision == 1:
+            break
+    return sorted({
+        encode_geohash(-90.0 + (row + 0.5) * height, -180.0 + (column + 0.5) * width, precision)
+        for row in rows for column in columns
+    })
+
+
+def next_cell(cell):
+    """The first geohash after every hash in ``cell``, or None after the last cell"""
+    stripped = cell.rstrip(BASE32[-1])
+    if not stripped:
+        return None
+    return stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+
+
+def _in_cells(cells):
+    condition = Q()
+    for cell in cells:
+        following = next_cell(cell)
+        if following is None:
+            condition |= Q(geohash__gte=cell)
+        else:
+            condition |= Q(geohash__gte=cell, geohash__lt=following)
+    return condition
+
+
+class Selective(Func):
+    """SQLite's ``likelihood()``: tells the planner a condition is rarely true"""
+    function = 'likelihood'
+    # The probability must be a literal, not a parameter
+    template = '%(function)s(%(expressions)s, 0.001)'
+    output_field = BooleanField()
+
+
+def _hinted(queryset, in_cells):
+    """
+    ``in_cells``, marked selective for SQLite when few rows are in the cells
+
+    SQLite cannot estimate how many rows a set of geohash ranges holds. Once
+    ``ANALYZE`` has run it prefers walking the index of the requested
+    ordering and filtering as it goes, which is fast in a dense area but
+    reads the whole table when the area is sparse; a probe of the index
+    tells the two apart.
+    """
+    if connections[queryset.db].vendor != 'sqlite':
+        return in_cells
+    candidates = queryset.model.objects.using(queryset.db).filter(in_cells).values('geohash')
+    if candidates[:SELECTIVE_CANDIDATES].count() < SELECTIVE_CANDIDATES:
+        return Selective(in_cells)
+    return in_cells
+
+
+def within_box(queryset, south, west, north, east):
+    """Listings whose coordinates are in the box, ``west`` > ``east`` crossing the antimeridian"""
+    longitude = Q(longitude__gte=west, longitude__lte=east)
+    if west > east:
+        longitude = Q(longitude__gte=west) | Q(longitude__lte=east)
+    in_cells = _in_cells(covering_cells(south, west, north, east))
+    return queryset.filter(_hinted(queryset, in_cells)).filter(
+        longitude, latitude__gte=south, latitude__lte=north,
+    )
+
+
+def radius_box(latitude, longitude, radius_km):
+    """(south, west, north, east) of the box around a circle"""
+    degrees = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - degrees, -90.0), min(latitude + degrees, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0  # the circle contains a pole
+    # Longitude of the meridians tangent to the circle
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    spread = math.degrees(math.asin(min(1.0, ratio)))
+    if spread >= 90.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - spread + 180.0) % 360.0 - 180.0
+    east = (longitude + spread + 180.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def distance_km(latitude, longitude):
+    """Great-circle (haversine) distance from a point to each row's coordinates"""
+    lat1, lng1 = math.radians(latitude), math.radians(longitude)
+    half_lat = (Radians('latitude') - Value(lat1)) / 2
+    half_lng = (Radians('longitude') - Value(lng1)) / 2
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(
+        Power(Sin(half_lat), 2) + Value(math.cos(lat1)) * Cos(Radians('latitude')) * Power(Sin(half_lng), 2)
+    ), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Listings within ``radius_km`` of the point, annotated with their ``distance``"""
+    return within_box(queryset, *radius_box(latitude, longitude, radius_km)).annotate(
+        distance=distance_km(latitude, longitude),
+    ).filter(distance__lte=radius_km)
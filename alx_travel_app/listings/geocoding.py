@@ -0,0 +1,111 @@
+"""
+Listing coordinates from a local gazetteer file.
+
+``load_gazetteer`` reads either a GeoNames dump (tab-separated, no header,
+e.g. ``cities15000.txt`` from download.geonames.org) or a CSV file with a
+``name,latitude,longitude`` header and an optional ``population`` column.
+Where several places share a name, a primary name beats an alternate one and
+then the larger population wins.
+
+``geocode_listings`` matches each distinct ``Listing.location`` against it,
+trying the whole value first and then each comma-separated part ("Diani,
+Kwale County, Kenya"), and sets the coordinates of every listing at that
+location with a single UPDATE, so the cost depends on the number of
+distinct locations rather than listings. No network calls are made.
+"""
+import csv
+import unicodedata
+from dataclasses import dataclass
+
+from django.db import router
+from django.db.models import Count
+
+from .geo import encode_geohash
+from .models import Listing
+
+# GeoNames dump columns
+GEONAMES_NAME, GEONAMES_ASCII, GEONAMES_ALTERNATES = 1, 2, 3
+GEONAMES_LATITUDE, GEONAMES_LONGITUDE, GEONAMES_POPULATION = 4, 5, 14
+GEONAMES_COLUMNS = 19
+
+
+@dataclass(frozen=True)
+class Place:
+    latitude: float
+    longitude: float
+    population: int = 0
+    alternate: bool = False
+
+    def beats(self, other):
+        return (self.alternate, -self.population) < (other.alternate, -other.population)
+
+
+def normalize(name):
+    """Case-, accent- and spacing-insensitive form of a place name"""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+
+def _add(gazetteer, name, place):
+    key = normalize(name)
+    if key and (key not in gazetteer or place.beats(gazetteer[key])):
+        gazetteer[key] = place
+
+
+def load_gazetteer(path):
+    """Map normalized place names in the file at ``path`` to ``Place``"""
+    gazetteer = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        first = f.readline()
+        f.seek(0)
+        if first.count('\t') == GEONAMES_COLUMNS - 1:
+            for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                place = dict(
+                    latitude=float(row[GEONAMES_LATITUDE]), longitude=float(row[GEONAMES_LONGITUDE]),
+                    population=int(row[GEONAMES_POPULATION] or 0),
+                )
+                _add(gazetteer, row[GEONAMES_NAME], Place(**place))
+                _add(gazetteer, row[GEONAMES_ASCII], Place(**place))
+                for name in row[GEONAMES_ALTERNATES].split(','):
+                    _add(gazetteer, name, Place(**place, alternate=True))
+        else:
+            for row in csv.DictReader(f):
+                _add(gazetteer, row['name'], Place(
+                    latitude=float(row['latitude']), longitude=float(row['longitude']),
+                    population=int(row.get('population') or 0),
+                ))
+    return gazetteer
+
+
+def lookup(gazetteer, location):
+    for candidate in [location, *location.split(',')]:
+        place = gazetteer.get(normalize(candidate))
+        if place is not None:
+            return place
+    return None
+
+
+def geocode_listings(gazetteer, overwrite=False):
+    """
+    Set the coordinates of listings whose location is in ``gazetteer``
+
+    Only listings without coordinates are touched unless ``overwrite``.
+    Returns (listings geocoded, {unmatched location: listings}).
+    """
+    db = router.db_for_write(Listing)
+    listings = Listing.objects.using(db)
+    if not overwrite:
+        listings = listings.filter(latitude__isnull=True)
+    locations = listings.values_list('location').annotate(listings=Count('pk')).order_by('location')
+
+    geocoded, unmatched = 0, {}
+    for location, count in list(locations):
+        place = lookup(gazetteer, location)
+        if place is None:
+            unmatched[location] = count
+            continue
+        geocoded += listings.filter(location=location).update(
+            latitude=place.latitude, longitude=place.longitude,
+            geohash=encode_geohash(place.latitude, place.longitude),
+        )
+    return geocoded, unmatched
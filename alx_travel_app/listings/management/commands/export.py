@@ -0,0 +1,50 @@
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.exports import EXPORTS, FORMATS, export_rows, render
+
+
+class Command(BaseCommand):
+    help = 'Stream bookings or payments to a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--start', help='first UTC creation day (YYYY-MM-DD); default: all history')
+        parser.add_argument('--end', help='last UTC creation day (YYYY-MM-DD); default: no limit')
+        parser.add_argument('--status', help='comma-separated statuses to include; default: all')
+        parser.add_argument('--output', default='-', help='file to write; default: stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = (date.fromisoformat(options[name]) if options[name] else None for name in ('start', 'end'))
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if start and end and end < start:
+            raise CommandError('--end is before --start')
+        model, status_field, _ = EXPORTS[options['kind']]
+        statuses = [status.strip() for status in (options['status'] or '').split(',') if status.strip()]
+        unknown = sorted(set(statuses) - {value for value, _ in model._meta.get_field(status_field).choices})
+        if unknown:
+            raise CommandError(f"Unknown status: {', '.join(unknown)}")
+
+        began = time.perf_counter()
+        rows = export_rows(options['kind'], start, end, statuses, chunk_size=options['chunk_size'])
+        blocks = render(options['kind'], rows, options['format'])
+        if options['output'] == '-':
+            out = getattr(self.stdout._out, 'buffer', None)
+            for block in blocks:
+                if out is None:
+                    self.stdout.write(block.decode(), ending='')
+                else:
+                    out.write(block)
+            return
+        written = 0
+        with open(options['output'], 'wb') as out:
+            for block in blocks:
+                written += out.write(block)
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {options['kind']} to {options['output']}: {written} bytes in {time.perf_counter() - began:.2f}s."
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.geocoding import geocode_listings, load_gazetteer
+
+
+class Command(BaseCommand):
+    help = 'Set listing coordinates by matching their location against a local gazetteer file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('gazetteer', help='GeoNames dump (e.g. cities15000.txt) or CSV with name,latitude,longitude')
+        parser.add_argument('--overwrite', action='store_true', help='also re-geocode listings that have coordinates')
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        try:
+            gazetteer = load_gazetteer(options['gazetteer'])
+        except (OSError, KeyError, ValueError, IndexError) as e:
+            raise CommandError(f"Cannot read gazetteer {options['gazetteer']}: {e}")
+        if not gazetteer:
+            raise CommandError(f"No places in gazetteer {options['gazetteer']}")
+
+        geocoded, unmatched = geocode_listings(gazetteer, overwrite=options['overwrite'])
+        for location, count in sorted(unmatched.items(), key=lambda item: -item[1]):
+            self.stderr.write(f'No match for {location!r} ({count} listings)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Geocoded {geocoded} listings from {len(gazetteer)} place names in {time.perf_counter() - began:.2f}s; '
+            f'{sum(unmatched.values())} listings at {len(unmatched)} locations unmatched.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from listings.ratings import rebuild_rating_aggregates
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recompute review_count, rating_total and avg_rating for every listing'
+
+    def handle(self, *args, **kwargs):
+        start = time.perf_counter()
+        updated = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rating aggregates for {updated} listings in {time.perf_counter() - start:.2f}s.'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from listings.search import rebuild_search_index
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the listing full-text search index from the listings table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='listings written per batch')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        indexed = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the search index for {indexed} listings in {time.perf_counter() - start:.2f}s.'
+        ))
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from listings.chapa import ChapaClient, ChapaError
+from listings.models import Payment
+from listings.payments import gateway_outcome, gateway_status, transition_many
+from listings.tasks import enqueue_many
+
+
+class Command(BaseCommand):
+    help = 'Verify payments stuck in processing against Chapa and write back their status'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent verify calls')
+        parser.add_argument('--batch-size', type=int, default=500, help='Payments verified and written per batch')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many payments')
+        parser.add_argument(
+            '--checkpoint', default=str(Path(settings.BASE_DIR) / '.reconcile_payments.json'),
+            help='File recording progress so an interrupted run can resume',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    def handle(self, *args, **options):
+        checkpoint_path = Path(options['checkpoint'])
+        state = {
+            'last_pk': None, 'checked': 0, 'completed': 0, 'failed': 0, 'unsettled': 0, 'errors': 0, 'raced': 0,
+        }
+        if checkpoint_path.exists() and not options['restart']:
+            state.update(json.loads(checkpoint_path.read_text()))
+            self.stdout.write(f"Resuming after payment {state['last_pk']} ({state['checked']} already checked)")
+
+        payments = Payment.objects.filter(payment_status='processing').only(
+            'payment_id', 'transaction_id', 'booking_ref_id', 'failure_reason', 'updated_at',
+            *Payment.REVENUE_FIELDS,
+        ).order_by('pk')
+        if state['last_pk']:
+            payments = payments.filter(pk__gt=state['last_pk'])
+        if options['limit']:
+            payments = payments[:options['limit']]
+
+        client = ChapaClient(pool_size=options['workers'])
+        started = time.perf_counter()
+        checked_at_start = state['checked']
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                batch = []
+                for payment in payments.iterator(chunk_size=options['batch_size']):
+                    batch.append(payment)
+                    if len(batch) >= options['batch_size']:
+                        self.process_batch(batch, pool, client, state, checkpoint_path, started, checked_at_start)
+                        batch = []
+                if batch:
+                    self.process_batch(batch, pool, client, state, checkpoint_path, started, checked_at_start)
+        finally:
+            client.close()
+
+        checkpoint_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {state['checked']} payments: {state['completed']} completed, {state['failed']} failed, "
+            f"{state['unsettled']} still processing, {state['errors']} gateway errors, "
+            f"{state['raced']} settled concurrently"
+        ))
+
+    def process_batch(self, batch, pool, client, state, checkpoint_path, started, checked_at_start):
+        def verify(payment):
+            try:
+                return gateway_status(payment.transaction_id, client=client)
+            except ChapaError:
+                return None
+
+        now = timezone.now()
+        changes = []
+        for payment, payment_data in zip(batch, pool.map(verify, batch)):
+            if payment_data is None:
+                state['errors'] += 1
+                continue
+            outcome = gateway_outcome(payment_data, now=now)
+            if outcome is None:
+                state['unsettled'] += 1
+                continue
+            new_status, fields = outcome
+            changes.append((payment, new_status, fields))
+
+        with transaction.atomic():
+            # Payments a verify task settled since they were read are skipped
+            changed = transition_many(changes, now=now)
+            enqueue_many('send_confirmation_email', {
+                payment.transaction_id: {'tx_ref': payment.transaction_id}
+                for payment in changed if payment.payment_status == 'completed'
+            })
+        for payment in changed:
+            state[payment.payment_status] += 1
+        state['raced'] += len(changes) - len(changed)
+
+        state['checked'] += len(batch)
+        state['last_pk'] = str(batch[-1].pk)
+        checkpoint_path.write_text(json.dumps(state))
+
+        elapsed = time.perf_counter() - started
+        rate = (state['checked'] - checked_at_start) / elapsed if elapsed else 0
+        self.stdout.write(f"{state['checked']} checked, {len(changed)} updated in last batch ({rate:.1f} payments/s)")
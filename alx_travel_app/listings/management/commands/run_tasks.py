@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from listings.tasks import run_pending
+from listings.webhooks import process_webhook_events
+import time
+
+
+class Command(BaseCommand):
+    help = 'Process payment webhooks and run queued background tasks (payment verification, confirmation emails)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run due tasks once and exit')
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            events = process_webhook_events()
+            if events:
+                self.stdout.write(f'Processed {events} webhook event(s).')
+            executed = run_pending(limit=options['batch_size'])
+            if executed:
+                self.stdout.write(f'Ran {executed} task(s).')
+            if options['once']:
+                break
+            if not events and executed < options['batch_size']:
+                time.sleep(options['sleep'])
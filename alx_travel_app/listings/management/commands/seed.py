@@ -1,14 +1,82 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from listings.models import Listing
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.utils import timezone
+from listings.geo import encode_geohash
+from listings.models import BookedNight, Booking, Listing, Payment, Review
+from listings.ratings import rebuild_rating_aggregates
+from listings.revenue import backfill_revenue
+from listings.search import rebuild_search_index
+from datetime import timedelta
+from decimal import Decimal
+import hashlib
 import random
+import time
+import uuid
 
 User = get_user_model()
 
+LOCATIONS = [
+    'Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Mt. Kenya', 'Diani', 'Lamu', 'Naivasha',
+    'Addis Ababa', 'Bahir Dar', 'Gondar', 'Lalibela', 'Hawassa', 'Dire Dawa',
+    'Kampala', 'Entebbe', 'Jinja', 'Kigali', 'Musanze', 'Dar es Salaam', 'Zanzibar',
+    'Arusha', 'Moshi', 'Lagos', 'Abuja', 'Accra', 'Cape Coast', 'Cape Town', 'Durban', 'Marrakech',
+]
+# Approximate city centres; seeded listings are scattered up to ~10 km around them
+COORDINATES = {
+    'Nairobi': (-1.286, 36.817), 'Mombasa': (-4.043, 39.668), 'Kisumu': (-0.092, 34.768),
+    'Nakuru': (-0.303, 36.080), 'Mt. Kenya': (-0.152, 37.308), 'Diani': (-4.316, 39.580),
+    'Lamu': (-2.269, 40.902), 'Naivasha': (-0.717, 36.431), 'Addis Ababa': (9.030, 38.740),
+    'Bahir Dar': (11.594, 37.390), 'Gondar': (12.600, 37.467), 'Lalibela': (12.032, 39.041),
+    'Hawassa': (7.062, 38.476), 'Dire Dawa': (9.593, 41.866), 'Kampala': (0.348, 32.582),
+    'Entebbe': (0.051, 32.463), 'Jinja': (0.424, 33.204), 'Kigali': (-1.944, 30.062),
+    'Musanze': (-1.500, 29.634), 'Dar es Salaam': (-6.792, 39.208), 'Zanzibar': (-6.165, 39.199),
+    'Arusha': (-3.387, 36.683), 'Moshi': (-3.350, 37.333), 'Lagos': (6.524, 3.379),
+    'Abuja': (9.077, 7.399), 'Accra': (5.604, -0.187), 'Cape Coast': (5.106, -1.247),
+    'Cape Town': (-33.925, 18.424), 'Durban': (-29.858, 31.022), 'Marrakech': (31.629, -7.981),
+}
+# Zipf-like popularity: a few cities hold most of the listings
+LOCATION_WEIGHTS = [1 / (rank + 1) for rank in range(len(LOCATIONS))]
+PROPERTY_TYPES = ['Apartment', 'Villa', 'Cabin', 'Studio', 'Cottage', 'Loft', 'Guest House', 'Bungalow']
+ADJECTIVES = ['Cozy', 'Spacious', 'Modern', 'Quiet', 'Sunny', 'Charming', 'Rustic', 'Luxury']
+FIRST_NAMES = ['Abebe', 'Amina', 'Brian', 'Chipo', 'Daniel', 'Fatuma', 'Grace', 'Hassan', 'Kofi', 'Lulu', 'Mekdes', 'Wanjiru']
+LAST_NAMES = ['Bekele', 'Kamau', 'Mensah', 'Mwangi', 'Okafor', 'Otieno', 'Tesfaye', 'Wanjiku']
+BOOKING_STATUSES = (['confirmed', 'pending', 'canceled'], [70, 10, 20])
+PAYMENT_STATUS_FOR_BOOKING = {'confirmed': 'completed', 'pending': 'processing', 'canceled': 'failed'}
+RATINGS = ([5, 4, 3, 2, 1], [45, 30, 13, 7, 5])
+
+
+def parse_count(value):
+    """Parse counts like ``5000``, ``100k`` or ``1.5M``"""
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = value.strip().lower().replace('_', '')
+    try:
+        if value[-1:] in multipliers:
+            return int(float(value[:-1]) * multipliers[value[-1]])
+        return int(value)
+    except ValueError:
+        raise CommandError(f'Invalid count: {value}')
+
+
 class Command(BaseCommand):
-    help = 'Seed the database with sample listings'
+    help = 'Seed the database with sample listings, or with a large synthetic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=parse_count, default=0, help='e.g. 100k')
+        parser.add_argument('--listings', type=parse_count, default=0, help='e.g. 1M')
+        parser.add_argument('--bookings', type=parse_count, default=0, help='e.g. 5M')
+        parser.add_argument('--reviews', type=parse_count, default=0, help='e.g. 2M')
+        parser.add_argument('--payments', type=parse_count, default=0, help='one payment for each of the first N bookings')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; each seed produces a distinct, reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if any(options[name] for name in ('users', 'listings', 'bookings', 'reviews', 'payments')):
+            return self.seed_at_scale(options)
 
-    def handle(self, *args, **kwargs):
         if not User.objects.exists():
             user = User.objects.create_user(username='hostuser', password='password')
         else:
@@ -45,4 +113,197 @@ class Command(BaseCommand):
                     'pricepernight': data['pricepernight'],
                 }
             )
-        self.stdout.write(self.style.SUCCESS('Sample listings seeded.'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Sample listings seeded.'))
+
+    # Bulk mode
+    #
+    # Rows are generated lazily and written with bulk_create in batches, so
+    # memory stays flat regardless of the requested counts. Listing primary
+    # keys and prices are derived from (seed, index) instead of being kept in
+    # memory, which lets bookings and reviews reference any listing.
+
+    def seed_at_scale(self, options):
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(self.seed)
+        self.listings = options['listings']
+        if (options['bookings'] or options['reviews']) and not self.listings:
+            raise CommandError('Bookings and reviews are spread over the seeded listings; pass --listings')
+        if self.listings and Listing.objects.filter(pk=self.listing_pk(0)).exists():
+            raise CommandError(f"Seed {self.seed} was already loaded; use a different --seed")
+
+        self.users = self.seed_users(options['users'])
+        if not self.users:
+            raise CommandError('No users to own listings and bookings; pass --users')
+        self.seed_listings(self.listings)
+        self.seed_bookings(options['bookings'], options['payments'])
+        self.seed_reviews(options['reviews'])
+        if self.listings:
+            rebuild_search_index()
+        if options['reviews']:
+            rebuild_rating_aggregates()
+        if options['payments']:
+            backfill_revenue()
+        self.stdout.write(self.style.SUCCESS(f'Seeded dataset {self.seed}.'))
+
+    def listing_pk(self, index):
+        digest = hashlib.md5(f'{self.seed}:listing:{index}'.encode()).digest()
+        return uuid.UUID(bytes=digest, version=4)
+
+    def listing_price(self, index):
+        rng = random.Random(f'{self.seed}:price:{index}')
+        return Decimal(min(max(rng.lognormvariate(4.4, 0.6), 10), 2000)).quantize(Decimal('0.01'))
+
+    def listing_coordinates(self, index, location):
+        rng = random.Random(f'{self.seed}:coordinates:{index}')
+        latitude, longitude = COORDINATES[location]
+        return round(latitude + rng.uniform(-0.09, 0.09), 6), round(longitude + rng.uniform(-0.09, 0.09), 6)
+
+    def random_user(self):
+        return self.rng.choice(self.users)
+
+    def write_batches(self, label, model, rows, total, **bulk_options):
+        if not total:
+            return
+        start, written, batch = time.perf_counter(), 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                written += self.flush(model, batch, **bulk_options)
+                batch = []
+                self.report(label, written, total, start)
+        if batch:
+            written += self.flush(model, batch, **bulk_options)
+            self.report(label, written, total, start)
+
+    def flush(self, model, batch, **bulk_options):
+        # With DEBUG on Django keeps every statement, and these are large
+        reset_queries()
+        if isinstance(batch[0], tuple):
+            # (parent, children) pairs, written together
+            with transaction.atomic():
+                model.objects.bulk_create([parent for parent, _ in batch], **bulk_options)
+                for child_model in {type(c) for _, children in batch for c in children}:
+                    child_model.objects.bulk_create(
+                        [c for _, children in batch for c in children if type(c) is child_model],
+                        batch_size=self.batch_size,
+                    )
+        else:
+            model.objects.bulk_create(batch, **bulk_options)
+        return len(batch)
+
+    def report(self, label, written, total, start):
+        elapsed = time.perf_counter() - start
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(f'{label}: {written}/{total} ({rate:,.0f} rows/s)')
+
+    def seed_users(self, count):
+        """Create ``count`` users and return the ids to draw owners and guests from"""
+        if not count:
+            return list(User.objects.values_list('pk', flat=True))
+
+        first_id = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        password = make_password(None)
+
+        def rows():
+            for i in range(count):
+                username = f'seed{self.seed}_{i}'
+                yield User(
+                    id=first_id + i, username=username, email=f'{username}@example.com', password=password,
+                    first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                )
+
+        self.write_batches('users', User, rows(), count)
+        # Explicit ids do not advance PostgreSQL sequences
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User]):
+                cursor.execute(sql)
+        return range(first_id, first_id + count)
+
+    def seed_listings(self, count):
+        def rows():
+            for i in range(count):
+                location = self.rng.choices(LOCATIONS, LOCATION_WEIGHTS)[0]
+                kind = self.rng.choice(PROPERTY_TYPES)
+                latitude, longitude = self.listing_coordinates(i, location)
+                yield Listing(
+                    property_id=self.listing_pk(i),
+                    host_id=self.random_user(),
+                    name=f'{self.rng.choice(ADJECTIVES)} {kind} in {location}',
+                    description=f'A {kind.lower()} in {location} sleeping {self.rng.randint(1, 8)}.',
+                    location=location,
+                    pricepernight=self.listing_price(i),
+                    # bulk_create skips Listing.save, which derives the geohash
+                    latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude),
+                )
+
+        self.write_batches('listings', Listing, rows(), count)
+
+    def seed_bookings(self, count, payments):
+        """
+        Spread ``count`` bookings over the listings without overlaps
+
+        Each listing gets a run of back-to-back stays separated by random gaps,
+        starting up to a year in the past; active bookings get their
+        BookedNight rows like Booking.save() would.
+        """
+        today = timezone.now().date()
+
+        def rows():
+            made = 0
+            per_listing, extra = divmod(count, self.listings)
+            for index in range(self.listings):
+                listing_pk, price = self.listing_pk(index), self.listing_price(index)
+                day = today - timedelta(days=self.rng.randint(0, 365))
+                for _ in range(per_listing + (index < extra)):
+                    day += timedelta(days=self.rng.randint(0, 21))
+                    nights = min(int(self.rng.expovariate(1 / 3)) + 1, 28)
+                    status = self.rng.choices(*BOOKING_STATUSES)[0]
+                    booking = Booking(
+                        booking_id=uuid.UUID(int=self.rng.getrandbits(128), version=4),
+                        property_id=listing_pk, user_id=self.random_user(), status=status,
+                        check_in_date=day, check_out_date=day + timedelta(days=nights),
+                        total_amount=price * nights,
+                    )
+                    children = []
+                    if status in Booking.ACTIVE_STATUSES:
+                        children += [
+                            BookedNight(listing_id=listing_pk, night=night, booking_id=booking.booking_id)
+                            for night in booking.get_nights()
+                        ]
+                    if made < payments:
+                        children.append(self.payment_for(booking))
+                    made += 1
+                    day += timedelta(days=nights)
+                    yield booking, children
+
+        self.write_batches('bookings', Booking, rows(), count)
+
+    def payment_for(self, booking):
+        status = PAYMENT_STATUS_FOR_BOOKING[booking.status]
+        paid_at = timezone.now() - timedelta(minutes=self.rng.randint(0, 60 * 24 * 365))
+        tx_ref = f'tx_{booking.booking_id.hex[:16]}'
+        return Payment(
+            booking_ref_id=booking.booking_id,
+            amount=booking.total_amount,
+            payment_status=status,
+            payment_method=self.rng.choices(['chapa', 'mobile_money', 'credit_card', 'bank_transfer'], [70, 15, 10, 5])[0],
+            transaction_id=tx_ref,
+            chapa_transaction_id=tx_ref,
+            payment_date=paid_at if status == 'completed' else None,
+            payment_description=f'Payment for booking {booking.booking_id}',
+            failure_reason='Payment failed' if status == 'failed' else '',
+        )
+
+    def seed_reviews(self, count):
+        def rows():
+            for _ in range(count):
+                rating = self.rng.choices(*RATINGS)[0]
+                yield Review(
+                    property_id=self.listing_pk(self.rng.randrange(self.listings)),
+                    user_id=self.random_user(),
+                    rating=rating,
+                    comment='' if self.rng.random() < 0.3 else f'{rating} stars, would stay again.',
+                )
+
+        self.write_batches('reviews', Review, rows(), count)
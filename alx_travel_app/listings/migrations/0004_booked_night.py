@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:13
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_booked_nights(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    BookedNight = apps.get_model('listings', 'BookedNight')
+    batch = []
+    for booking in Booking.objects.filter(status__in=['pending', 'confirmed']).order_by('created_at').iterator():
+        nights = (booking.check_out_date - booking.check_in_date).days
+        batch += [
+            BookedNight(listing_id=booking.property_id, night=booking.check_in_date + timedelta(days=i), booking=booking)
+            for i in range(nights)
+        ]
+        if len(batch) >= 1000:
+            BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    # Pre-existing overlaps cannot be represented; the earliest booking keeps the night.
+    BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_listing_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.booking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.listing')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookednight',
+            constraint=models.UniqueConstraint(fields=('listing', 'night'), name='unique_listing_night'),
+        ),
+        migrations.RunPython(backfill_booked_nights, migrations.RunPython.noop),
+    ]
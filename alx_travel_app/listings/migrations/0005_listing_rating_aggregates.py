@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:15
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Round
+
+
+def compute_rating_aggregates(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Review = apps.get_model('listings', 'Review')
+    reviews = Review.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    Listing.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), 0),
+        rating_total=Coalesce(Subquery(reviews.annotate(t=Sum('rating')).values('t')), 0),
+        avg_rating=Coalesce(
+            Subquery(reviews.annotate(a=Round(
+                Cast(Cast(Sum('rating'), FloatField()) / Count('pk'), DecimalField(max_digits=3, decimal_places=2)), 2,
+            )).values('a')),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_booked_night'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['avg_rating', 'property_id'], name='listing_rating_idx'),
+        ),
+        migrations.RunPython(compute_rating_aggregates, migrations.RunPython.noop),
+    ]
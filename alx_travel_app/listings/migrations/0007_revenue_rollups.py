@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:51
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+import django.db.models.deletion
+
+
+def compute_revenue_rollups(apps, schema_editor):
+    Payment = apps.get_model('listings', 'Payment')
+    HourlyRevenue = apps.get_model('listings', 'HourlyRevenue')
+    DailyRevenue = apps.get_model('listings', 'DailyRevenue')
+    refunded = Q(payment_status='refunded')
+    hours = Payment.objects.filter(payment_status__in=['completed', 'refunded']).annotate(
+        hour=TruncHour(Coalesce('payment_date', 'created_at'), tzinfo=timezone.utc),
+    ).values('hour', 'currency', 'payment_method', listing_id=F('booking_ref__property_id')).annotate(
+        gross=Sum('amount'),
+        refunded=Sum(Case(When(refunded, then='amount'), default=Value(0), output_field=DecimalField())),
+        payments=Count('pk'),
+        refunds=Count('pk', filter=refunded),
+    ).order_by()
+    HourlyRevenue.objects.bulk_create((HourlyRevenue(**row) for row in hours.iterator()), batch_size=5000)
+    days = HourlyRevenue.objects.annotate(day=TruncDate('hour', tzinfo=timezone.utc)).values(
+        'day', 'currency', 'payment_method', 'listing_id',
+    ).annotate(
+        sum_gross=Sum('gross'), sum_refunded=Sum('refunded'), sum_payments=Sum('payments'), sum_refunds=Sum('refunds'),
+    ).order_by()
+    DailyRevenue.objects.bulk_create((
+        DailyRevenue(**{key.removeprefix('sum_'): value for key, value in row.items()}) for row in days.iterator()
+    ), batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_webhook_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('payment_method', models.CharField(max_length=20)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments', models.IntegerField(default=0)),
+                ('refunds', models.IntegerField(default=0)),
+                ('hour', models.DateTimeField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listings.listing')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('payment_method', models.CharField(max_length=20)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments', models.IntegerField(default=0)),
+                ('refunds', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listings.listing')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyrevenue',
+            constraint=models.UniqueConstraint(fields=('hour', 'currency', 'payment_method', 'listing'), name='unique_hourly_revenue'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('day', 'currency', 'payment_method', 'listing'), name='unique_daily_revenue'),
+        ),
+        migrations.RunPython(compute_revenue_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_revenue_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='chapa_transaction_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at', 'booking_id'], name='booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['created_at', 'payment_id'], name='payment_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_admin_indexes'),
+    ]
+
+    operations = [
+        # Add the composite indexes before dropping the foreign key indexes they replace
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', 'check_in_date', 'check_out_date'], name='booking_property_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'created_at'], name='booking_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['booking_ref', 'created_at'], name='payment_booking_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('payment_status', 'processing')), fields=['payment_status', 'payment_id'], name='payment_processing_idx'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='property',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='listings.listing'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='booking_ref',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='listings.booking'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import uuid
+
+from django.db import migrations
+
+# See listings.search. The index lives outside the model state: an FTS5
+# table on SQLite, a generated column with a GIN index on PostgreSQL.
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE listings_listing_fts USING fts5(
+    property_id UNINDEXED, name, location, description,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+)
+"""
+SQLITE_DROP = 'DROP TABLE listings_listing_fts'
+POSTGRESQL_CREATE = """
+ALTER TABLE listings_listing ADD COLUMN search_document tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', name), 'A') ||
+    setweight(to_tsvector('simple', location), 'B') ||
+    setweight(to_tsvector('simple', description), 'C')
+) STORED;
+CREATE INDEX listing_search_idx ON listings_listing USING GIN (search_document);
+"""
+POSTGRESQL_DROP = 'ALTER TABLE listings_listing DROP COLUMN search_document'
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_CREATE)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        Listing = apps.get_model('listings', 'Listing')
+        rows = Listing.objects.using(schema_editor.connection.alias).values_list(
+            'pk', 'name', 'location', 'description',
+        )
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO listings_listing_fts (rowid, property_id, name, location, description) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                # rowid as in listings.search.fts_rowid
+                [(uuid.UUID(str(pk)).int >> 65, uuid.UUID(str(pk)).hex, *text) for pk, *text in rows.iterator()],
+            )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_DROP)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_rate_seasons'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from datetime import timedelta
 import uuid
 
+from .geo import encode_geohash
+
 User = get_user_model()
 
 
@@ -13,20 +18,87 @@ class Listing(models.Model):
     description = models.TextField(null=False)
     location = models.CharField(max_length=255, null=False)
     pricepernight = models.DecimalField(max_digits=10, decimal_places=2, null=False)
+    # Friday and Saturday nights; pricepernight when unset
+    weekend_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)],
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)],
+    )
+    # Derived from the coordinates on save, for proximity search (see listings.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Review aggregates, maintained incrementally by listings.signals
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listing search: location filter + price range/order, and keyset pagination
+            models.Index(fields=['location', 'pricepernight', 'property_id'], name='listing_loc_price_idx'),
+            models.Index(fields=['pricepernight', 'property_id'], name='listing_price_idx'),
+            models.Index(fields=['created_at', 'property_id'], name='listing_created_idx'),
+            models.Index(fields=['avg_rating', 'property_id'], name='listing_rating_idx'),
+            # Proximity search: one range scan per covering geohash cell, with
+            # the coordinates to check candidates without reading the table
+            models.Index(fields=['geohash', 'latitude', 'longitude'], name='listing_geohash_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        # The listing and its search entry (listings.signals) are written together
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class RateSeason(models.Model):
+    """
+    A listing's nightly rates over a range of nights
+
+    Together with the listing's own rates these make up its pricing
+    calendar (see ``listings.pricing``). Where seasons overlap, the one that
+    starts latest applies, so a holiday week can sit inside a high season.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='rate_seasons')
+    name = models.CharField(max_length=100, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField(help_text='Last night of the season')
+    pricepernight = models.DecimalField(max_digits=10, decimal_places=2)
+    weekend_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        ordering = ['start_date']
+        indexes = [models.Index(fields=['listing', 'start_date'], name='rate_season_listing_idx')]
+        constraints = [
+            models.CheckConstraint(check=models.Q(end_date__gte=models.F('start_date')), name='rate_season_dates'),
+        ]
+
+    def __str__(self):
+        return f"{self.name or 'Season'} {self.start_date} - {self.end_date}: {self.pricepernight}"
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
         ('canceled', 'Canceled'),
     ]
+    # Statuses that hold the booked nights
+    ACTIVE_STATUSES = ('pending', 'confirmed')
     booking_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
-    property = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bookings')
+    # Indexed by booking_property_dates_idx
+    property = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='bookings', db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     check_in_date = models.DateField()
@@ -35,6 +107,16 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Admin changelist order and date drill-down
+            models.Index(fields=['created_at', 'booking_id'], name='booking_created_idx'),
+            # A listing's bookings by stay dates; also serves the property foreign key
+            models.Index(fields=['property', 'check_in_date', 'check_out_date'], name='booking_property_dates_idx'),
+            # Admin status filter in created_at order
+            models.Index(fields=['status', 'created_at'], name='booking_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.property} ({self.status})"
     
@@ -42,6 +124,58 @@ class Booking(models.Model):
         """Calculate total nights for the booking"""
         return (self.check_out_date - self.check_in_date).days
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._reserved = instance._reservation()
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The booking and its BookedNight rows are written together; the
+        # unique (listing, night) constraint rejects overlapping bookings.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            reservation = self._reservation()
+            if reservation != getattr(self, '_reserved', None):
+                self.booked_nights.all().delete()
+                if self.status in self.ACTIVE_STATUSES:
+                    BookedNight.objects.bulk_create(
+                        BookedNight(listing_id=self.property_id, night=night, booking=self)
+                        for night in self.get_nights()
+                    )
+                self._reserved = reservation
+
+    def get_nights(self):
+        """Dates of every night of the stay"""
+        return [self.check_in_date + timedelta(days=i) for i in range(self.get_total_nights())]
+
+    def _reservation(self):
+        fields = self.__dict__
+        if 'status' not in fields or 'check_in_date' not in fields or 'check_out_date' not in fields:
+            return None
+        return (self.status in self.ACTIVE_STATUSES, fields.get('property_id'), self.check_in_date, self.check_out_date)
+
+
+class BookedNight(models.Model):
+    """
+    One row per night held by a pending or confirmed booking
+
+    Answers "is this listing free from X to Y" with a range scan on the
+    unique (listing, night) index, and makes double bookings impossible at
+    the database level.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='booked_nights')
+    night = models.DateField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booked_nights')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'night'], name='unique_listing_night'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} {self.night}"
+
 class Review(models.Model):
     property = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -50,6 +184,12 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted = (instance.__dict__.get('property_id'), instance.__dict__.get('rating'))
+        return instance
+
     def clean(self):
         if not (1 <= self.rating <= 5):
             from django.core.exceptions import ValidationError
@@ -77,12 +217,13 @@ class Payment(models.Model):
     ]
     
     payment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
-    booking_ref = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="payments")
+    # Indexed by payment_booking_created_idx
+    booking_ref = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="payments", db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2, null=False)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='chapa')
     transaction_id = models.CharField(max_length=255, unique=True, blank=True)
-    chapa_transaction_id = models.CharField(max_length=255, blank=True)
+    chapa_transaction_id = models.CharField(max_length=255, blank=True, db_index=True)
     payment_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -96,9 +237,45 @@ class Payment(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Payment'
         verbose_name_plural = 'Payments'
+        indexes = [
+            # Default ordering, admin date drill-down
+            models.Index(fields=['created_at', 'payment_id'], name='payment_created_idx'),
+            # A booking's payments, newest first; also serves the booking_ref foreign key
+            models.Index(fields=['booking_ref', 'created_at'], name='payment_booking_created_idx'),
+            # Admin status filter in created_at order, revenue backfill
+            models.Index(fields=['payment_status', 'created_at'], name='payment_status_created_idx'),
+            # Payments awaiting reconciliation, a small share of the table
+            models.Index(
+                fields=['payment_status', 'payment_id'], name='payment_processing_idx',
+                condition=models.Q(payment_status='processing'),
+            ),
+        ]
     
     def __str__(self):
         return f"Payment {self.payment_id} - {self.booking_ref} ({self.payment_status})"
+
+    REVENUE_STATUSES = ('completed', 'refunded')
+    REVENUE_FIELDS = (
+        'payment_status', 'amount', 'currency', 'payment_method', 'booking_ref_id', 'payment_date', 'created_at',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the stored row adds to the revenue rollups, unless
+        # some of the fields were deferred (listings.signals loads them then)
+        if all(name in instance.__dict__ for name in cls.REVENUE_FIELDS):
+            instance._revenue = instance.revenue_entry()
+        return instance
+
+    def revenue_entry(self):
+        """What this payment adds to the revenue rollups, or None (see ``listings.revenue``)"""
+        if self.payment_status not in self.REVENUE_STATUSES:
+            return None
+        return (
+            self.payment_status, self.amount, self.currency, self.payment_method,
+            self.booking_ref_id, self.payment_date or self.created_at,
+        )
     
     def is_successful(self):
         """Check if payment is successful"""
@@ -107,4 +284,110 @@ class Payment(models.Model):
     def can_be_refunded(self):
         """Check if payment can be refunded"""
         return self.payment_status == 'completed' and self.amount > 0
-    
\ No newline at end of file
+
+
+class Task(models.Model):
+    """
+    Background job stored in the database and executed by ``run_tasks``
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx')]
+
+    def __str__(self):
+        return f"{self.key} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Raw payment callback from Chapa, stored once per (tx_ref, signature)
+
+    Events are processed in arrival order by ``run_tasks``
+    (see ``listings.webhooks``).
+    """
+    STATUS_CHOICES = [
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+    ]
+
+    tx_ref = models.CharField(max_length=255)
+    signature = models.CharField(max_length=128)
+    event = models.CharField(max_length=50, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='received')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tx_ref', 'signature'], name='unique_webhook_event'),
+        ]
+        indexes = [models.Index(fields=['status', 'id'], name='webhook_status_idx')]
+
+    def __str__(self):
+        return f"{self.event or 'event'} for {self.tx_ref} ({self.status})"
+
+
+class RevenueRollup(models.Model):
+    """
+    Completed and refunded payment totals for one time bucket, currency,
+    payment method and listing
+
+    Kept up to date by ``listings.revenue`` as payments change, and rebuilt
+    with ``manage.py backfill_revenue``.
+    """
+    currency = models.CharField(max_length=3)
+    payment_method = models.CharField(max_length=20)
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments = models.IntegerField(default=0)
+    refunds = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class HourlyRevenue(RevenueRollup):
+    hour = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['hour', 'currency', 'payment_method', 'listing'], name='unique_hourly_revenue',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} {self.currency} {self.payment_method}: {self.gross}"
+
+
+class DailyRevenue(RevenueRollup):
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'currency', 'payment_method', 'listing'], name='unique_daily_revenue',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.currency} {self.payment_method}: {self.gross}"
@@ -0,0 +1,165 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over (ordering field, primary key)
+
+    Each page is a range scan that starts right after the last row of the
+    previous page, so there is no ``COUNT(*)`` and no ``OFFSET`` and deep pages
+    cost the same as the first one. Ties on the ordering field are broken by
+    the primary key, which keeps the order total.
+
+    Views list the orderings clients may request in ``keyset_orderings``; the
+    first one is the default. An ordering may name an annotation of the
+    view's queryset as well as a model field.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        self.field = self.ordering.lstrip('-')
+        self.descending = self.ordering.startswith('-')
+
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        queryset = queryset.order_by(self.ordering, f"{'-' if self.descending else ''}{pk_name}")
+
+        cursor = self.decode_cursor(request, queryset)
+        if cursor is not None:
+            value, pk = cursor
+            lookup = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value})
+                | Q(**{self.field: value, f'{pk_name}__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request, view):
+        orderings = getattr(view, 'keyset_orderings', None) or ('-pk',)
+        ordering = request.query_params.get(self.ordering_query_param, orderings[0])
+        if ordering not in orderings:
+            raise ValidationError({self.ordering_query_param: f"Must be one of: {', '.join(orderings)}"})
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = [
+            str(getattr(self.last_row, self.field)),
+            str(self.last_row.pk),
+        ]
+        cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        model = queryset.model
+        annotation = queryset.query.annotations.get(self.field)
+        field = annotation.output_field if annotation is not None else model._meta.get_field(self.field)
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            value = field.to_python(value)
+            pk = model._meta.pk.to_python(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+
+def estimated_count(model, using):
+    """
+    The database's own estimate of the rows in ``model``'s table, or None
+
+    PostgreSQL and MySQL keep one in their catalogs; SQLite only has one
+    once ``ANALYZE`` has run.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute('SELECT table_rows FROM information_schema.tables '
+                           'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # One row per index, each starting with the table's row count
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that was never analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that skips ``COUNT(*)`` on large unfiltered tables
+
+    Without filters or a search the page count comes from the database's
+    row estimate once that passes ``threshold``; filtered changelists and
+    small tables are counted exactly.
+    """
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
@@ -0,0 +1,131 @@
+"""
+Payment status changes.
+
+Statuses move only along ``TRANSITIONS``. A change is a compare-and-swap:
+``UPDATE ... SET payment_status = new WHERE pk = ... AND payment_status = old``
+with ``old`` the status the payment was read with. When a verify request, a
+webhook-triggered task and ``reconcile_payments`` race on the same payment,
+exactly one of them moves it and the others see nothing updated and stop, so
+a settled payment is never overwritten and only the winner confirms the
+booking and queues the confirmation email. The payment, its booking and the
+revenue rollups are written in one transaction.
+
+``update()`` skips the model signals, so ``transition_many`` adjusts the
+revenue rollups and drops cached payloads itself.
+"""
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_bookings, invalidate_payments
+from .chapa import ChapaError, get_client
+from .models import Booking, Payment
+from .revenue import apply_revenue_changes
+
+# Status -> statuses it may move to, over Payment.PAYMENT_STATUS_CHOICES
+TRANSITIONS = {
+    'pending': {'processing', 'completed', 'failed', 'cancelled'},
+    'processing': {'completed', 'failed', 'cancelled'},
+    'completed': {'refunded'},
+    'failed': set(),
+    'cancelled': set(),
+    'refunded': set(),
+}
+
+
+class InvalidTransition(ValueError):
+    """Raised for a status change that ``TRANSITIONS`` does not allow"""
+
+
+def gateway_status(tx_ref, client=None):
+    """
+    Return the ``data`` section of Chapa's verify response for ``tx_ref``
+
+    Raises ``ChapaError`` if the gateway is unreachable or does not report
+    success for the lookup itself.
+    """
+    response = (client or get_client()).verify(tx_ref)
+    if response.status_code != 200:
+        raise ChapaError(f"HTTP {response.status_code}: {response.text}")
+
+    chapa_response = response.json()
+    if chapa_response.get('status') != 'success':
+        raise ChapaError(chapa_response.get('message', 'Verification failed'))
+    return chapa_response['data']
+
+
+def gateway_outcome(payment_data, now=None):
+    """
+    The ``(status, fields)`` gateway ``payment_data`` settles a payment with
+
+    ``None`` when the gateway has not settled the transaction yet.
+    """
+    status = payment_data.get('status')
+    if status == 'success':
+        return 'completed', {'payment_date': now or timezone.now()}
+    if status == 'failed':
+        return 'failed', {'failure_reason': payment_data.get('message', 'Payment failed')}
+    return None
+
+
+def _swap(payment, status, fields, now):
+    """
+    Move ``payment`` from the status it was read with to ``status``
+
+    Returns its ``(before, after)`` revenue entries, or None when the stored
+    status had already changed. The instance is updated on success only.
+    """
+    previous = payment.payment_status
+    if status not in TRANSITIONS[previous]:
+        raise InvalidTransition(f"Payment {payment.pk} cannot go from {previous} to {status}")
+    moved = Payment.objects.filter(pk=payment.pk, payment_status=previous).update(
+        payment_status=status, updated_at=now, **fields,
+    )
+    if not moved:
+        return None
+
+    before = payment._revenue if hasattr(payment, '_revenue') else payment.revenue_entry()
+    payment.payment_status = status
+    payment.updated_at = now
+    for name, value in fields.items():
+        setattr(payment, name, value)
+    payment._revenue = payment.revenue_entry()
+    return before, payment._revenue
+
+
+def transition_many(changes, now=None):
+    """
+    Apply ``(payment, status, fields)`` changes
+
+    Returns the payments this call moved; the others had been moved by
+    someone else since they were read and are left as stored. Bookings of
+    completed payments are confirmed, unless they were canceled meanwhile,
+    in the same transaction as the payments.
+    """
+    now = now or timezone.now()
+    moved, revenue, confirmed = [], [], []
+    # Only moves into a revenue status write more than the payment row; a
+    # lone UPDATE is atomic already. No savepoint inside a caller's transaction.
+    writes_more = any(status in Payment.REVENUE_STATUSES for _, status, _ in changes)
+    with transaction.atomic(savepoint=False) if writes_more else nullcontext():
+        for payment, status, fields in changes:
+            entries = _swap(payment, status, fields, now)
+            if entries is None:
+                continue
+            moved.append(payment)
+            revenue.append(entries)
+            if status == 'completed':
+                confirmed.append(payment.booking_ref_id)
+        Booking.objects.filter(pk__in=confirmed, status='pending').update(status='confirmed', updated_at=now)
+        apply_revenue_changes(revenue)
+    invalidate_payments(
+        payment_ids=[payment.pk for payment in moved], booking_ids=[payment.booking_ref_id for payment in moved],
+    )
+    invalidate_bookings(confirmed)
+    return moved
+
+
+def transition(payment, status, now=None, **fields):
+    """Move ``payment`` to ``status``; returns False if another writer moved it first"""
+    return bool(transition_many([(payment, status, fields)], now=now))
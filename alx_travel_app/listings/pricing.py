@@ -0,0 +1,123 @@
+"""
+Stay quotes from each listing's pricing calendar.
+
+A night costs the listing's ``pricepernight``, or its ``weekend_price`` on
+Friday and Saturday nights when one is set. A ``RateSeason`` covering the
+night replaces both with its own rates.
+
+Quotes are memoized in the API cache per listing and date range for
+``QUOTE_CACHE_TTL`` seconds. Their keys include a per-listing version token
+that is replaced once a change to the listing's rates commits (see
+``listings.signals``), so a quote computed from old rates is never read
+again and nothing has to be deleted. Code that changes rates with
+``update()`` or ``bulk_create`` must call ``invalidate_quotes`` itself.
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+
+from .cache import get_cache
+from .models import Listing, RateSeason
+
+# date.weekday() of the nights that take weekend_price
+WEEKEND_NIGHTS = (4, 5)
+# Listing fields a quote depends on
+PRICING_FIELDS = ('pricepernight', 'weekend_price')
+
+
+def nightly_prices(listing, seasons, check_in, check_out):
+    """Price of each night from ``check_in`` up to ``check_out``"""
+    # The latest-starting season wins where several cover a night
+    seasons = sorted(seasons, key=lambda season: season.start_date, reverse=True)
+    prices = []
+    for i in range((check_out - check_in).days):
+        night = check_in + timedelta(days=i)
+        rates = next((season for season in seasons if season.start_date <= night <= season.end_date), listing)
+        if night.weekday() in WEEKEND_NIGHTS and rates.weekend_price is not None:
+            prices.append(rates.weekend_price)
+        else:
+            prices.append(rates.pricepernight)
+    return prices
+
+
+def build_quote(listing, seasons, check_in, check_out):
+    nightly = nightly_prices(listing, seasons, check_in, check_out)
+    return {
+        'listing': listing.pk,
+        'check_in': check_in,
+        'check_out': check_out,
+        'nights': len(nightly),
+        'total': sum(nightly, Decimal(0)),
+        'nightly': nightly,
+    }
+
+
+def _seasons(listing_ids, check_in, check_out):
+    by_listing = defaultdict(list)
+    for season in RateSeason.objects.filter(
+        listing_id__in=listing_ids, start_date__lt=check_out, end_date__gte=check_in,
+    ):
+        by_listing[season.listing_id].append(season)
+    return by_listing
+
+
+def quote_stay(listing, check_in, check_out):
+    """Price a stay from the database, skipping the cache (e.g. when booking it)"""
+    return build_quote(listing, _seasons([listing.pk], check_in, check_out)[listing.pk], check_in, check_out)
+
+
+def quote_version_key(listing_id):
+    return f'quote-version:{listing_id}'
+
+
+def quote_key(listing_id, version, check_in, check_out):
+    return f'quote:{listing_id}:{version}:{check_in:%Y%m%d}:{check_out:%Y%m%d}'
+
+
+def _versions(cache, listing_ids):
+    keys = {listing_id: quote_version_key(listing_id) for listing_id in listing_ids}
+    found = cache.get_many(keys.values())
+    for key in set(keys.values()) - set(found):
+        # Never set, or evicted: start a new version so no older quote matches
+        cache.add(key, uuid.uuid4().hex, None)
+        found[key] = cache.get(key)
+    return {listing_id: found[key] for listing_id, key in keys.items()}
+
+
+def quote_many(listing_ids, check_in, check_out):
+    """
+    Quote a stay at each of ``listing_ids``, keyed by listing id
+
+    Unknown listings are left out. Cached quotes cost two cache reads for
+    the whole batch; the rest are priced with two queries and cached.
+    Creating a listing retires its version, so it does not stay unknown.
+    """
+    cache = get_cache()
+    versions = _versions(cache, listing_ids)
+    keys = {
+        listing_id: quote_key(listing_id, versions[listing_id], check_in, check_out)
+        for listing_id in listing_ids
+    }
+    cached = cache.get_many(keys.values())
+    quotes = {listing_id: cached[key] for listing_id, key in keys.items() if key in cached}
+
+    missing = [listing_id for listing_id in listing_ids if listing_id not in quotes]
+    if missing:
+        listings = Listing.objects.filter(pk__in=missing).only('property_id', *PRICING_FIELDS)
+        seasons = _seasons(missing, check_in, check_out)
+        priced = dict.fromkeys(missing)  # None marks an unknown listing, memoized too
+        priced.update(
+            (listing.pk, build_quote(listing, seasons[listing.pk], check_in, check_out)) for listing in listings
+        )
+        cache.set_many({keys[listing_id]: quote for listing_id, quote in priced.items()}, settings.QUOTE_CACHE_TTL)
+        quotes.update(priced)
+    return {listing_id: quote for listing_id, quote in quotes.items() if quote is not None}
+
+
+def invalidate_quotes(listing_ids):
+    """Make every memoized quote for ``listing_ids`` unreachable"""
+    if listing_ids:
+        get_cache().set_many({quote_version_key(listing_id): uuid.uuid4().hex for listing_id in listing_ids}, None)
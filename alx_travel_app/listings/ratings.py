@@ -0,0 +1,53 @@
+"""
+Denormalized review aggregates on ``Listing``.
+
+``review_count``, ``rating_total`` and ``avg_rating`` are adjusted with a
+single conditional UPDATE per review change (see ``listings.signals``), so
+reading or sorting by rating never has to aggregate the reviews table.
+"""
+from django.db.models import Case, Count, DecimalField, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from .models import Listing, Review
+
+
+def _average(total, count):
+    # PostgreSQL has no ROUND(double precision, integer), so round a numeric;
+    # dividing as float first keeps SQLite off integer division
+    return Round(Cast(Cast(total, FloatField()) / count, DecimalField(max_digits=3, decimal_places=2)), 2)
+
+
+def adjust_listing_rating(listing_id, count_delta, total_delta):
+    """Apply a review being added (+1, +rating) or removed (-1, -rating)"""
+    count = F('review_count') + count_delta
+    total = F('rating_total') + total_delta
+    Listing.objects.filter(pk=listing_id).update(
+        review_count=count,
+        rating_total=total,
+        avg_rating=Case(
+            # Conditions see the old row, so this is "new count <= 0"
+            When(review_count__lte=-count_delta, then=Value(0.0)),
+            default=_average(total, count),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def rebuild_rating_aggregates(listings=None):
+    """
+    Recompute the aggregates from the reviews table in one UPDATE
+
+    Returns the number of listings updated.
+    """
+    reviews = Review.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    count = Coalesce(Subquery(reviews.annotate(c=Count('pk')).values('c')), 0)
+    total = Coalesce(Subquery(reviews.annotate(t=Sum('rating')).values('t')), 0)
+    return (listings if listings is not None else Listing.objects.all()).update(
+        review_count=count,
+        rating_total=total,
+        avg_rating=Coalesce(
+            Subquery(reviews.annotate(a=_average(Sum('rating'), Count('pk'))).values('a')),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
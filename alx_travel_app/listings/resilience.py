@@ -0,0 +1,165 @@
+"""
+Circuit breaker and rate limiter for calls to external services.
+
+Both keep their state in the cache, so with a shared backend (Redis,
+Memcached) every worker process sees the same circuit and draws from the
+same call budget; with the default ``LocMemCache`` each process only
+protects itself (``listings.checks`` warns about this). Decisions rest on
+atomic cache operations (``add`` and ``incr``), so concurrent workers
+cannot, for example, send more than one probe through a half-open circuit.
+"""
+import math
+import time
+
+from alx_travel_app.metrics import REGISTRY
+
+CALLS_REJECTED = REGISTRY.counter(
+    'outbound_calls_rejected_total', 'Outbound calls refused without being sent.', ('service', 'reason'),
+)
+CIRCUIT_OPENED = REGISTRY.counter(
+    'circuit_breaker_opened_total', 'Times a circuit breaker opened.', ('service',),
+)
+
+
+class Rejected(Exception):
+    """Raised instead of making a call the breaker or limiter refused"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Rejected):
+    pass
+
+
+class RateLimited(Rejected):
+    pass
+
+
+def _incr(cache, key, timeout):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.add(key, 1, timeout)
+        return 1
+
+
+class CircuitBreaker:
+    """
+    Stop calling a service that keeps failing
+
+    Closed, every call goes ahead. ``failure_threshold`` failures in a row
+    (exceptions, calls marked failed, or calls slower than ``slow_call``
+    seconds) open the circuit: calls are refused for ``reset_timeout``
+    seconds. The circuit is then half-open and lets a single probe through;
+    its success closes the circuit and its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, cache, failure_threshold=5, reset_timeout=30.0, slow_call=None):
+        self.name = name
+        self.cache = cache
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call = slow_call
+        self.failures_key = f'breaker:{name}:failures'
+        self.opened_key = f'breaker:{name}:opened'
+        self.probe_key = f'breaker:{name}:probe'
+
+    @property
+    def state(self):
+        opened = self.cache.get(self.opened_key)
+        if opened is None:
+            return self.CLOSED
+        return self.OPEN if time.time() - opened < self.reset_timeout else self.HALF_OPEN
+
+    def call(self):
+        """
+        Return a context manager for one call, or raise ``CircuitOpen``
+
+        Leaving the block with an exception, or after ``fail()``, counts as
+        a failure.
+        """
+        opened = self.cache.get(self.opened_key)
+        probe = False
+        if opened is not None:
+            remaining = opened + self.reset_timeout - time.time()
+            # The probe slot expires too, in case its worker dies mid-call
+            if remaining > 0 or not self.cache.add(self.probe_key, 1, math.ceil(self.reset_timeout)):
+                CALLS_REJECTED.inc(service=self.name, reason='circuit_open')
+                raise CircuitOpen(f'{self.name} circuit is open', max(remaining, 0))
+            probe = True
+        return _Call(self, probe)
+
+    def record(self, ok, probe=False):
+        if ok:
+            if probe:
+                self.reset()
+            else:
+                self.cache.delete(self.failures_key)
+        elif probe or _incr(self.cache, self.failures_key, math.ceil(self.reset_timeout)) >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        """Open the circuit now"""
+        self.cache.set(self.opened_key, time.time(), None)
+        self.cache.delete_many([self.failures_key, self.probe_key])
+        CIRCUIT_OPENED.inc(service=self.name)
+
+    def reset(self):
+        """Close the circuit and forget past failures"""
+        self.cache.delete_many([self.failures_key, self.opened_key, self.probe_key])
+
+
+class _Call:
+
+    def __init__(self, breaker, probe):
+        self.breaker = breaker
+        self.probe = probe
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        slow_call = self.breaker.slow_call
+        slow = slow_call is not None and time.perf_counter() - self.start > slow_call
+        self.breaker.record(exc_type is None and not self.failed and not slow, self.probe)
+        return False
+
+
+class FixedWindowLimiter:
+    """
+    Allow ``rate`` calls per second on average, in bursts of up to ``burst``
+
+    Time is cut into fixed windows of ``burst / rate`` seconds and each
+    window admits ``burst`` calls. Unlike a token bucket, nothing smooths
+    the edges: ``burst`` calls at the end of one window and ``burst`` at the
+    start of the next can go out back to back. In exchange a window is a
+    single ``incr``, which stays exact across processes.
+    """
+
+    def __init__(self, name, cache, rate, burst=None):
+        self.name = name
+        self.cache = cache
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate))
+        self.period = self.burst / rate
+
+    def acquire(self):
+        """Count a call or raise ``RateLimited``"""
+        now = time.time()
+        window = int(now // self.period)
+        key = f'ratelimit:{self.name}:{window}'
+        if _incr(self.cache, key, math.ceil(self.period) + 1) > self.burst:
+            CALLS_REJECTED.inc(service=self.name, reason='rate_limited')
+            raise RateLimited(f'{self.name} rate limit exceeded', (window + 1) * self.period - now)
@@ -0,0 +1,175 @@
+"""
+Pre-aggregated revenue for the finance dashboards.
+
+``HourlyRevenue`` and ``DailyRevenue`` hold completed and refunded payment
+totals per bucket (UTC), currency, payment method and listing. A payment
+counts once it is ``completed``, in the bucket of its ``payment_date``;
+refunding it adds its amount to ``refunded`` in that same bucket, so net
+revenue is ``gross - refunded``. The rollups are adjusted with an
+incremental UPDATE whenever a payment's contribution changes (see
+``listings.signals``); code that writes payments with ``bulk_create``,
+``bulk_update`` or ``update()`` must call ``apply_revenue_changes`` itself,
+or rebuild the affected days with ``manage.py backfill_revenue``.
+
+Reading a time series touches rollup rows only, so its cost depends on
+the range and the number of listings with revenue, not on payment volume.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncHour
+
+from .models import Booking, DailyRevenue, HourlyRevenue, Payment
+
+# Granularity -> rollup model; the bucket field is named after the granularity
+ROLLUPS = {'hour': HourlyRevenue, 'day': DailyRevenue}
+TOTALS = ('gross', 'refunded', 'payments', 'refunds')
+
+
+def _hour(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _midnight(day):
+    return datetime.combine(day, time.min, dt_timezone.utc)
+
+
+def apply_revenue_changes(changes):
+    """
+    Move payments' contributions in the rollups
+
+    ``changes`` holds ``(before, after)`` pairs of ``Payment.revenue_entry()``
+    values, either of which may be None.
+    """
+    booking_ids = {entry[4] for pair in changes for entry in pair if entry is not None}
+    if not booking_ids:
+        return
+    listings = dict(Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'property_id'))
+
+    deltas = {'hour': defaultdict(lambda: [Decimal(0), Decimal(0), 0, 0]),
+              'day': defaultdict(lambda: [Decimal(0), Decimal(0), 0, 0])}
+    for before, after in changes:
+        for entry, sign in ((before, -1), (after, 1)):
+            if entry is None:
+                continue
+            status, amount, currency, method, booking_id, paid_at = entry
+            hour = _hour(paid_at)
+            refunded = status == 'refunded'
+            for bucket in (('hour', hour), ('day', hour.date())):
+                delta = deltas[bucket[0]][(bucket[1], currency, method, listings[booking_id])]
+                delta[0] += sign * Decimal(amount)
+                delta[1] += sign * Decimal(amount) if refunded else 0
+                delta[2] += sign
+                delta[3] += sign if refunded else 0
+
+    with transaction.atomic():
+        for bucket_field, model in ROLLUPS.items():
+            for (bucket, currency, method, listing_id), delta in sorted(deltas[bucket_field].items()):
+                if any(delta):
+                    _add(model, {
+                        bucket_field: bucket, 'currency': currency,
+                        'payment_method': method, 'listing_id': listing_id,
+                    }, dict(zip(TOTALS, delta)))
+
+
+def _add(model, key, delta):
+    increments = {name: F(name) + value for name, value in delta.items()}
+    if model.objects.filter(**key).update(**increments):
+        return
+    if not any(value > 0 for value in delta.values()):
+        # Only takes away: the row is gone, e.g. deleted by the cascade from
+        # the listing whose payments are being deleted
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **delta)
+    except IntegrityError:
+        # Created by a concurrent writer since the UPDATE
+        model.objects.filter(**key).update(**increments)
+
+
+def backfill_revenue(start=None, end=None):
+    """
+    Rebuild the rollups for the UTC days ``start`` to ``end`` (inclusive,
+    open-ended when None) from the payments table
+
+    Each table is refilled with one ``INSERT ... SELECT``, so no rows pass
+    through Python. Returns the number of hourly rows written.
+    """
+    db = router.db_for_write(HourlyRevenue)
+    hours = HourlyRevenue.objects.using(db)
+    days = DailyRevenue.objects.using(db)
+    payments = Payment.objects.using(db).filter(payment_status__in=Payment.REVENUE_STATUSES).annotate(
+        paid_at=Coalesce('payment_date', 'created_at'),
+    )
+    if start is not None:
+        since = _midnight(start)
+        hours, days = hours.filter(hour__gte=since), days.filter(day__gte=start)
+        payments = payments.filter(paid_at__gte=since)
+    if end is not None:
+        until = _midnight(end + timedelta(days=1))
+        hours, days = hours.filter(hour__lt=until), days.filter(day__lte=end)
+        payments = payments.filter(paid_at__lt=until)
+
+    refunded = Q(payment_status='refunded')
+    hourly = payments.annotate(hour=TruncHour('paid_at', tzinfo=dt_timezone.utc)).values(
+        'hour', 'currency', 'payment_method', listing_id=F('booking_ref__property_id'),
+    ).annotate(
+        sum_gross=Sum('amount'),
+        sum_refunded=Sum(Case(When(refunded, then='amount'), default=Value(0), output_field=DecimalField())),
+        sum_payments=Count('pk'),
+        sum_refunds=Count('pk', filter=refunded),
+    ).order_by()
+    daily = hours.annotate(day=TruncDate('hour', tzinfo=dt_timezone.utc)).values(
+        'day', 'currency', 'payment_method', 'listing_id',
+    ).annotate(**{f'sum_{name}': Sum(name) for name in TOTALS}).order_by()
+
+    with transaction.atomic(using=db):
+        hours.delete()
+        days.delete()
+        written = _insert_select(HourlyRevenue, hourly)
+        _insert_select(DailyRevenue, daily)
+    return written
+
+
+def _insert_select(model, rows):
+    """Insert the ``values()`` queryset ``rows`` into ``model``'s table in one statement"""
+    query = rows.query
+    # values() selects its fields first, then the annotations in order
+    columns = [
+        model._meta.get_field(name.removeprefix('sum_')).column
+        for name in [*query.values_select, *query.annotation_select]
+    ]
+    sql, params = query.sql_with_params()
+    connection = connections[rows.db]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(map(quote, columns))}) {sql}", params,
+        )
+        return cursor.rowcount
+
+
+def revenue_series(granularity, start, end, **filters):
+    """
+    Totals per bucket and currency for the UTC days ``start`` to ``end``
+
+    ``filters`` may narrow by ``currency``, ``payment_method`` or ``listing_id``.
+    """
+    if granularity == 'hour':
+        rows = HourlyRevenue.objects.filter(hour__gte=_midnight(start), hour__lt=_midnight(end + timedelta(days=1)))
+    else:
+        rows = DailyRevenue.objects.filter(day__gte=start, day__lte=end)
+    rows = rows.filter(**{name: value for name, value in filters.items() if value})
+    rows = rows.annotate(bucket=F(granularity)).values('bucket', 'currency').order_by('bucket', 'currency')
+    return [dict(row, net=row['gross'] - row['refunded']) for row in _summed(rows)]
+
+
+def _summed(rows):
+    """Sum the rollup totals over each group of the ``values()`` queryset ``rows``"""
+    # Annotations may not shadow the model's own field names
+    for row in rows.annotate(**{f'sum_{name}': Sum(name) for name in TOTALS}).iterator():
+        yield {key.removeprefix('sum_'): value for key, value in row.items()}
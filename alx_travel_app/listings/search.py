@@ -0,0 +1,186 @@
+"""
+Full-text search over listing names, locations and descriptions.
+
+SQLite keeps the text in an FTS5 table, ``listings_listing_fts``, whose
+rowid is derived from the listing's UUID so a listing's entry is replaced
+or removed by rowid, in the same transaction as the listing's save or
+delete (``listings.signals``). PostgreSQL keeps a stored generated
+``tsvector`` column, ``search_document``, on the listing table with a GIN
+index, so the database itself keeps it current. Other databases fall back
+to ``icontains`` scans.
+
+Every search term must match, as a word prefix. Results are ranked with
+matches in the name above the location above the description (bm25 on
+SQLite, ``ts_rank_cd`` on PostgreSQL). Matching is an index lookup but
+ranking is paid per match, so at most ``MAX_RANKED`` matches are ranked.
+
+On SQLite, code that writes listing text with ``bulk_create``, ``update()``
+or raw SQL must call ``index_listings`` itself, or rebuild with
+``manage.py rebuild_search_index``.
+"""
+import re
+import uuid
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Listing
+
+# Indexed fields, most heavily weighted first
+SEARCH_FIELDS = ('name', 'location', 'description')
+# bm25 weights per FTS5 column; property_id is stored, not indexed
+FTS_WEIGHTS = (0.0, 10.0, 5.0, 1.0)
+FTS_TABLE = 'listings_listing_fts'
+# Terms beyond this are ignored, which bounds the cost of a query
+MAX_TERMS = 8
+# Ranking costs a few microseconds per match, so broad queries rank only
+# this many of their matches (in rowid order, effectively random)
+MAX_RANKED = 10_000
+# Words as both tokenizers split them: letters and digits only
+WORD = re.compile(r'[^\W_]+')
+
+
+def search_terms(text):
+    return WORD.findall(text.lower())[:MAX_TERMS]
+
+
+def fts_rowid(listing_id):
+    """FTS5 rowid of a listing: the top 63 bits of its UUID"""
+    return uuid.UUID(str(listing_id)).int >> 65
+
+
+def _fts_query(terms):
+    # Single characters have no prefix index and would match most listings
+    return ' '.join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f'{term}:*' if len(term) > 1 else term for term in terms)
+
+
+def _match(vendor, terms):
+    """SQL selecting the ids of the listings matching ``terms``, and its params"""
+    if vendor == 'sqlite':
+        return f'SELECT property_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts_query(terms)]
+    return (
+        "SELECT property_id FROM listings_listing WHERE search_document @@ to_tsquery('simple', %s)",
+        [_tsquery(terms)],
+    )
+
+
+def _icontains(terms):
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(location__icontains=term) | Q(description__icontains=term)
+    return condition
+
+
+def filter_listings(queryset, text):
+    """Narrow ``queryset`` to the listings matching ``text``, unranked"""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return queryset.filter(_icontains(terms))
+    return queryset.filter(pk__in=RawSQL(*_match(vendor, terms)))
+
+
+def search_listings(text, limit=20, offset=0):
+    """Ids of the listings matching ``text``, best first"""
+    terms = search_terms(text)
+    if not terms:
+        return []
+    db = router.db_for_read(Listing)
+    vendor = connections[db].vendor
+    if vendor == 'sqlite':
+        weights = ', '.join(map(str, FTS_WEIGHTS))
+        sql = (
+            f'SELECT property_id FROM ('
+            f'SELECT rowid, property_id, bm25({FTS_TABLE}, {weights}) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s LIMIT %s'
+            f') ORDER BY score, rowid LIMIT %s OFFSET %s'
+        )
+        params = [_fts_query(terms), MAX_RANKED, limit, offset]
+    elif vendor == 'postgresql':
+        sql = (
+            "SELECT property_id FROM ("
+            "SELECT property_id, ts_rank_cd(search_document, query) AS score "
+            "FROM listings_listing, to_tsquery('simple', %s) query WHERE search_document @@ query LIMIT %s"
+            ") matches ORDER BY score DESC, property_id LIMIT %s OFFSET %s"
+        )
+        params = [_tsquery(terms), MAX_RANKED, limit, offset]
+    else:
+        rows = Listing.objects.using(db).filter(_icontains(terms)).order_by('name', 'pk')
+        return list(rows.values_list('pk', flat=True)[offset:offset + limit])
+    with connections[db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [uuid.UUID(str(row[0])) for row in cursor.fetchall()]
+
+
+def _write_entries(cursor, listings, replace=True):
+    """Write the FTS5 entries of ``listings``: (id, name, location, description) tuples"""
+    rows = [(fts_rowid(pk), uuid.UUID(str(pk)).hex, *text) for pk, *text in listings]
+    if not rows:
+        return
+    if replace:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, property_id, {", ".join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s)',
+        rows,
+    )
+
+
+def index_listings(listings):
+    """Write the search entries of ``listings`` (model instances)"""
+    connection = connections[router.db_for_write(Listing)]
+    if connection.vendor != 'sqlite':
+        return  # PostgreSQL maintains search_document itself
+    with connection.cursor() as cursor:
+        _write_entries(cursor, [
+            (listing.pk, *(getattr(listing, field) for field in SEARCH_FIELDS)) for listing in listings
+        ])
+
+
+def unindex_listings(listing_ids):
+    connection = connections[router.db_for_write(Listing)]
+    if connection.vendor == 'sqlite' and listing_ids:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(fts_rowid(pk),) for pk in listing_ids],
+            )
+
+
+def rebuild_search_index(batch_size=2000):
+    """
+    Rebuild the search index from the listing table
+
+    Returns the number of listings indexed. On PostgreSQL, where the
+    document column cannot go stale, this rebuilds the GIN index only.
+    """
+    db = router.db_for_write(Listing)
+    connection = connections[db]
+    listings = Listing.objects.using(db)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX listing_search_idx')
+        return listings.count()
+    if connection.vendor != 'sqlite':
+        return 0
+
+    indexed = 0
+    with transaction.atomic(using=db), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for row in listings.order_by().values_list('pk', *SEARCH_FIELDS).iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                _write_entries(cursor, batch, replace=False)
+                indexed += len(batch)
+                batch = []
+        _write_entries(cursor, batch, replace=False)
+        indexed += len(batch)
+        # Merge the index b-trees written batch by batch into one
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
@@ -1,12 +1,38 @@
+import uuid
+
 from rest_framework import serializers
 from .models import Listing, Booking, Payment, Review
+from .search import search_terms
+
+
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads so views can load them
+    up front with ``setup_eager_loading`` instead of one query per row
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
 
 class ListingSerializer(serializers.ModelSerializer):
+    # km from the searched point, on proximity searches only
+    distance = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Listing
         fields = '__all__'
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('property', 'user')
+
     property_name = serializers.CharField(source='property.name', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
     total_nights = serializers.SerializerMethodField()
@@ -18,7 +44,117 @@ class BookingSerializer(serializers.ModelSerializer):
     def get_total_nights(self, obj):
         return obj.get_total_nights()
 
-class PaymentSerializer(serializers.ModelSerializer):
+class BookingCreateSerializer(serializers.Serializer):
+    property = serializers.UUIDField()
+    check_in_date = serializers.DateField()
+    check_out_date = serializers.DateField()
+
+    def validate(self, data):
+        if data['check_out_date'] <= data['check_in_date']:
+            raise serializers.ValidationError({'check_out_date': 'Must be after check_in_date'})
+        return data
+
+class QuoteQuerySerializer(serializers.Serializer):
+    # Longest stay quoted, in nights
+    MAX_NIGHTS = 90
+
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+
+    def validate(self, data):
+        nights = (data['check_out'] - data['check_in']).days
+        if nights <= 0:
+            raise serializers.ValidationError({'check_out': 'Must be after check_in'})
+        if nights > self.MAX_NIGHTS:
+            raise serializers.ValidationError({'check_out': f'Stays are quoted for up to {self.MAX_NIGHTS} nights'})
+        return data
+
+class QuoteBatchQuerySerializer(QuoteQuerySerializer):
+    MAX_LISTINGS = 100
+
+    listings = serializers.CharField(help_text='comma-separated listing ids')
+
+    def validate_listings(self, value):
+        try:
+            ids = list(dict.fromkeys(uuid.UUID(part.strip()) for part in value.split(',') if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError('Must be comma-separated listing ids')
+        if not ids or len(ids) > self.MAX_LISTINGS:
+            raise serializers.ValidationError(f'Give between 1 and {self.MAX_LISTINGS} listings')
+        return ids
+
+class ListingTextSearchQuerySerializer(serializers.Serializer):
+    # Relevance pages past this are not worth ranking for
+    MAX_OFFSET = 1000
+
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(min_value=0, max_value=MAX_OFFSET, default=0)
+
+    def validate_q(self, value):
+        if not search_terms(value):
+            raise serializers.ValidationError('Must contain at least one word')
+        return value
+
+class QuoteSerializer(serializers.Serializer):
+    listing = serializers.UUIDField()
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    nights = serializers.IntegerField()
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+class QuoteDetailSerializer(QuoteSerializer):
+    nightly = serializers.ListField(child=serializers.DecimalField(max_digits=10, decimal_places=2))
+
+class RevenueQuerySerializer(serializers.Serializer):
+    # Longest range per granularity, in days, to bound the series length
+    MAX_DAYS = {'hour': 31, 'day': 731}
+
+    granularity = serializers.ChoiceField(choices=['hour', 'day'], default='day')
+    start = serializers.DateField()
+    end = serializers.DateField()
+    currency = serializers.CharField(max_length=3, required=False)
+    payment_method = serializers.ChoiceField(choices=Payment.PAYMENT_METHOD_CHOICES, required=False)
+    listing = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        if data['end'] < data['start']:
+            raise serializers.ValidationError({'end': 'Must not be before start'})
+        max_days = self.MAX_DAYS[data['granularity']]
+        if (data['end'] - data['start']).days >= max_days:
+            raise serializers.ValidationError({'end': f"At most {max_days} days of {data['granularity']}ly data"})
+        return data
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Filters for an export; pass the allowed statuses as ``context['statuses']``"""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.CharField(required=False, help_text='comma-separated statuses')
+
+    def validate_status(self, value):
+        statuses = [status.strip() for status in value.split(',') if status.strip()]
+        unknown = sorted(set(statuses) - set(self.context['statuses']))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown status: {', '.join(unknown)}")
+        return statuses
+
+    def validate(self, data):
+        if data.get('start') and data.get('end') and data['end'] < data['start']:
+            raise serializers.ValidationError({'end': 'Must not be before start'})
+        return data
+
+class RevenuePointSerializer(serializers.Serializer):
+    bucket = serializers.ReadOnlyField()  # a datetime for hourly series, a date for daily ones
+    currency = serializers.CharField()
+    gross = serializers.DecimalField(max_digits=14, decimal_places=2)
+    refunded = serializers.DecimalField(max_digits=14, decimal_places=2)
+    net = serializers.DecimalField(max_digits=14, decimal_places=2)
+    payments = serializers.IntegerField()
+    refunds = serializers.IntegerField()
+
+class PaymentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('booking_ref__property', 'booking_ref__user')
+
     booking_details = BookingSerializer(source='booking_ref', read_only=True)
     is_successful = serializers.SerializerMethodField()
     can_be_refunded = serializers.SerializerMethodField()
@@ -40,6 +176,30 @@ class PaymentSerializer(serializers.ModelSerializer):
     def get_can_be_refunded(self, obj):
         return obj.can_be_refunded()
 
+class PaymentBatchQuerySerializer(serializers.Serializer):
+    """Payment or booking ``ids`` and the payment ``fields`` to return for each"""
+    MAX_IDS = 100
+
+    ids = serializers.CharField(help_text='comma-separated ids')
+    fields = serializers.CharField(required=False, help_text='comma-separated payment fields')
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(uuid.UUID(part.strip()) for part in value.split(',') if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError('Must be comma-separated ids')
+        if not ids or len(ids) > self.MAX_IDS:
+            raise serializers.ValidationError(f'Give between 1 and {self.MAX_IDS} ids')
+        return ids
+
+    def validate_fields(self, value):
+        fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+        unknown = [field for field in fields if field not in PaymentSerializer.Meta.fields]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown field: {', '.join(unknown)}")
+        # Always returned, so results can be matched to the request
+        return ['payment_id', *(field for field in fields if field != 'payment_id')]
+
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_bookings, invalidate_payments
+from .models import Booking, Listing, Payment, RateSeason, Review
+from .pricing import PRICING_FIELDS, invalidate_quotes
+from .ratings import adjust_listing_rating
+from .revenue import apply_revenue_changes
+from .search import SEARCH_FIELDS, index_listings, unindex_listings
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, **kwargs):
+    """Keep the listing's rating aggregates in step with a saved review"""
+    previous = getattr(instance, '_counted', None)
+    current = (instance.property_id, instance.rating)
+    if previous == current:
+        return
+    if previous is not None and previous[0] is not None:
+        adjust_listing_rating(previous[0], -1, -previous[1])
+    adjust_listing_rating(current[0], 1, current[1])
+    instance._counted = current
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    """Remove a deleted review from its listing's rating aggregates"""
+    listing_id, rating = getattr(instance, '_counted', (instance.property_id, instance.rating))
+    adjust_listing_rating(listing_id, -1, -rating)
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def invalidate_payment_cache(sender, instance, **kwargs):
+    """Drop cached payment status and booking payments payloads"""
+    invalidate_payments(payment_ids=[instance.pk], booking_ids=[instance.booking_ref_id])
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_booking_cache(sender, instance, **kwargs):
+    """Drop cached payloads that nest this booking"""
+    invalidate_bookings([instance.pk])
+
+
+@receiver(pre_save, sender=Payment)
+def load_revenue_entry(sender, instance, **kwargs):
+    """Read the stored contribution of payments loaded with deferred fields"""
+    if not hasattr(instance, '_revenue') and not instance._state.adding:
+        stored = Payment.objects.filter(pk=instance.pk).only(*Payment.REVENUE_FIELDS).first()
+        instance._revenue = stored.revenue_entry() if stored else None
+
+
+@receiver(post_save, sender=Payment)
+def roll_up_revenue(sender, instance, **kwargs):
+    """Move the payment's contribution in the revenue rollups"""
+    previous = getattr(instance, '_revenue', None)
+    current = instance.revenue_entry()
+    if previous != current:
+        apply_revenue_changes([(previous, current)])
+    instance._revenue = current
+
+
+@receiver(post_delete, sender=Payment)
+def remove_revenue(sender, instance, **kwargs):
+    """Take a deleted payment out of the revenue rollups"""
+    apply_revenue_changes([(getattr(instance, '_revenue', instance.revenue_entry()), None)])
+
+
+@receiver(post_save, sender=Listing)
+def reprice_listing(sender, instance, update_fields=None, **kwargs):
+    """Retire the listing's memoized quotes when its base rates may have changed"""
+    if update_fields is None or set(update_fields) & set(PRICING_FIELDS):
+        # After commit, so a quote built from the old rates cannot be cached under the new version
+        transaction.on_commit(lambda: invalidate_quotes([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=RateSeason)
+def reprice_season(sender, instance, **kwargs):
+    """Retire the listing's memoized quotes when a season changes"""
+    transaction.on_commit(lambda: invalidate_quotes([instance.listing_id]))
+
+
+@receiver(post_save, sender=Listing)
+def index_listing(sender, instance, update_fields=None, **kwargs):
+    """Rewrite the listing's search entry when its text may have changed"""
+    if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+        index_listings([instance])
+
+
+@receiver(post_delete, sender=Listing)
+def unindex_listing(sender, instance, **kwargs):
+    """Drop a deleted listing from the search index"""
+    unindex_listings([instance.pk])
@@ -0,0 +1,216 @@
+"""
+Database-backed background tasks.
+
+Work that does not need to finish inside a request (gateway verification,
+booking confirmation, confirmation emails) is stored as a ``Task`` row and
+executed by ``python manage.py run_tasks``. Each task has an idempotency key,
+so enqueueing the same work for the same ``Payment.transaction_id`` twice is a
+no-op, and failed attempts are retried with exponential backoff.
+
+Set ``TASK_QUEUE_EAGER = True`` to run tasks inline when they are enqueued
+(handy for local development without a worker).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from alx_travel_app.metrics import observe_outbound
+
+from .chapa import ChapaError
+from .models import Payment, Task
+from .payments import gateway_outcome, gateway_status, transition
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Retry(Exception):
+    """Raised by a task to be scheduled again without logging a failure"""
+
+
+def task(name=None, max_attempts=None):
+    """
+    Register a function as a background task
+
+    The function receives the enqueued payload as keyword arguments.
+    """
+    def decorator(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, key, **payload):
+    """
+    Queue task ``name`` once per ``key``
+
+    Returns the ``Task`` row. If a task with the same name and key is already
+    queued, running or done it is returned unchanged; a task that exhausted its
+    retries is queued again.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown task: {name}")
+    job, created = Task.objects.get_or_create(
+        key=f"{name}:{key}",
+        defaults={'name': name, 'payload': payload},
+    )
+    if not created and job.status == 'failed':
+        requeued = Task.objects.filter(pk=job.pk, status='failed').update(
+            status='queued', attempts=0, run_at=timezone.now(),
+        )
+        if requeued:
+            job.refresh_from_db()
+            created = True
+    if created and settings.TASK_QUEUE_EAGER:
+        run_task(job)
+    return job
+
+
+def enqueue_many(name, payloads):
+    """
+    Queue task ``name`` for each ``key -> payload`` in ``payloads`` in bulk
+
+    Keys that already have a task are skipped and failed tasks are queued
+    again, as with ``enqueue``.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown task: {name}")
+    keys = [f"{name}:{key}" for key in payloads]
+    Task.objects.bulk_create(
+        [Task(name=name, key=f"{name}:{key}", payload=payload) for key, payload in payloads.items()],
+        ignore_conflicts=True,
+    )
+    Task.objects.filter(key__in=keys, status='failed').update(
+        status='queued', attempts=0, run_at=timezone.now(),
+    )
+    if settings.TASK_QUEUE_EAGER:
+        for job in Task.objects.filter(key__in=keys, status='queued'):
+            run_task(job)
+
+
+def run_pending(limit=100):
+    """
+    Run up to ``limit`` due tasks and return how many were executed
+
+    Tasks left ``running`` by a crashed worker become due again once their
+    lease expires.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(
+        status__in=['queued', 'running'], run_at__lte=now,
+    ).order_by('run_at')[:limit]
+
+    executed = 0
+    for job in list(due):
+        if run_task(job, now=now):
+            executed += 1
+    return executed
+
+
+def run_task(job, now=None):
+    """Claim and execute ``job``; returns False if another worker claimed it first"""
+    now = now or timezone.now()
+    lease_expires = now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    claimed = Task.objects.filter(
+        pk=job.pk, status=job.status, run_at=job.run_at,
+    ).update(status='running', run_at=lease_expires, attempts=F('attempts') + 1)
+    if not claimed:
+        return False
+    job.refresh_from_db()
+
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        func(**job.payload)
+    except Exception as e:
+        max_attempts = getattr(func, 'max_attempts', None) or settings.TASK_MAX_ATTEMPTS
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+            logger.error(f"Task {job.key} failed after {job.attempts} attempts: {str(e)}")
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(
+                seconds=settings.TASK_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            )
+            if not isinstance(e, Retry):
+                logger.warning(f"Task {job.key} attempt {job.attempts} failed: {str(e)}")
+        job.last_error = str(e)
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.save(update_fields=['status', 'run_at', 'last_error', 'updated_at'])
+    return True
+
+
+@task()
+def verify_payment(tx_ref):
+    """
+    Verify ``tx_ref`` with Chapa and confirm the booking when it succeeded
+    """
+    payment = Payment.objects.get(transaction_id=tx_ref)
+    if payment.payment_status not in ('pending', 'processing'):
+        return
+
+    try:
+        payment_data = gateway_status(tx_ref)
+    except ChapaError as e:
+        raise Retry(str(e))
+
+    outcome = gateway_outcome(payment_data)
+    if outcome is None:
+        raise Retry(f"Payment {tx_ref} is still {payment_data.get('status')}")
+    new_status, fields = outcome
+
+    with transaction.atomic():
+        # Only the caller that moves the payment queues the email; one that
+        # lost the race to a concurrent verify or reconcile does nothing
+        if transition(payment, new_status, **fields) and new_status == 'completed':
+            enqueue('send_confirmation_email', tx_ref, tx_ref=tx_ref)
+
+
+@task()
+def send_confirmation_email(tx_ref):
+    """
+    Send the booking confirmation email for a completed payment
+    """
+    payment = Payment.objects.select_related(
+        'booking_ref__property', 'booking_ref__user',
+    ).get(transaction_id=tx_ref)
+    booking = payment.booking_ref
+    subject = f'Booking Confirmation - {booking.property.name}'
+    message = f"""
+    Dear {booking.user.first_name},
+
+    Your booking has been confirmed!
+
+    Booking Details:
+    - Property: {booking.property.name}
+    - Location: {booking.property.location}
+    - Check-in: {booking.check_in_date}
+    - Check-out: {booking.check_out_date}
+    - Total Amount: ETB {payment.amount}
+    - Payment ID: {payment.payment_id}
+
+    Thank you for choosing ALX Travel App!
+
+    Best regards,
+    ALX Travel Team
+    """
+
+    with observe_outbound('smtp', 'send_mail'):
+        send_mail(
+            subject,
+            message,
+            settings.DEFAULT_FROM_EMAIL,
+            [booking.user.email],
+            fail_silently=False,
+        )
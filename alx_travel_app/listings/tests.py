@@ -1,3 +1,1706 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.db.models import DecimalField
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from alx_travel_app.db_routers import PrimaryReplicaRouter, use_replica
+from alx_travel_app.log import LOG_RECORDS_DROPPED, BoundedQueueHandler, JSONFormatter, request_id_var
+from alx_travel_app.middleware import RequestMetricsMiddleware
+from alx_travel_app.metrics import OUTBOUND_DURATION, REQUEST_DB_QUERIES, REQUEST_DURATION, Histogram
+
+from . import async_views
+from .chapa import AsyncChapaClient, ChapaClient, ChapaError, GatewayUnavailable
+from .fake_chapa import FakeChapaServer
+from .geo import MAX_CELLS, covering_cells, encode_geohash, next_cell, radius_box, within_radius
+from .models import (
+    BookedNight, Booking, DailyRevenue, HourlyRevenue, Listing, Payment, RateSeason, Review, Task, WebhookEvent,
+)
+from .pagination import EstimatedCountPaginator, estimated_count
+from .payments import InvalidTransition, transition
+from .pricing import quote_many
+from .resilience import CircuitBreaker, CircuitOpen, FixedWindowLimiter, RateLimited
+from .revenue import backfill_revenue
+from .search import FTS_TABLE, filter_listings, search_listings
+from .tasks import enqueue, enqueue_many, run_pending, verify_payment
+from .webhooks import process_webhook_events
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+User = get_user_model()
+
+
+def create_booking(user=None, listing=None, nights=3, **kwargs):
+    """Create a booking (and any missing user/listing) for tests"""
+    if user is None:
+        user = User.objects.create_user(
+            username=f'guest{User.objects.count()}', email='guest@example.com',
+            first_name='Test', last_name='Guest',
+        )
+    if listing is None:
+        host = User.objects.create_user(username=f'host{User.objects.count()}')
+        listing = Listing.objects.create(
+            host=host, name='Test Villa', description='A villa', location='Addis Ababa', pricepernight=100,
+        )
+    check_in = kwargs.pop('check_in_date', date.today() + timedelta(days=7))
+    return Booking.objects.create(
+        user=user, property=listing, check_in_date=check_in,
+        check_out_date=kwargs.pop('check_out_date', check_in + timedelta(days=nights)),
+        total_amount=kwargs.pop('total_amount', listing.pricepernight * nights), **kwargs
+    )
+
+
+class FakeChapaTestCase(TestCase):
+    """Runs a fake Chapa gateway and points the client settings at it"""
+
+    gateway_latency = 0.0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.gateway = FakeChapaServer(latency=cls.gateway_latency).start()
+        cls.addClassCleanup(cls.gateway.stop)
+        cls.enterClassContext(override_settings(CHAPA_BASE_URL=cls.gateway.url, CHAPA_SECRET_KEY='test'))
+        super().setUpClass()
+
+    def setUp(self):
+        self.gateway.statuses.clear()
+        cache.clear()  # circuit breaker state
+
+    def post_json(self, url, data):
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+
+
+class ChapaClientTests(FakeChapaTestCase):
+
+    def test_verify_reuses_pooled_connection(self):
+        client = ChapaClient()
+        connections = self.gateway.connections
+        for i in range(5):
+            response = client.verify(f'tx_{i}')
+            self.assertEqual(response.json()['data']['status'], 'success')
+        client.close()
+        self.assertEqual(self.gateway.connections - connections, 1)
+
+    def test_read_timeout_raises_chapa_error(self):
+        with FakeChapaServer(latency=0.5) as slow:
+            client = ChapaClient(base_url=slow.url, read_timeout=0.05)
+            with self.assertRaises(ChapaError):
+                client.verify('tx_slow')
+            client.close()
+
+    @unittest.skipIf(httpx is None, 'httpx is not installed')
+    def test_async_client_verify(self):
+        async def verify_all():
+            client = AsyncChapaClient()
+            try:
+                responses = await asyncio.gather(*(client.verify(f'tx_{i}') for i in range(3)))
+            finally:
+                await client.aclose()
+            return [r.json()['data']['tx_ref'] for r in responses]
+
+        self.assertEqual(asyncio.run(verify_all()), ['tx_0', 'tx_1', 'tx_2'])
+
+
+class GatewayResilienceTests(FakeChapaTestCase):
+
+    def test_breaker_opens_after_failures_and_closes_after_probe(self):
+        breaker = CircuitBreaker('test', cache, failure_threshold=3, reset_timeout=0.2)
+        for _ in range(3):
+            with self.assertRaises(ChapaError), breaker.call():
+                raise ChapaError('down')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.call()
+
+        time.sleep(0.25)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        probe = breaker.call()
+        with self.assertRaises(CircuitOpen):
+            breaker.call()  # one probe at a time
+        with probe:
+            pass
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_circuit(self):
+        breaker = CircuitBreaker('test', cache, failure_threshold=1, reset_timeout=0.1)
+        with breaker.call() as call:
+            call.fail()
+        time.sleep(0.15)
+        with breaker.call() as call:
+            call.fail()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker('test', cache, failure_threshold=2)
+        for ok in (False, True, False):
+            with breaker.call() as call:
+                if not ok:
+                    call.fail()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker('test', cache, failure_threshold=1, slow_call=0.01)
+        with breaker.call():
+            time.sleep(0.02)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_rate_limiter_admits_burst_per_window(self):
+        limiter = FixedWindowLimiter('test', cache, rate=2, burst=3)
+        with mock.patch('listings.resilience.time.time', return_value=1000.5):
+            for _ in range(3):
+                limiter.acquire()
+            with self.assertRaises(RateLimited) as raised:
+                limiter.acquire()
+        self.assertAlmostEqual(raised.exception.retry_after, 1.5)  # windows are 1.5s long
+        with mock.patch('listings.resilience.time.time', return_value=1002.0):
+            for _ in range(3):
+                limiter.acquire()
+            with self.assertRaises(RateLimited):
+                limiter.acquire()
+
+    @override_settings(CHAPA_RATE_LIMIT=1, CHAPA_BREAKER_FAILURES=5)
+    def test_local_memory_cache_is_flagged(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with self.settings(CACHES=locmem):
+            self.assertEqual([w.id for w in run_checks(tags=['caches'])], ['listings.W001'])
+            deploy = run_checks(tags=['caches'], include_deployment_checks=True)
+            self.assertEqual(sorted(w.id for w in deploy), ['listings.W001', 'listings.W002'])
+        with self.settings(CACHES=shared):
+            self.assertEqual(run_checks(tags=['caches'], include_deployment_checks=True), [])
+
+    @override_settings(CHAPA_RATE_LIMIT=1, CHAPA_RATE_BURST=2)
+    def test_client_rate_limit(self):
+        client = ChapaClient()
+        calls = len(self.gateway.calls)
+        with mock.patch('listings.resilience.time.time', return_value=5000.0):
+            client.verify('tx_1')
+            client.verify('tx_2')
+            with self.assertRaises(GatewayUnavailable):
+                client.verify('tx_3')
+        client.close()
+        self.assertEqual(len(self.gateway.calls) - calls, 2)
+
+    @override_settings(CHAPA_BREAKER_FAILURES=5, CHAPA_BREAKER_RESET=60)
+    def test_outage_bounds_worker_occupancy(self):
+        with FakeChapaServer(latency=0.5) as slow:
+            client = ChapaClient(base_url=slow.url, read_timeout=0.1)
+            busy = []
+
+            def worker():
+                for i in range(10):
+                    start = time.perf_counter()
+                    with self.assertRaises(ChapaError):
+                        client.verify(f'tx_{i}')
+                    busy.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            client.close()
+
+            # Without the breaker all 80 calls would wait out the timeout
+            self.assertLessEqual(len(slow.calls), 8 + 5)
+            self.assertLess(sum(busy), 13 * 0.1 + 1)
+
+    def test_initiate_returns_503_while_circuit_open(self):
+        ChapaClient().breaker.trip()
+        booking = create_booking()
+        calls = len(self.gateway.calls)
+        response = self.post_json('/api/payments/initiate/', {'booking_id': str(booking.booking_id)})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(len(self.gateway.calls), calls)
+
+
+class PaymentFlowTests(FakeChapaTestCase):
+
+    def test_initiate_and_verify(self):
+        booking = create_booking()
+        response = self.post_json('/api/payments/initiate/', {'booking_id': str(booking.booking_id)})
+        self.assertEqual(response.status_code, 200)
+        tx_ref = response.json()['tx_ref']
+        self.assertEqual(Payment.objects.get(transaction_id=tx_ref).payment_status, 'processing')
+
+        response = self.post_json('/api/payments/verify/', {'tx_ref': tx_ref})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['payment_status'], 'processing')
+
+        run_pending()
+        response = self.post_json('/api/payments/verify/', {'tx_ref': tx_ref})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['payment_status'], 'completed')
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+
+    def test_initiate_unknown_booking(self):
+        response = self.post_json('/api/payments/initiate/', {'booking_id': str(uuid.uuid4())})
+        self.assertEqual(response.status_code, 404)
+
+    def test_success_page(self):
+        response = self.client.get('/api/payments/success/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'payments/success.html')
+
+    def test_initiate_marks_payment_failed_when_gateway_unreachable(self):
+        booking = create_booking()
+        with override_settings(CHAPA_BASE_URL='http://127.0.0.1:9/v1'):
+            response = self.post_json('/api/payments/initiate/', {'booking_id': str(booking.booking_id)})
+        self.assertEqual(response.status_code, 500)
+        payment = Payment.objects.get(booking_ref=booking)
+        self.assertEqual(payment.payment_status, 'failed')
+        self.assertIn('Gateway unreachable', payment.failure_reason)
+
+
+class AsyncPaymentViewTests(FakeChapaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, url, data):
+        request = self.factory.post(url, data=json.dumps(data), content_type='application/json')
+        response = await view.as_view()(request)
+        return response.status_code, json.loads(response.content)
+
+    async def test_initiate_verify_and_callback(self):
+        booking = await sync_to_async(create_booking)()
+        status_code, body = await self.call(
+            async_views.PaymentInitiateView, '/api/payments/initiate/', {'booking_id': str(booking.booking_id)},
+        )
+        self.assertEqual(status_code, 200, body)
+        payment = await Payment.objects.aget(transaction_id=body['tx_ref'])
+        self.assertEqual(payment.payment_status, 'processing')
+        self.assertEqual(self.gateway.calls[-1], ('POST', '/v1/transaction/initialize'))
+
+        status_code, body = await self.call(async_views.PaymentVerifyView, '/api/payments/verify/', {'tx_ref': body['tx_ref']})
+        self.assertEqual((status_code, body['payment_status']), (202, 'processing'))
+        self.assertTrue(await Task.objects.filter(key=f'verify_payment:{payment.transaction_id}').aexists())
+
+        status_code, _ = await self.call(async_views.PaymentCallbackView, '/api/payments/callback/', {'tx_ref': payment.transaction_id})
+        self.assertEqual(status_code, 200)
+        self.assertEqual(await WebhookEvent.objects.acount(), 1)
+
+    async def test_initiate_unknown_booking(self):
+        status_code, body = await self.call(
+            async_views.PaymentInitiateView, '/api/payments/initiate/', {'booking_id': str(uuid.uuid4())},
+        )
+        self.assertEqual((status_code, body['error']), (404, 'Booking not found'))
+
+    async def test_metrics_middleware_counts_queries_in_async_mode(self):
+        async def view(request):
+            await Listing.objects.acount()
+            await Listing.objects.acount()
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        before = REQUEST_DB_QUERIES.count(route='unmatched', method='POST')
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001), \
+                self.assertLogs('alx_travel_app.middleware', 'WARNING') as logs:
+            await middleware(self.factory.post('/nowhere/'))
+        self.assertEqual(REQUEST_DB_QUERIES.count(route='unmatched', method='POST'), before + 1)
+        self.assertEqual(logs.records[0].db_queries, 2)
+
+
+class TaskQueueTests(FakeChapaTestCase):
+
+    def create_payment(self, tx_ref='tx_task', status='processing'):
+        return Payment.objects.create(
+            booking_ref=create_booking(), amount=300, transaction_id=tx_ref, payment_status=status,
+        )
+
+    def test_callback_acknowledges_without_calling_gateway(self):
+        self.create_payment()
+        calls = len(self.gateway.calls)
+        for _ in range(3):
+            response = self.post_json('/api/payments/callback/', {'tx_ref': 'tx_task'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.gateway.calls), calls)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+        process_webhook_events()
+        self.assertEqual(Task.objects.filter(name='verify_payment').count(), 1)
+        self.assertEqual(len(self.gateway.calls), calls)
+
+    def test_confirmation_email_sent_once_per_transaction(self):
+        payment = self.create_payment()
+        enqueue('verify_payment', 'tx_task', tx_ref='tx_task')
+        run_pending()
+        run_pending()
+        enqueue('send_confirmation_email', 'tx_task', tx_ref='tx_task')
+        run_pending()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.payment_status, 'completed')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Task.objects.filter(status='done').count(), 2)
+
+    def test_pending_gateway_status_is_retried_with_backoff(self):
+        self.create_payment()
+        self.gateway.set_status('tx_task', 'pending')
+        job = enqueue('verify_payment', 'tx_task', tx_ref='tx_task')
+        run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.create_payment()
+        response = self.post_json('/api/payments/verify/', {'tx_ref': 'tx_task'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['booking_status'], 'confirmed')
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class WebhookTests(FakeChapaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.payment = Payment.objects.create(
+            booking_ref=create_booking(), amount=300, transaction_id='tx_hook', payment_status='processing',
+        )
+
+    def callback(self, data, **headers):
+        return self.client.post(
+            '/api/payments/callback/', data=json.dumps(data), content_type='application/json', headers=headers,
+        )
+
+    def test_duplicate_callbacks_cost_one_insert(self):
+        event = {'event': 'charge.success', 'tx_ref': 'tx_hook', 'status': 'success'}
+        for _ in range(5):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.callback(event)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([q['sql'].split()[0] for q in queries], ['INSERT'])
+        self.callback({**event, 'event': 'charge.refunded'})
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+
+    def test_events_processed_in_order_and_collapsed_per_payment(self):
+        settled = Payment.objects.create(
+            booking_ref=create_booking(), amount=300, transaction_id='tx_done', payment_status='completed',
+        )
+        for data in [
+            {'tx_ref': 'tx_hook', 'status': 'pending'},
+            {'tx_ref': 'tx_unknown', 'status': 'success'},
+            {'tx_ref': settled.transaction_id, 'status': 'success'},
+            {'tx_ref': 'tx_hook', 'status': 'success'},
+        ]:
+            self.callback(data)
+
+        self.assertEqual(process_webhook_events(limit=2), 2)
+        self.assertEqual(
+            list(WebhookEvent.objects.order_by('pk').values_list('status', flat=True)),
+            ['processed', 'ignored', 'received', 'received'],
+        )
+        self.assertEqual(process_webhook_events(), 2)
+        self.assertEqual(process_webhook_events(), 0)
+        self.assertEqual(list(Task.objects.values_list('key', flat=True)), ['verify_payment:tx_hook'])
+
+        run_pending()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'completed')
+
+    def test_signature_checked_when_secret_configured(self):
+        body = json.dumps({'tx_ref': 'tx_hook'}).encode()
+        signature = hmac.new(b'whsec', body, hashlib.sha256).hexdigest()
+        with override_settings(CHAPA_WEBHOOK_SECRET='whsec'):
+            response = self.callback({'tx_ref': 'tx_hook'}, X_Chapa_Signature='0' * 64)
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(WebhookEvent.objects.exists())
+            response = self.callback({'tx_ref': 'tx_hook'}, X_Chapa_Signature=signature)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().signature, signature)
+
+    def test_malformed_callback_rejected(self):
+        self.assertEqual(self.callback({'status': 'success'}).status_code, 400)
+        response = self.client.post('/api/payments/callback/', data='nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager_mode_processes_callback_inline(self):
+        self.callback({'tx_ref': 'tx_hook'})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'completed')
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+
+    def test_enqueue_many_requeues_failed_tasks(self):
+        Task.objects.create(name='verify_payment', key='verify_payment:tx_hook', status='failed', attempts=5)
+        enqueue_many('verify_payment', {'tx_hook': {'tx_ref': 'tx_hook'}})
+        self.assertEqual(Task.objects.values_list('status', 'attempts').get(), ('queued', 0))
+
+
+class ReconcilePaymentsTests(FakeChapaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        booking = create_booking()
+        self.payments = [
+            Payment.objects.create(
+                booking_ref=booking, amount=300, transaction_id=f'tx_rec_{i:02d}', payment_status='processing',
+            )
+            for i in range(12)
+        ]
+        self.gateway.set_status('tx_rec_00', 'failed')
+        self.gateway.set_status('tx_rec_01', 'pending')
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+
+    def reconcile(self, **options):
+        call_command(
+            'reconcile_payments', workers=4, batch_size=5, checkpoint=self.checkpoint,
+            stdout=io.StringIO(), **options
+        )
+
+    def test_reconcile_writes_back_statuses(self):
+        self.reconcile()
+        statuses = dict(Payment.objects.values_list('transaction_id', 'payment_status'))
+        self.assertEqual(statuses.pop('tx_rec_00'), 'failed')
+        self.assertEqual(statuses.pop('tx_rec_01'), 'processing')
+        self.assertEqual(set(statuses.values()), {'completed'})
+        self.assertEqual(Booking.objects.get().status, 'confirmed')
+        self.assertEqual(Task.objects.filter(name='send_confirmation_email').count(), 10)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_reconcile_resumes_from_checkpoint(self):
+        ordered = sorted(self.payments, key=lambda p: p.pk)
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'last_pk': str(ordered[5].pk), 'checked': 6}, f)
+        calls = len(self.gateway.calls)
+
+        self.reconcile()
+        self.assertEqual(len(self.gateway.calls) - calls, 6)
+        self.assertEqual(
+            Payment.objects.filter(pk__in=[p.pk for p in ordered[:6]], payment_status='processing').count(), 6,
+        )
+
+
+class PaymentTransitionTests(TestCase):
+
+    def setUp(self):
+        self.payment = Payment.objects.create(
+            booking_ref=create_booking(), amount=300, transaction_id='tx_cas', payment_status='processing',
+        )
+
+    def test_only_the_first_of_two_readers_moves_the_payment(self):
+        stale = Payment.objects.get(pk=self.payment.pk)
+        self.assertTrue(transition(self.payment, 'completed', payment_date=timezone.now()))
+        self.assertFalse(transition(stale, 'failed', failure_reason='Declined'))
+
+        self.payment.refresh_from_db()
+        self.assertEqual((self.payment.payment_status, self.payment.failure_reason), ('completed', ''))
+        self.assertEqual(stale.payment_status, 'processing')
+        self.assertEqual(Booking.objects.get().status, 'confirmed')
+        self.assertEqual(DailyRevenue.objects.values_list('gross', 'payments').get(), (300, 1))
+
+    def test_settled_payment_cannot_go_back(self):
+        transition(self.payment, 'completed')
+        with self.assertRaises(InvalidTransition):
+            transition(self.payment, 'failed')
+        self.assertTrue(transition(self.payment, 'refunded'))
+        self.assertEqual(DailyRevenue.objects.values_list('gross', 'refunded').get(), (300, 300))
+
+    def test_canceled_booking_is_not_confirmed(self):
+        Booking.objects.update(status='canceled')
+        transition(self.payment, 'completed')
+        self.assertEqual(Booking.objects.get().status, 'canceled')
+
+
+class PaymentRaceTests(TransactionTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Only known once the test database is set up
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise unittest.SkipTest('set DATABASE_TEST_NAME to run against a database that takes concurrent writers')
+        cls.gateway = FakeChapaServer().start()
+        cls.addClassCleanup(cls.gateway.stop)
+        cls.enterClassContext(override_settings(CHAPA_BASE_URL=cls.gateway.url, CHAPA_SECRET_KEY='test'))
+        super().setUpClass()
+
+    def test_one_confirmation_per_payment_under_concurrent_verification(self):
+        cache.clear()
+        payments = [
+            Payment.objects.create(
+                booking_ref=create_booking(), amount=300, transaction_id=f'tx_race_{i}', payment_status='processing',
+            )
+            for i in range(5)
+        ]
+        workers = 8
+        # verify_payment from each worker, reconcile_payments and this thread
+        start = threading.Barrier(len(payments) * workers + 2)
+        errors = []
+
+        def run(func, *args, **kwargs):
+            start.wait()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(verify_payment, payment.transaction_id))
+            for payment in payments for _ in range(workers)
+        ]
+        threads.append(threading.Thread(target=run, args=(
+            call_command, 'reconcile_payments', '--restart',
+            f'--checkpoint={os.path.join(tempfile.mkdtemp(), "checkpoint.json")}',
+        ), kwargs={'stdout': io.StringIO()}))
+        for thread in threads:
+            thread.start()
+        start.wait()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(set(Payment.objects.values_list('payment_status', flat=True)), {'completed'})
+        self.assertEqual(set(Booking.objects.values_list('status', flat=True)), {'confirmed'})
+        # Each payment was moved, and rolled up, exactly once
+        self.assertEqual(sum(DailyRevenue.objects.values_list('payments', flat=True)), len(payments))
+        self.assertEqual(Task.objects.filter(name='send_confirmation_email').count(), len(payments))
+        run_pending()
+        self.assertEqual(len(mail.outbox), len(payments))
+
+
+def create_listing(host=None, **kwargs):
+    if host is None:
+        host = User.objects.create_user(username=f'host{User.objects.count()}')
+    fields = {'name': 'Listing', 'description': 'A place', 'location': 'Nairobi', 'pricepernight': 100}
+    fields.update(kwargs)
+    return Listing.objects.create(host=host, **fields)
+
+
+class ListingSearchTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='searchhost')
+
+    def search(self, **params):
+        response = self.client.get('/api/listings/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_filters_by_location_and_price(self):
+        cheap = create_listing(self.host, location='Nairobi', pricepernight=40)
+        create_listing(self.host, location='Nairobi', pricepernight=400)
+        create_listing(self.host, location='Mombasa', pricepernight=40)
+
+        data = self.search(location='Nairobi', min_price='10', max_price='100')
+        self.assertEqual([r['property_id'] for r in data['results']], [str(cheap.property_id)])
+
+    def test_excludes_listings_booked_over_the_dates(self):
+        booked = create_listing(self.host)
+        free = create_listing(self.host)
+        create_booking(listing=booked, check_in_date=date(2030, 1, 10), check_out_date=date(2030, 1, 15))
+        create_booking(listing=free, check_in_date=date(2030, 1, 15), check_out_date=date(2030, 1, 20), status='canceled')
+
+        data = self.search(check_in='2030-01-14', check_out='2030-01-16')
+        self.assertEqual([r['property_id'] for r in data['results']], [str(free.property_id)])
+        data = self.search(check_in='2030-01-15', check_out='2030-01-16')
+        self.assertEqual(len(data['results']), 2)
+
+    def test_keyset_pages_cover_ties_exactly_once(self):
+        expected = {str(create_listing(self.host, pricepernight=50 + i % 2).property_id) for i in range(7)}
+        seen = []
+        response = self.client.get('/api/listings/', {'ordering': 'pricepernight', 'page_size': 3})
+        while True:
+            data = response.json()
+            seen += [(r['pricepernight'], r['property_id']) for r in data['results']]
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual({pk for _, pk in seen}, expected)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/listings/', {'ordering': 'name'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/listings/', {'min_price': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/listings/', {'check_in': '2030-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/listings/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.listing = create_listing()
+        self.user = User.objects.create_user(username='reviewer')
+
+    def assertAggregates(self, listing, count, total, avg):
+        listing.refresh_from_db()
+        self.assertEqual(
+            (listing.review_count, listing.rating_total, listing.avg_rating), (count, total, Decimal(avg)),
+        )
+
+    def test_maintained_on_create_update_and_delete(self):
+        first = Review.objects.create(property=self.listing, user=self.user, rating=5)
+        second = Review.objects.create(property=self.listing, user=self.user, rating=4)
+        Review.objects.create(property=self.listing, user=self.user, rating=5)
+        self.assertAggregates(self.listing, 3, 14, '4.67')
+
+        second.rating = 2
+        second.save()
+        second.save()
+        self.assertAggregates(self.listing, 3, 12, '4.00')
+
+        other = create_listing()
+        first.property = other
+        first.save()
+        self.assertAggregates(self.listing, 2, 7, '3.50')
+        self.assertAggregates(other, 1, 5, '5.00')
+
+        Review.objects.filter(property=self.listing).delete()
+        self.assertAggregates(self.listing, 0, 0, '0')
+
+    def test_rebuild_command(self):
+        Review.objects.create(property=self.listing, user=self.user, rating=3)
+        Review.objects.create(property=self.listing, user=self.user, rating=4)
+        Listing.objects.update(review_count=0, rating_total=0, avg_rating=0)
+        call_command('rebuild_rating_aggregates', stdout=io.StringIO())
+        self.assertAggregates(self.listing, 2, 7, '3.50')
+
+    def test_averages_are_rounded_as_numeric(self):
+        # PostgreSQL only has ROUND(numeric, integer)
+        with CaptureQueriesContext(connection) as queries:
+            Review.objects.create(property=self.listing, user=self.user, rating=4)
+            call_command('rebuild_rating_aggregates', stdout=io.StringIO())
+        rounded = [q['sql'] for q in queries.captured_queries if 'ROUND(' in q['sql']]
+        self.assertEqual(len(rounded), 2)
+        numeric = DecimalField(max_digits=3, decimal_places=2).cast_db_type(connection)
+        for sql in rounded:
+            self.assertRegex(sql, r'ROUND\(.*%s\)?, 2\)' % re.escape(numeric))
+        self.assertAggregates(self.listing, 1, 4, '4.00')
+
+    def test_search_filters_and_sorts_by_rating(self):
+        best = create_listing()
+        Review.objects.create(property=best, user=self.user, rating=5)
+        Review.objects.create(property=self.listing, user=self.user, rating=3)
+        create_listing()
+
+        data = self.client.get('/api/listings/', {'ordering': '-avg_rating'}).json()
+        self.assertEqual(data['results'][0]['property_id'], str(best.property_id))
+        data = self.client.get('/api/listings/', {'min_rating': '3'}).json()
+        self.assertEqual(len(data['results']), 2)
+
+
+class RevenueRollupTests(TestCase):
+
+    def setUp(self):
+        self.booking = create_booking()
+        self.paid_at = timezone.make_aware(timezone.datetime(2030, 3, 1, 14, 25))
+
+    def pay(self, amount=300, status='completed', method='chapa', **kwargs):
+        return Payment.objects.create(
+            booking_ref=self.booking, amount=Decimal(amount), payment_status=status, payment_method=method,
+            transaction_id=f'tx_{uuid.uuid4().hex[:16]}', payment_date=self.paid_at, **kwargs,
+        )
+
+    def totals(self, model=DailyRevenue):
+        return sorted(model.objects.values_list('payment_method', 'gross', 'refunded', 'payments', 'refunds'))
+
+    def test_completed_payments_are_rolled_up(self):
+        self.pay(300)
+        self.pay(200, method='mobile_money')
+        self.pay(500, status='failed')
+        self.assertEqual(self.totals(), [('chapa', 300, 0, 1, 0), ('mobile_money', 200, 0, 1, 0)])
+        hourly = HourlyRevenue.objects.get(payment_method='chapa')
+        self.assertEqual(hourly.hour, self.paid_at.replace(minute=0))
+        self.assertEqual(hourly.listing_id, self.booking.property_id)
+
+    def test_status_changes_move_contribution(self):
+        payment = self.pay(300, status='processing')
+        self.assertEqual(self.totals(), [])
+        payment.payment_status = 'completed'
+        payment.save()
+        payment.payment_status = 'refunded'
+        payment.save()
+        self.assertEqual(self.totals(), [('chapa', 300, 300, 1, 1)])
+        payment.delete()
+        self.assertEqual(self.totals(), [('chapa', 0, 0, 0, 0)])
+
+    def test_deleting_listing_with_completed_payments(self):
+        self.pay(300)
+        listing = self.booking.property
+        listing.delete()
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.totals(), [])
+        self.assertFalse(HourlyRevenue.objects.exists())
+
+        # And through the host's cascade
+        self.booking = create_booking()
+        self.pay(300)
+        self.booking.property.host.delete()
+        self.assertEqual(self.totals(), [])
+
+    def test_save_with_deferred_fields(self):
+        payment = self.pay(300)
+        payment = Payment.objects.only('payment_id', 'payment_status').get(pk=payment.pk)
+        payment.payment_status = 'refunded'
+        payment.save()
+        self.assertEqual(self.totals(HourlyRevenue), [('chapa', 300, 300, 1, 1)])
+
+    def test_backfill_matches_incremental(self):
+        self.pay(300)
+        self.pay(120, status='refunded', method='credit_card')
+        expected = (self.totals(HourlyRevenue), self.totals())
+        HourlyRevenue.objects.all().delete()
+        DailyRevenue.objects.all().delete()
+        call_command('backfill_revenue', stdout=io.StringIO())
+        self.assertEqual((self.totals(HourlyRevenue), self.totals()), expected)
+
+    def test_backfill_range(self):
+        self.pay(300)
+        moved = self.pay(80)
+        # update() bypasses the signals, leaving the rollups stale
+        Payment.objects.filter(pk=moved.pk).update(payment_date=self.paid_at + timedelta(days=1))
+        backfill_revenue(end=self.paid_at.date())
+        self.assertEqual(list(DailyRevenue.objects.values_list('day', 'gross')), [(self.paid_at.date(), 300)])
+        backfill_revenue(start=self.paid_at.date() + timedelta(days=1))
+        self.assertEqual(DailyRevenue.objects.get(day=self.paid_at.date() + timedelta(days=1)).gross, 80)
+
+    def test_revenue_api(self):
+        self.pay(300)
+        self.pay(200, status='refunded', method='mobile_money')
+        self.client.force_login(User.objects.create_user(username='finance', is_staff=True))
+        with self.assertNumQueries(3):  # session, user, one rollup query
+            response = self.client.get('/api/payments/revenue/', {'start': '2030-03-01', 'end': '2030-03-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{
+            'bucket': '2030-03-01', 'currency': 'ETB', 'gross': '500.00', 'refunded': '200.00',
+            'net': '300.00', 'payments': 2, 'refunds': 1,
+        }])
+
+        response = self.client.get('/api/payments/revenue/', {
+            'granularity': 'hour', 'start': '2030-03-01', 'end': '2030-03-01', 'payment_method': 'chapa',
+        })
+        self.assertEqual([(r['bucket'], r['gross']) for r in response.json()['results']],
+                         [('2030-03-01T14:00:00Z', '300.00')])
+
+        response = self.client.get('/api/payments/revenue/', {'granularity': 'hour', 'start': '2030-01-01', 'end': '2030-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_revenue_api_requires_staff(self):
+        self.client.force_login(User.objects.create_user(username='guest'))
+        response = self.client.get('/api/payments/revenue/', {'start': '2030-03-01', 'end': '2030-03-02'})
+        self.assertEqual(response.status_code, 403)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.first = create_booking()
+        self.second = create_booking(status='confirmed')
+        Booking.objects.filter(pk=self.first.pk).update(created_at=timezone.make_aware(timezone.datetime(2030, 3, 1, 9)))
+        Booking.objects.filter(pk=self.second.pk).update(created_at=timezone.make_aware(timezone.datetime(2030, 3, 2, 9)))
+        self.client.force_login(User.objects.create_user(username='finance', is_staff=True))
+
+    def export(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        lines = self.export('/api/exports/bookings.csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['booking_id', 'property_id', 'property_name'])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [str(self.first.pk), str(self.second.pk)])
+        self.assertIn('guest@example.com', lines[1])
+
+    def test_ndjson_export_with_filters(self):
+        rows = [json.loads(line) for line in self.export(
+            '/api/exports/bookings.ndjson', start='2030-03-02', status='confirmed,pending',
+        ).splitlines()]
+        self.assertEqual([(row['booking_id'], row['status']) for row in rows], [(str(self.second.pk), 'confirmed')])
+        self.assertEqual(rows[0]['created_at'], '2030-03-02T09:00:00Z')
+
+        self.assertEqual(self.export('/api/exports/bookings.ndjson', end='2030-02-28'), '')
+        response = self.client.get('/api/exports/bookings.csv', {'status': 'lost'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_staff(self):
+        self.client.force_login(User.objects.create_user(username='guest'))
+        self.assertEqual(self.client.get('/api/exports/payments.csv').status_code, 403)
+
+    def test_export_command(self):
+        Payment.objects.create(booking_ref=self.first, amount=Decimal('450.00'), transaction_id='tx_export')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'payments.ndjson')
+            call_command('export', 'payments', '--format', 'ndjson', '--output', path, stderr=io.StringIO())
+            with open(path) as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([(row['transaction_id'], row['amount']) for row in rows], [('tx_export', '450.00')])
+
+        out = io.StringIO()
+        call_command('export', 'bookings', '--status', 'confirmed', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+        with self.assertRaises(CommandError):
+            call_command('export', 'bookings', '--status', 'lost', stdout=io.StringIO())
+
+
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser(username='support', email='support@example.com'))
+
+    def pay(self, **kwargs):
+        return Payment.objects.create(
+            booking_ref=create_booking(), amount=Decimal('300.00'), transaction_id=f'tx_{uuid.uuid4().hex[:16]}',
+            **kwargs,
+        )
+
+    def changelist(self, path, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for path in ('/admin/listings/payment/', '/admin/listings/booking/'):
+            self.pay()
+            _, few = self.changelist(path)
+            for _ in range(4):
+                self.pay()
+            _, many = self.changelist(path)
+            self.assertEqual(few, many, path)
+
+    def test_search_and_date_hierarchy(self):
+        payment = self.pay(chapa_transaction_id='chapa_abc123')
+        self.pay()
+        response, _ = self.changelist('/admin/listings/payment/', q='chapa_abc')
+        self.assertEqual(list(response.context['cl'].result_list), [payment])
+        response, _ = self.changelist('/admin/listings/payment/', q='tx_')
+        self.assertEqual(response.context['cl'].result_count, 2)
+        response, _ = self.changelist('/admin/listings/payment/', created_at__year=payment.created_at.year)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_date_hierarchy_links(self):
+        for day in (3, 5):
+            Payment.objects.filter(pk=self.pay().pk).update(
+                created_at=timezone.make_aware(timezone.datetime(2030, 3, day, 12)),
+            )
+        response, _ = self.changelist('/admin/listings/payment/')
+        days = re.findall(r'created_at__day=(\d+)', response.content.decode())
+        self.assertEqual(days, ['3', '5'])
+        response, _ = self.changelist('/admin/listings/payment/', created_at__year=2030)
+        self.assertEqual(re.findall(r'created_at__month=(\d+)', response.content.decode()), ['3'])
+
+    def test_date_hierarchy_years(self):
+        for year, month in ((2029, 1), (2029, 6), (2030, 3), (2032, 11)):
+            Payment.objects.filter(pk=self.pay().pk).update(
+                created_at=timezone.make_aware(timezone.datetime(year, month, 15, 12)),
+            )
+        response, _ = self.changelist('/admin/listings/payment/')
+        years = re.findall(r'created_at__year=(\d+)', response.content.decode())
+        self.assertEqual(years, ['2029', '2030', '2032'])
+
+    def test_large_unfiltered_changelist_uses_estimate(self):
+        self.pay()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_count(Payment, 'default'), 1)
+        with mock.patch.object(EstimatedCountPaginator, 'threshold', 1):
+            with mock.patch('listings.pagination.estimated_count', return_value=5_000_000):
+                response, _ = self.changelist('/admin/listings/payment/')
+                self.assertEqual(response.context['cl'].result_count, 5_000_000)
+                # Filtered changelists are counted exactly
+                response, _ = self.changelist('/admin/listings/payment/', payment_status__exact='pending')
+                self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class IndexUsageTests(TestCase):
+    """Each hot query is planned as an index lookup, not a table scan"""
+
+    def setUp(self):
+        self.booking = create_booking()
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise be read sequentially
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def unique_index(self, model, column):
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # Introspection leaves SQLite's automatic indexes unnamed
+                cursor.execute(f'PRAGMA index_list({table})')
+                for name in [row[1] for row in cursor.fetchall() if row[2]]:
+                    cursor.execute(f'PRAGMA index_info({name})')
+                    if [row[2] for row in cursor.fetchall()] == [column]:
+                        return name
+            constraints = connection.introspection.get_constraints(cursor, table)
+        return next(name for name, info in constraints.items() if info['unique'] and info['columns'] == [column])
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, f'{queryset.query}\n{plan}')
+
+    def test_payment_queries(self):
+        now = timezone.now()
+        transaction_index = self.unique_index(Payment, 'transaction_id')
+        for queryset, index in [
+            # Callback, verify and task lookups by tx_ref
+            (Payment.objects.filter(transaction_id='tx_1'), transaction_index),
+            # Webhook batches
+            (Payment.objects.filter(transaction_id__in=['tx_1', 'tx_2'], payment_status__in=['pending', 'processing']),
+             transaction_index),
+            # get_booking_payments
+            (Payment.objects.filter(booking_ref=self.booking), 'payment_booking_created_idx'),
+            # reconcile_payments
+            (Payment.objects.filter(payment_status='processing', pk__gt=uuid.uuid4()).order_by('pk'), 'payment_processing_idx'),
+            # Admin changelist, unfiltered and filtered by status
+            (Payment.objects.order_by('-created_at', '-pk')[:100], 'payment_created_idx'),
+            (Payment.objects.filter(payment_status='failed').order_by('-created_at')[:100], 'payment_status_created_idx'),
+            (Payment.objects.filter(created_at__gte=now - timedelta(days=1), created_at__lt=now), 'payment_created_idx'),
+        ]:
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset, index)
+
+    def test_booking_queries(self):
+        for queryset, index in [
+            (Booking.objects.filter(property=self.booking.property, check_in_date__gte=date(2030, 1, 1)),
+             'booking_property_dates_idx'),
+            (Booking.objects.filter(status='confirmed').order_by('-created_at')[:100], 'booking_status_created_idx'),
+            (Booking.objects.order_by('-created_at', '-pk')[:100], 'booking_created_idx'),
+        ]:
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset, index)
+
+    def test_proximity_query(self):
+        self.assertUsesIndex(within_radius(Listing.objects.all(), -1.286, 36.817, 10), 'listing_geohash_idx')
+
+
+class SeedCommandTests(TestCase):
+
+    def seed(self, *args):
+        call_command('seed', *args, '--batch-size', '7', stdout=io.StringIO())
+
+    def test_bulk_dataset_is_consistent(self):
+        self.seed('--users', '20', '--listings', '6', '--bookings', '40', '--reviews', '50', '--payments', '15')
+        self.assertEqual(
+            (User.objects.count(), Listing.objects.count(), Booking.objects.count(),
+             Review.objects.count(), Payment.objects.count()),
+            (20, 6, 40, 50, 15),
+        )
+        active = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES)
+        self.assertEqual(BookedNight.objects.count(), sum(b.get_total_nights() for b in active))
+        for listing in Listing.objects.all():
+            reviews = Review.objects.filter(property=listing)
+            self.assertEqual(listing.review_count, reviews.count())
+            self.assertEqual(listing.rating_total, sum(r.rating for r in reviews))
+        # Users created with explicit ids must not break later inserts
+        User.objects.create_user(username='after-seed')
+
+    def test_same_seed_is_reproducible_and_not_loaded_twice(self):
+        self.seed('--users', '5', '--listings', '3', '--seed', '9')
+        listings = list(Listing.objects.order_by('pk').values_list('pk', 'name', 'pricepernight'))
+        with self.assertRaises(CommandError):
+            self.seed('--listings', '3', '--seed', '9')
+        Listing.objects.all().delete()
+        self.seed('--listings', '3', '--seed', '9')
+        self.assertEqual(
+            sorted(Listing.objects.values_list('pk', 'pricepernight')), [(pk, price) for pk, _, price in listings],
+        )
+
+    def test_counts_accept_suffixes(self):
+        from listings.management.commands.seed import parse_count
+        self.assertEqual([parse_count(v) for v in ('500', '100k', '1.5M', '5_000')], [500, 100_000, 1_500_000, 5000])
+
+
+class TextSearchTests(TestCase):
+
+    def setUp(self):
+        self.cottage = create_listing(
+            name='Seaside Cottage', location='Mombasa', description='Quiet rooms near Nyali beach',
+        )
+        self.loft = create_listing(
+            name='City Loft', location='Nairobi', description='Walk to the cottage bakery and Mombasa Road',
+        )
+        self.villa = create_listing(name='Café Villa', location='Diani', description='Pool and garden')
+
+    def test_prefix_matching_and_ranking(self):
+        # Name matches outrank location matches, which outrank description matches
+        self.assertEqual(search_listings('cott'), [self.cottage.pk, self.loft.pk])
+        self.assertEqual(search_listings('mombasa'), [self.cottage.pk, self.loft.pk])
+        self.assertEqual(search_listings('mombasa bakery'), [self.loft.pk])
+        self.assertEqual(search_listings('CAFE'), [self.villa.pk])
+        self.assertEqual(search_listings('cottage', limit=1, offset=1), [self.loft.pk])
+        self.assertEqual(search_listings('" OR *'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.cottage.name = 'Harbour Cabin'
+        self.cottage.save()
+        self.assertEqual(search_listings('harbour'), [self.cottage.pk])
+        self.assertEqual(search_listings('seaside'), [])
+        with CaptureQueriesContext(connection) as queries:
+            self.loft.save(update_fields=['pricepernight'])
+        self.assertEqual([q['sql'] for q in queries if FTS_TABLE in q['sql']], [])
+        self.loft.delete()
+        self.assertEqual(search_listings('cottage'), [])
+
+    def test_failed_index_write_rolls_back_the_save(self):
+        self.cottage.name = 'Harbour Cabin'
+        with mock.patch('listings.signals.index_listings', side_effect=IntegrityError), \
+                self.assertRaises(IntegrityError):
+            self.cottage.save()
+        self.assertEqual(Listing.objects.get(pk=self.cottage.pk).name, 'Seaside Cottage')
+        self.assertEqual(search_listings('seaside'), [self.cottage.pk])
+
+    def test_rebuild_command(self):
+        Listing.objects.filter(pk=self.villa.pk).update(name='Harbour Villa')
+        self.assertEqual(search_listings('harbour villa'), [])
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('for 3 listings', out.getvalue())
+        self.assertEqual(search_listings('harbour villa'), [self.villa.pk])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 is SQLite only')
+    def test_search_uses_the_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            search_listings('cottage')
+        self.assertIn(f'{FTS_TABLE} MATCH', queries[0]['sql'])
+        self.assertNotIn('listings_listing ', queries[0]['sql'])
+
+    def test_api_and_admin(self):
+        response = self.client.get('/api/listings/search/', {'q': 'mombasa'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Seaside Cottage', 'City Loft'])
+        self.assertEqual(self.client.get('/api/listings/search/', {'q': '!!'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/listings/search/', {'q': 'a', 'offset': 5000}).status_code, 400)
+
+        self.assertEqual(list(filter_listings(Listing.objects.all(), 'pool')), [self.villa])
+        self.client.force_login(User.objects.create_superuser(username='support', email='support@example.com'))
+        response = self.client.get('/admin/listings/listing/', {'q': 'seaside'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.cottage])
+
+
+class ProximitySearchTests(TestCase):
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='geohost')
+        # Nairobi centre, ~5 km and ~30 km north of it, and Mombasa
+        self.centre = create_listing(self.host, name='Centre', latitude=-1.286, longitude=36.817, pricepernight=120)
+        self.near = create_listing(self.host, name='Near', latitude=-1.241, longitude=36.817, pricepernight=60)
+        self.far = create_listing(self.host, name='Far', latitude=-1.016, longitude=36.817)
+        self.coast = create_listing(self.host, name='Coast', latitude=-4.043, longitude=39.668)
+        create_listing(self.host, name='Unplaced')
+
+    def search(self, **params):
+        response = self.client.get('/api/listings/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_geohash_cells_cover_the_box(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        rng = random.Random(7)
+        for box in [radius_box(-1.286, 36.817, 10), radius_box(60.0, 179.9, 40), (-10.0, -20.0, 10.0, 20.0)]:
+            cells = covering_cells(*box)
+            self.assertLessEqual(len(cells), MAX_CELLS)
+            south, west, north, east = box
+            for _ in range(200):
+                longitude = rng.uniform(west, east + (360 if west > east else 0))
+                point = encode_geohash(rng.uniform(south, north), (longitude + 180) % 360 - 180)
+                self.assertTrue(any(point.startswith(cell) for cell in cells), (box, point))
+
+    def test_cell_ranges_use_geohash_characters_only(self):
+        self.assertEqual(next_cell('kzf'), 'kzg')
+        self.assertEqual(next_cell('kzz'), 'm')
+        self.assertIsNone(next_cell('zzz'))
+        for cell in ('kzf', 'kzz', 's9'):
+            inside = cell + '0' * (9 - len(cell))
+            last = cell + 'z' * (9 - len(cell))
+            self.assertTrue(cell <= inside <= last < next_cell(cell))
+            self.assertFalse(next_cell(cell).startswith(cell))
+
+    def test_geohash_follows_coordinates(self):
+        self.assertEqual(self.centre.geohash, encode_geohash(-1.286, 36.817))
+        self.centre.latitude = -4.043
+        self.centre.save(update_fields=['latitude'])
+        self.centre.refresh_from_db()
+        self.assertEqual(self.centre.geohash, encode_geohash(-4.043, 36.817))
+        self.assertEqual(Listing.objects.get(name='Unplaced').geohash, '')
+
+    def test_radius_search(self):
+        self.assertEqual(self.search(lat=-1.286, lng=36.817, radius=10, ordering='distance'), ['Centre', 'Near'])
+        self.assertEqual(self.search(lat=-1.286, lng=36.817, radius=40, ordering='distance'), ['Centre', 'Near', 'Far'])
+        response = self.client.get('/api/listings/', {'lat': -1.286, 'lng': 36.817, 'radius': 10, 'ordering': 'distance'})
+        self.assertAlmostEqual(response.json()['results'][1]['distance'], 5.0, delta=0.1)
+
+        # Keyset pages by distance
+        response = self.client.get('/api/listings/', {
+            'lat': -1.286, 'lng': 36.817, 'radius': 40, 'ordering': 'distance', 'page_size': 2,
+        })
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Far'])
+
+    def test_combines_with_price_and_dates(self):
+        self.assertEqual(self.search(lat=-1.286, lng=36.817, radius=10, max_price=100), ['Near'])
+        Booking.objects.create(
+            property=self.near, user=self.host, check_in_date=date(2030, 1, 1), check_out_date=date(2030, 1, 3),
+            total_amount=120,
+        )
+        self.assertEqual(
+            self.search(lat=-1.286, lng=36.817, radius=10, check_in='2030-01-02', check_out='2030-01-04'), ['Centre'],
+        )
+
+    def test_bounding_box(self):
+        self.assertEqual(sorted(self.search(bbox='-1.3,36.8,-1.0,36.9')), ['Centre', 'Far', 'Near'])
+        self.assertEqual(self.search(bbox='-5,39,-4,40'), ['Coast'])
+        antimeridian = create_listing(self.host, name='Fiji', latitude=-17.0, longitude=179.9)
+        self.assertEqual(self.search(bbox='-18,179,-16,-179'), [antimeridian.name])
+
+    def test_invalid_parameters(self):
+        for params in [
+            {'lat': -1.2, 'lng': 36.8},
+            {'lat': 91, 'lng': 36.8, 'radius': 5},
+            {'lat': -1.2, 'lng': 36.8, 'radius': 5000},
+            {'bbox': '1,2,3'},
+            {'bbox': '10,0,-10,5'},
+            {'ordering': 'distance'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/listings/', params).status_code, 400)
+
+    def test_geocode_command(self):
+        Listing.objects.update(latitude=None, longitude=None, geohash='')
+        Listing.objects.filter(name='Coast').update(location='Mombasa, Kenya')
+        Listing.objects.filter(name='Far').update(location='Atlantis')
+        with tempfile.TemporaryDirectory() as directory:
+            geonames = os.path.join(directory, 'cities.txt')
+            with open(geonames, 'w', encoding='utf-8') as f:
+                for row in [
+                    ['184745', 'Nairobi', 'Nairobi', 'Nairobis,NBO', '-1.28333', '36.81667', 'P', 'PPLC', 'KE', '', '05',
+                     '', '', '', '2750547', '', '1795', 'Africa/Nairobi', '2020-01-01'],
+                    ['186301', 'Mombasa', 'Mombasa', '', '-4.05466', '39.66359', 'P', 'PPLA', 'KE', '', '02',
+                     '', '', '', '799668', '', '24', 'Africa/Nairobi', '2020-01-01'],
+                ]:
+                    f.write('\t'.join(row) + '\n')
+            out, err = io.StringIO(), io.StringIO()
+            call_command('geocode_listings', geonames, stdout=out, stderr=err)
+
+            self.assertIn('Geocoded 4 listings', out.getvalue())
+            self.assertIn("No match for 'Atlantis' (1 listings)", err.getvalue())
+            coast = Listing.objects.get(name='Coast')
+            self.assertEqual((coast.latitude, coast.longitude), (-4.05466, 39.66359))
+            self.assertEqual(coast.geohash, encode_geohash(-4.05466, 39.66359))
+            self.assertEqual(sorted(self.search(lat=-1.28, lng=36.82, radius=5)), ['Centre', 'Near', 'Unplaced'])
+
+            gazetteer = os.path.join(directory, 'places.csv')
+            with open(gazetteer, 'w', encoding='utf-8') as f:
+                f.write('name,latitude,longitude\natlantis,10.5,-30.25\n')
+            call_command('geocode_listings', gazetteer, stdout=out, stderr=err)
+            self.assertEqual(Listing.objects.get(name='Far').latitude, 10.5)
+
+            with self.assertRaises(CommandError):
+                call_command('geocode_listings', os.path.join(directory, 'missing.txt'))
+
+
+class QuoteTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.listing = create_listing(pricepernight=100, weekend_price=150)
+        RateSeason.objects.create(
+            listing=self.listing, name='July', start_date=date(2030, 7, 1), end_date=date(2030, 7, 31),
+            pricepernight=200, weekend_price=250,
+        )
+        RateSeason.objects.create(
+            listing=self.listing, name='Festival', start_date=date(2030, 7, 5), end_date=date(2030, 7, 6),
+            pricepernight=400,
+        )
+
+    def quote(self, check_in, check_out, listing=None):
+        return quote_many([(listing or self.listing).pk], check_in, check_out)[(listing or self.listing).pk]
+
+    def test_weekend_and_seasonal_rates(self):
+        # Fri, Sat, Sun at base rates, then Mon-Thu in July, then the festival weekend
+        quote = self.quote(date(2030, 6, 28), date(2030, 7, 8))
+        self.assertEqual(quote['nightly'], [150, 150, 100, 200, 200, 200, 200, 400, 400, 200])
+        self.assertEqual((quote['nights'], quote['total']), (10, 2200))
+
+    def test_quotes_are_memoized_until_rates_change(self):
+        self.assertEqual(self.quote(date(2030, 7, 1), date(2030, 7, 3))['total'], 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.quote(date(2030, 7, 1), date(2030, 7, 3))['total'], 400)
+
+        season = RateSeason.objects.get(name='July')
+        season.pricepernight = 220
+        with self.captureOnCommitCallbacks(execute=True):
+            season.save()
+        self.assertEqual(self.quote(date(2030, 7, 1), date(2030, 7, 3))['total'], 440)
+
+        self.listing.pricepernight = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        self.assertEqual(self.quote(date(2030, 6, 30), date(2030, 7, 1))['total'], 90)
+
+    def test_unrelated_listing_updates_keep_quotes(self):
+        self.quote(date(2030, 7, 1), date(2030, 7, 3))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.listing.save(update_fields=['name'])
+        self.assertEqual(callbacks, [])
+
+    def test_batch_api(self):
+        other = create_listing(pricepernight=80)
+        unknown = uuid.uuid4()
+        params = {
+            'listings': f'{self.listing.pk},{other.pk},{unknown}', 'check_in': '2030-07-01', 'check_out': '2030-07-03',
+        }
+        response = self.client.get('/api/quotes/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['listing'], r['total']) for r in response.json()['results']],
+                         [(str(self.listing.pk), '400.00'), (str(other.pk), '160.00')])
+        self.assertEqual(response.json()['not_found'], [str(unknown)])
+        with self.assertNumQueries(0):
+            self.client.get('/api/quotes/', params)
+
+        response = self.client.get('/api/quotes/', dict(params, check_out='2030-12-01'))
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/quotes/', dict(params, listings='not-an-id'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_listing_quote_api_and_booking_price(self):
+        response = self.client.get(f'/api/listings/{self.listing.pk}/quote/', {
+            'check_in': '2030-06-28', 'check_out': '2030-07-01',
+        })
+        self.assertEqual(response.json()['nightly'], ['150.00', '150.00', '100.00'])
+        self.assertEqual(response.json()['total'], '400.00')
+        response = self.client.get(f'/api/listings/{uuid.uuid4()}/quote/', {
+            'check_in': '2030-06-28', 'check_out': '2030-07-01',
+        })
+        self.assertEqual(response.status_code, 404)
+
+        self.client.force_login(User.objects.create_user(username='booker'))
+        response = self.client.post('/api/bookings/', {
+            'property': str(self.listing.pk), 'check_in_date': '2030-06-28', 'check_out_date': '2030-07-01',
+        })
+        self.assertEqual(response.json()['total_amount'], '400.00')
+
+
+class BookingCreationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='booker', email='booker@example.com')
+        self.client.force_login(self.user)
+        self.listing = create_listing(pricepernight=80)
+
+    def book(self, check_in, check_out):
+        return self.client.post('/api/bookings/', {
+            'property': str(self.listing.property_id), 'check_in_date': check_in, 'check_out_date': check_out,
+        })
+
+    def test_books_nights_and_prices_server_side(self):
+        response = self.book('2030-03-01', '2030-03-04')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['total_amount'], '240.00')
+        self.assertEqual(BookedNight.objects.filter(listing=self.listing).count(), 3)
+
+    def test_rejects_overlapping_dates(self):
+        self.assertEqual(self.book('2030-03-01', '2030-03-04').status_code, 201)
+        self.assertEqual(self.book('2030-03-03', '2030-03-05').status_code, 409)
+        self.assertEqual(self.book('2030-02-27', '2030-03-01').status_code, 201)
+        self.assertEqual(self.book('2030-03-04', '2030-03-06').status_code, 201)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_cancelling_frees_the_nights(self):
+        booking_id = self.book('2030-03-01', '2030-03-04').json()['booking_id']
+        booking = Booking.objects.get(pk=booking_id)
+        booking.status = 'canceled'
+        booking.save()
+        self.assertEqual(self.book('2030-03-02', '2030-03-03').status_code, 201)
+
+    def test_database_rejects_overlap_outside_the_api(self):
+        create_booking(listing=self.listing, check_in_date=date(2030, 3, 1), nights=3)
+        with self.assertRaises(IntegrityError):
+            create_booking(listing=self.listing, check_in_date=date(2030, 3, 2), nights=1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_availability_endpoint(self):
+        self.book('2030-03-01', '2030-03-04')
+        url = f'/api/listings/{self.listing.property_id}/availability/'
+        self.assertFalse(self.client.get(url, {'check_in': '2030-03-03', 'check_out': '2030-03-05'}).json()['available'])
+        self.assertTrue(self.client.get(url, {'check_in': '2030-03-04', 'check_out': '2030-03-05'}).json()['available'])
+
+
+class PaymentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='poller'))
+        self.payment = Payment.objects.create(
+            booking_ref=create_booking(), amount=300, transaction_id='tx_cache', payment_status='processing',
+        )
+        self.url = f'/api/payments/{self.payment.payment_id}/'
+
+    def test_repeat_polls_skip_the_database(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['payment_status'], 'processing')
+        self.assertEqual([q['sql'] for q in queries if 'listings_' in q['sql']], [])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_saving_payment_or_booking_invalidates(self):
+        booking_url = f'/api/bookings/{self.payment.booking_ref_id}/payments/'
+        etag = self.client.get(self.url)['ETag']
+        self.client.get(booking_url)
+
+        self.payment.payment_status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['payment_status'], 'completed')
+        self.assertEqual(self.client.get(booking_url).json()[0]['payment_status'], 'completed')
+
+        booking = self.payment.booking_ref
+        booking.status = 'confirmed'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.client.get(self.url).json()['booking_details']['status'], 'confirmed')
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            transition(self.payment, 'completed')
+            # Until the write commits, pollers keep getting the committed status
+            self.assertEqual(self.client.get(self.url).json()['payment_status'], 'processing')
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(self.url).json()['payment_status'], 'completed')
+
+
+class BatchStatusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='dashboard'))
+        self.bookings = [create_booking() for _ in range(3)]
+        self.payments = [
+            Payment.objects.create(
+                booking_ref=booking, amount=300, transaction_id=f'tx_batch_{i}', payment_status='processing',
+            )
+            for i, booking in enumerate(self.bookings[:2])
+        ]
+
+    def get(self, url, ids, **params):
+        return self.client.get(url, {'ids': ','.join(str(pk) for pk in ids), **params})
+
+    def app_queries(self, url, ids, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(url, ids, **params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [q['sql'] for q in queries if 'listings_' in q['sql']]
+
+    def test_payment_statuses_in_request_order(self):
+        unknown = uuid.uuid4()
+        ids = [self.payments[1].pk, unknown, self.payments[0].pk]
+        body = self.get('/api/payments/status/', ids).json()
+        self.assertEqual([p['payment_id'] for p in body['results']], [str(ids[0]), str(ids[2])])
+        self.assertEqual(body['results'][0]['booking_details']['booking_id'], str(self.bookings[1].pk))
+        self.assertEqual(body['not_found'], [str(unknown)])
+
+    def test_sparse_fields(self):
+        body = self.get('/api/payments/status/', [self.payments[0].pk], fields='payment_status').json()
+        self.assertEqual(body['results'], [{'payment_id': str(self.payments[0].pk), 'payment_status': 'processing'}])
+        response = self.get('/api/payments/status/', [self.payments[0].pk], fields='payment_status,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_ids_are_bounded(self):
+        self.assertEqual(self.get('/api/payments/status/', [uuid.uuid4() for _ in range(101)]).status_code, 400)
+        self.assertEqual(self.client.get('/api/payments/status/', {'ids': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/bookings/payments/').status_code, 400)
+
+    def test_one_query_for_all_misses_then_the_cache(self):
+        ids = [payment.pk for payment in self.payments]
+        self.assertEqual(len(self.app_queries('/api/payments/status/', ids)), 1)
+        self.assertEqual(self.app_queries('/api/payments/status/', ids), [])
+        # Entries are shared with the single-payment endpoint
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/payments/{ids[0]}/')
+        self.assertEqual([q['sql'] for q in queries if 'listings_' in q['sql']], [])
+
+        self.payments[0].payment_status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payments[0].save()
+        body = self.get('/api/payments/status/', ids, fields='payment_status').json()
+        self.assertEqual([p['payment_status'] for p in body['results']], ['completed', 'processing'])
+
+    def test_bookings_payments(self):
+        Payment.objects.create(booking_ref=self.bookings[0], amount=100, transaction_id='tx_batch_extra')
+        unknown = uuid.uuid4()
+        ids = [booking.pk for booking in self.bookings] + [unknown]
+        queries = self.app_queries('/api/bookings/payments/', ids, fields='transaction_id')
+        self.assertEqual(len(queries), 2, queries)
+
+        body = self.get('/api/bookings/payments/', ids, fields='transaction_id').json()
+        self.assertEqual(
+            [(r['booking_id'], [p['transaction_id'] for p in r['payments']]) for r in body['results']],
+            [(str(self.bookings[0].pk), ['tx_batch_extra', 'tx_batch_0']),
+             (str(self.bookings[1].pk), ['tx_batch_1']),
+             (str(self.bookings[2].pk), [])],
+        )
+        self.assertEqual(body['not_found'], [str(unknown)])
+
+    def test_if_none_match_returns_304(self):
+        ids = ','.join(str(payment.pk) for payment in self.payments)
+        etag = self.client.get('/api/payments/status/', {'ids': ids})['ETag']
+        response = self.client.get('/api/payments/status/', {'ids': ids}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/payments/status/', {'ids': ids, 'fields': 'amount'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class QueryCountTests(TestCase):
+    """
+    Each read endpoint must run the same number of queries for 1 row as for many
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com')
+        self.client.force_login(self.user)
+        self.booking = create_booking(user=self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(queries)
+
+    def assertConstantQueries(self, url, add_row, rows=5):
+        add_row()
+        single = self.count_queries(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(rows - 1):
+                add_row()
+        self.assertEqual(self.count_queries(url), single, f'query count grows with rows for {url}')
+
+    def add_payment(self, booking=None):
+        return Payment.objects.create(
+            booking_ref=booking or self.booking, amount=300,
+            transaction_id=f'tx_q_{Payment.objects.count()}',
+        )
+
+    def test_booking_payments(self):
+        self.assertConstantQueries(f'/api/bookings/{self.booking.booking_id}/payments/', self.add_payment)
+
+    def test_listing_search(self):
+        self.assertConstantQueries('/api/listings/', lambda: create_listing(location='Nairobi'))
+
+    def test_payment_status_loads_nested_booking_in_one_query(self):
+        payment = self.add_payment()
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/payments/{payment.payment_id}/')
+        app_queries = [q['sql'] for q in queries if 'listings_' in q['sql']]
+        self.assertEqual(len(app_queries), 1, app_queries)
+
+
+class MetricsTests(FakeChapaTestCase):
+
+    def test_request_latency_and_queries_are_recorded(self):
+        route, labels = 'api/listings/', {'route': 'api/listings/', 'method': 'GET'}
+        requests_before = REQUEST_DURATION.count(status=200, **labels)
+        create_listing()
+        self.client.get('/api/listings/')
+        self.assertEqual(REQUEST_DURATION.count(status=200, **labels), requests_before + 1)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn(f'http_request_duration_seconds_count{{route="{route}",method="GET",status="200"}}', body)
+        self.assertIn(f'http_request_db_queries_bucket{{route="{route}",method="GET",le="+Inf"}}', body)
+        self.assertGreaterEqual(REQUEST_DB_QUERIES.count(**labels), 1)
+
+    def test_slow_requests_are_logged_with_query_breakdown(self):
+        create_listing()
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0.001), \
+                self.assertLogs('alx_travel_app.middleware', 'WARNING') as logs:
+            self.client.get('/api/listings/')
+        self.assertIn('Slow request: GET /api/listings/ 200', logs.output[0])
+        self.assertIn('1x', logs.output[0])
+        self.assertIn('SELECT "listings_listing"', logs.output[0])
+        self.assertTrue(logs.records[0].queries)
+
+    def test_chapa_calls_are_timed_by_outcome(self):
+        ok = OUTBOUND_DURATION.count(service='chapa', operation='verify', outcome='ok')
+        failed = OUTBOUND_DURATION.count(service='chapa', operation='verify', outcome='error')
+        client = ChapaClient()
+        client.verify('tx_timed')
+        client.close()
+        with self.assertRaises(ChapaError):
+            ChapaClient(base_url='http://127.0.0.1:9/v1').verify('tx_timed')
+        self.assertEqual(OUTBOUND_DURATION.count(service='chapa', operation='verify', outcome='ok'), ok + 1)
+        self.assertEqual(OUTBOUND_DURATION.count(service='chapa', operation='verify', outcome='error'), failed + 1)
+
+    def test_histogram_exposition(self):
+        histogram = Histogram('demo_seconds', 'Demo.', ('view',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, view='a"b')
+        self.assertEqual(histogram.render(), [
+            '# HELP demo_seconds Demo.',
+            '# TYPE demo_seconds histogram',
+            'demo_seconds_bucket{view="a\\"b",le="0.1"} 2',
+            'demo_seconds_bucket{view="a\\"b",le="1.0"} 3',
+            'demo_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+            'demo_seconds_sum{view="a\\"b"} 3.65',
+            'demo_seconds_count{view="a\\"b"} 4',
+        ])
+
+
+class LoggingTests(TestCase):
+
+    def make_logger(self, handler):
+        logger = logging.getLogger(f'listings.tests.{self._testMethodName}')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return logger
+
+    def test_records_are_written_as_json_with_request_id(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JSONFormatter())
+        handler = BoundedQueueHandler(handlers=[target])
+        logger = self.make_logger(handler)
+
+        token = request_id_var.set('req-1')
+        try:
+            logger.warning('Payment %s failed', 'tx_1', extra={'tx_ref': 'tx_1'})
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                logger.exception('Verification crashed')
+        finally:
+            request_id_var.reset(token)
+        handler.flush()
+
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(
+            (first['message'], first['level'], first['request_id'], first['tx_ref']),
+            ('Payment tx_1 failed', 'WARNING', 'req-1', 'tx_1'),
+        )
+        self.assertIn('ValueError: boom', second['exception'])
+
+    def test_full_queue_drops_records_instead_of_blocking(self):
+        release = threading.Event()
+        stream = io.StringIO()
+
+        class BlockedHandler(logging.StreamHandler):
+            def emit(self, record):
+                release.wait(5)
+                super().emit(record)
+
+        handler = BoundedQueueHandler(handlers=[BlockedHandler(stream)], queue_size=2)
+        logger = self.make_logger(handler)
+        dropped = LOG_RECORDS_DROPPED.value()
+
+        start = time.perf_counter()
+        for i in range(20):
+            logger.warning('record %d', i)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertGreaterEqual(handler.dropped, 15)
+        self.assertEqual(LOG_RECORDS_DROPPED.value() - dropped, handler.dropped)
+
+        release.set()
+        handler.flush()
+        logger.warning('after')
+        handler.flush()
+        self.assertIn(f'Dropped {handler.dropped} log records', stream.getvalue())
+        self.assertTrue(stream.getvalue().endswith('after\n'))
+
+    def test_request_id_header(self):
+        response = self.client.get('/api/listings/', HTTP_X_REQUEST_ID='edge-42')
+        self.assertEqual(response['X-Request-ID'], 'edge-42')
+        response = self.client.get('/api/listings/', HTTP_X_REQUEST_ID='bad id\n')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        patcher = mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_replica_only_when_requested(self):
+        self.assertEqual(self.router.db_for_read(Payment), 'default')
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Payment), 'replica')
+            self.assertEqual(self.router.db_for_write(Payment), 'default')
+        self.assertEqual(self.router.db_for_read(Payment), 'default')
+
+    def test_falls_back_to_primary_without_replica(self):
+        del settings.DATABASES['replica']
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Payment), 'default')
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, 'set DATABASE_REPLICA_NAME to test against a second database')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Run with two databases, e.g.
+    DATABASE_REPLICA_NAME=replica.sqlite3 python manage.py test listings
+    """
+    databases = '__all__'
+
+    def test_listing_reads_hit_the_replica(self):
+        host = User.objects.create_user(username='primaryhost')
+        create_listing(host, name='Primary only')
+        self.assertEqual(self.client.get('/api/listings/').json()['results'], [])
+
+        User.objects.using('replica').create(pk=host.pk, username='primaryhost')
+        Listing.objects.using('replica').create(
+            host_id=host.pk, name='Replicated', description='', location='Nairobi', pricepernight=10,
+        )
+        names = [r['name'] for r in self.client.get('/api/listings/').json()['results']]
+        self.assertEqual(names, ['Replicated'])
+
+    def test_cached_payment_payloads_are_built_from_the_primary(self):
+        user = User.objects.create_user(username='replicauser')
+        self.client.force_login(user)
+        booking = create_booking(user=user)
+        payment = Payment.objects.create(booking_ref=booking, amount=1, transaction_id='tx_replica')
+        cache.clear()
+        # The replica hasn't caught up yet; caching its miss would outlive the lag
+        self.assertEqual(self.client.get(f'/api/payments/{payment.payment_id}/').status_code, 200)
+        self.assertFalse(Payment.objects.using('replica').exists())
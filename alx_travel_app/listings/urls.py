@@ -1,14 +1,34 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import path, re_path
+from . import async_views, views
+
+# The async payment views are meant for ASGI deployments
+payment_views = async_views if settings.PAYMENT_VIEWS_ASYNC else views
 
 urlpatterns = [
     # Payment endpoints
-    path('payments/initiate/', views.PaymentInitiateView.as_view(), name='payment_initiate'),
-    path('payments/verify/', views.PaymentVerifyView.as_view(), name='payment_verify'),
-    path('payments/callback/', views.PaymentCallbackView.as_view(), name='payment_callback'),
+    path('payments/initiate/', payment_views.PaymentInitiateView.as_view(), name='payment_initiate'),
+    path('payments/verify/', payment_views.PaymentVerifyView.as_view(), name='payment_verify'),
+    path('payments/callback/', payment_views.PaymentCallbackView.as_view(), name='payment_callback'),
     path('payments/success/', views.PaymentSuccessView.as_view(), name='payment_success'),
     
     # Payment status endpoints
     path('payments/<uuid:payment_id>/', views.get_payment_status, name='payment_status'),
+    path('payments/status/', views.get_payment_statuses, name='payment_statuses'),
     path('bookings/<uuid:booking_id>/payments/', views.get_booking_payments, name='booking_payments'),
+    path('bookings/payments/', views.get_bookings_payments, name='bookings_payments'),
+    path('payments/revenue/', views.get_revenue, name='payment_revenue'),
+    
+    # Listing endpoints
+    path('listings/', views.ListingSearchView.as_view(), name='listing_search'),
+    path('listings/search/', views.search_listings_text, name='listing_text_search'),
+    path('listings/<uuid:property_id>/availability/', views.get_listing_availability, name='listing_availability'),
+    path('listings/<uuid:property_id>/quote/', views.get_listing_quote, name='listing_quote'),
+    path('quotes/', views.get_quotes, name='quotes'),
+    
+    # Booking endpoints
+    path('bookings/', views.create_booking, name='booking_create'),
+
+    # Exports
+    re_path(r'^exports/(?P<kind>bookings|payments)\.(?P<fmt>csv|ndjson)$', views.export_data, name='export'),
 ]
@@ -1,30 +1,131 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.db import router
+from django.db.models import Exists, OuterRef, Prefetch
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import generics, status
+from alx_travel_app.db_routers import read_from_replica, use_replica
 import json
-import requests
+import math
 import uuid
+from datetime import date
 from decimal import Decimal
-from .models import Booking, Payment, Listing
-from .serializers import BookingSerializer, PaymentSerializer
+from .bookings import BookingConflict, book_listing, is_available
+from .cache import (
+    booking_payments_key, conditional_response, make_entry, payment_status_key, read_through, read_through_many,
+)
+from .chapa import ChapaError, GatewayUnavailable, get_client
+from .exports import EXPORTS, FORMATS, export_rows, render as render_export
+from .geo import within_box, within_radius
+from .pricing import quote_many
+from .models import BookedNight, Booking, Payment, Listing
+from .pagination import KeysetPagination
+from .payments import transition
+from .revenue import revenue_series
+from .search import search_listings
+from .serializers import (
+    BookingCreateSerializer, BookingSerializer, ExportQuerySerializer, ListingSerializer,
+    ListingTextSearchQuerySerializer, PaymentBatchQuerySerializer, PaymentSerializer, QuoteBatchQuerySerializer, QuoteDetailSerializer,
+    QuoteQuerySerializer, QuoteSerializer, RevenuePointSerializer, RevenueQuerySerializer,
+)
+from .tasks import enqueue
+from .webhooks import InvalidWebhook, ingest
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Chapa API Configuration
-CHAPA_API_URL = "https://api.chapa.co/v1/transaction/initialize"
-CHAPA_VERIFY_URL = "https://api.chapa.co/v1/transaction/verify"
+
+def _payment_fields(booking, tx_ref):
+    return {
+        'booking_ref': booking,
+        'amount': booking.total_amount,
+        'transaction_id': tx_ref,
+        'payment_status': 'pending',
+        'payment_method': 'chapa',
+        'currency': 'ETB',
+        'payment_description': f'Payment for booking {booking.booking_id}',
+    }
+
+
+def _checkout_payload(request, booking, tx_ref):
+    return {
+        "amount": str(booking.total_amount),
+        "currency": "ETB",
+        "email": booking.user.email,
+        "first_name": booking.user.first_name,
+        "last_name": booking.user.last_name,
+        "phone_number": getattr(booking.user, 'phone_number', ''),
+        "tx_ref": tx_ref,
+        "callback_url": f"{request.build_absolute_uri('/api/payments/callback/')}",
+        "return_url": f"{request.build_absolute_uri('/api/payments/success/')}",
+        "description": f"Payment for {booking.property.name} booking",
+        "customization": {
+            "title": "ALX Travel App",
+            "description": f"Payment for {booking.property.name}"
+        }
+    }
+
+
+def _gateway_unreachable(error):
+    """Build the error response and the payment's ``(status, fields)`` transition"""
+    failed = ('failed', {'failure_reason': f'Gateway unreachable: {error}'})
+    if isinstance(error, GatewayUnavailable):
+        # Not called at all: the gateway is failing or we are over our rate
+        response = JsonResponse({
+            'success': False,
+            'error': 'Payment gateway temporarily unavailable'
+        }, status=503)
+        response['Retry-After'] = str(math.ceil(error.retry_after) or 1)
+        return response, failed
+    return JsonResponse({
+        'success': False,
+        'error': 'Failed to communicate with payment gateway'
+    }, status=500), failed
+
+
+def _initiation_response(payment, response, tx_ref):
+    """
+    Build the response for the client from Chapa's initialize ``response``
+    and the payment's ``(status, fields)`` transition
+    """
+    if response.status_code == 200:
+        chapa_response = response.json()
+
+        if chapa_response.get('status') == 'success':
+            # Record Chapa's transaction ID with the payment
+            processing = ('processing', {'chapa_transaction_id': chapa_response['data'].get('tx_ref', tx_ref)})
+
+            return JsonResponse({
+                'success': True,
+                'payment_id': str(payment.payment_id),
+                'checkout_url': chapa_response['data']['checkout_url'],
+                'tx_ref': tx_ref,
+                'message': 'Payment initiated successfully'
+            }), processing
+        else:
+            failed = ('failed', {'failure_reason': chapa_response.get('message', 'Unknown error')})
+
+            return JsonResponse({
+                'success': False,
+                'error': chapa_response.get('message', 'Payment initiation failed')
+            }, status=400), failed
+    else:
+        failed = ('failed', {'failure_reason': f'HTTP {response.status_code}: {response.text}'})
+
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to communicate with payment gateway'
+        }, status=500), failed
 
 
 class PaymentInitiateView(View):
@@ -48,82 +149,29 @@ class PaymentInitiateView(View):
                 }, status=400)
             
             # Get booking details
-            booking = get_object_or_404(Booking, booking_id=booking_id)
+            try:
+                booking = Booking.objects.select_related('user', 'property').get(booking_id=booking_id)
+            except Booking.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Booking not found'
+                }, status=404)
             
             # Generate unique transaction reference
             tx_ref = f"tx_{uuid.uuid4().hex[:16]}"
             
             # Create payment record
-            payment = Payment.objects.create(
-                booking_ref=booking,
-                amount=booking.total_amount,
-                transaction_id=tx_ref,
-                payment_status='pending',
-                payment_method='chapa',
-                currency='ETB',
-                payment_description=f'Payment for booking {booking.booking_id}'
-            )
-            
-            # Prepare Chapa payment data
-            chapa_data = {
-                "amount": str(booking.total_amount),
-                "currency": "ETB",
-                "email": booking.user.email,
-                "first_name": booking.user.first_name,
-                "last_name": booking.user.last_name,
-                "phone_number": getattr(booking.user, 'phone_number', ''),
-                "tx_ref": tx_ref,
-                "callback_url": f"{request.build_absolute_uri('/api/payments/callback/')}",
-                "return_url": f"{request.build_absolute_uri('/api/payments/success/')}",
-                "description": f"Payment for {booking.property.name} booking",
-                "customization": {
-                    "title": "ALX Travel App",
-                    "description": f"Payment for {booking.property.name}"
-                }
-            }
+            payment = Payment.objects.create(**_payment_fields(booking, tx_ref))
             
             # Make request to Chapa API
-            headers = {
-                'Authorization': f'Bearer {settings.CHAPA_SECRET_KEY}',
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(CHAPA_API_URL, json=chapa_data, headers=headers)
-            
-            if response.status_code == 200:
-                chapa_response = response.json()
-                
-                if chapa_response.get('status') == 'success':
-                    # Update payment with Chapa transaction ID
-                    payment.chapa_transaction_id = chapa_response['data']['tx_ref']
-                    payment.payment_status = 'processing'
-                    payment.save()
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'payment_id': str(payment.payment_id),
-                        'checkout_url': chapa_response['data']['checkout_url'],
-                        'tx_ref': tx_ref,
-                        'message': 'Payment initiated successfully'
-                    })
-                else:
-                    payment.payment_status = 'failed'
-                    payment.failure_reason = chapa_response.get('message', 'Unknown error')
-                    payment.save()
-                    
-                    return JsonResponse({
-                        'success': False,
-                        'error': chapa_response.get('message', 'Payment initiation failed')
-                    }, status=400)
+            try:
+                response = get_client().initialize(_checkout_payload(request, booking, tx_ref))
+            except ChapaError as e:
+                result, (new_status, fields) = _gateway_unreachable(e)
             else:
-                payment.payment_status = 'failed'
-                payment.failure_reason = f'HTTP {response.status_code}: {response.text}'
-                payment.save()
-                
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Failed to communicate with payment gateway'
-                }, status=500)
+                result, (new_status, fields) = _initiation_response(payment, response, tx_ref)
+            transition(payment, new_status, **fields)
+            return result
                 
         except Exception as e:
             logger.error(f"Payment initiation error: {str(e)}")
@@ -136,6 +184,9 @@ class PaymentInitiateView(View):
 class PaymentVerifyView(View):
     """
     API endpoint to verify payment status with Chapa
+
+    Verification runs in the background (see ``listings.tasks``); the response
+    reports the payment's current status and is 202 while it is still settling.
     """
     
     @method_decorator(csrf_exempt)
@@ -162,56 +213,19 @@ class PaymentVerifyView(View):
                     'error': 'Payment not found'
                 }, status=404)
             
-            # Verify payment with Chapa
-            verify_url = f"{CHAPA_VERIFY_URL}/{tx_ref}"
-            headers = {
-                'Authorization': f'Bearer {settings.CHAPA_SECRET_KEY}',
-                'Content-Type': 'application/json'
-            }
+            if payment.payment_status in ('pending', 'processing'):
+                enqueue('verify_payment', tx_ref, tx_ref=tx_ref)
             
-            response = requests.get(verify_url, headers=headers)
+            # Re-read in case the task ran inline (TASK_QUEUE_EAGER)
+            payment = Payment.objects.select_related('booking_ref').get(pk=payment.pk)
+            settled = payment.payment_status not in ('pending', 'processing')
             
-            if response.status_code == 200:
-                chapa_response = response.json()
-                
-                if chapa_response.get('status') == 'success':
-                    payment_data = chapa_response['data']
-                    
-                    # Update payment status based on Chapa response
-                    if payment_data.get('status') == 'success':
-                        payment.payment_status = 'completed'
-                        payment.payment_date = timezone.now()
-                        
-                        # Update booking status
-                        booking = payment.booking_ref
-                        booking.status = 'confirmed'
-                        booking.save()
-                        
-                        # Send confirmation email (you can use Celery for background task)
-                        self.send_confirmation_email(payment)
-                        
-                    elif payment_data.get('status') == 'failed':
-                        payment.payment_status = 'failed'
-                        payment.failure_reason = payment_data.get('message', 'Payment failed')
-                    
-                    payment.save()
-                    
-                    return JsonResponse({
-                        'success': True,
-                        'payment_status': payment.payment_status,
-                        'booking_status': payment.booking_ref.status,
-                        'message': 'Payment status updated successfully'
-                    })
-                else:
-                    return JsonResponse({
-                        'success': False,
-                        'error': chapa_response.get('message', 'Verification failed')
-                    }, status=400)
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Failed to verify payment'
-                }, status=500)
+            return JsonResponse({
+                'success': True,
+                'payment_status': payment.payment_status,
+                'booking_status': payment.booking_ref.status,
+                'message': 'Payment status updated successfully' if settled else 'Payment verification queued'
+            }, status=200 if settled else 202)
                 
         except Exception as e:
             logger.error(f"Payment verification error: {str(e)}")
@@ -219,43 +233,6 @@ class PaymentVerifyView(View):
                 'success': False,
                 'error': 'Internal server error'
             }, status=500)
-    
-    def send_confirmation_email(self, payment):
-        """
-        Send confirmation email to user
-        """
-        try:
-            booking = payment.booking_ref
-            subject = f'Booking Confirmation - {booking.property.name}'
-            message = f"""
-            Dear {booking.user.first_name},
-            
-            Your booking has been confirmed!
-            
-            Booking Details:
-            - Property: {booking.property.name}
-            - Location: {booking.property.location}
-            - Check-in: {booking.check_in_date}
-            - Check-out: {booking.check_out_date}
-            - Total Amount: ETB {payment.amount}
-            - Payment ID: {payment.payment_id}
-            
-            Thank you for choosing ALX Travel App!
-            
-            Best regards,
-            ALX Travel Team
-            """
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [booking.user.email],
-                fail_silently=False,
-            )
-            
-        except Exception as e:
-            logger.error(f"Failed to send confirmation email: {str(e)}")
 
 
 class PaymentCallbackView(View):
@@ -269,21 +246,12 @@ class PaymentCallbackView(View):
     
     def post(self, request):
         try:
-            data = json.loads(request.body)
-            tx_ref = data.get('tx_ref')
-            
-            if tx_ref:
-                # Verify payment automatically
-                verify_view = PaymentVerifyView()
-                verify_request = type('Request', (), {
-                    'body': json.dumps({'tx_ref': tx_ref}).encode(),
-                    'method': 'POST'
-                })()
-                
-                verify_view.post(verify_request)
-            
+            # Store the event and acknowledge; run_tasks verifies the payment
+            ingest(request.body, request.headers)
             return JsonResponse({'success': True})
-            
+
+        except InvalidWebhook as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         except Exception as e:
             logger.error(f"Payment callback error: {str(e)}")
             return JsonResponse({'success': False}, status=500)
@@ -304,10 +272,14 @@ def get_payment_status(request, payment_id):
     """
     Get payment status by payment ID
     """
+    def build():
+        payments = PaymentSerializer.setup_eager_loading(Payment.objects.all())
+        payment = get_object_or_404(payments, payment_id=payment_id)
+        return PaymentSerializer(payment).data
+
     try:
-        payment = get_object_or_404(Payment, payment_id=payment_id)
-        serializer = PaymentSerializer(payment)
-        return Response(serializer.data)
+        entry = read_through(payment_status_key(payment_id), build)
+        return conditional_response(request, entry)
     except Exception as e:
         return Response({
             'error': 'Payment not found'
@@ -320,15 +292,335 @@ def get_booking_payments(request, booking_id):
     """
     Get all payments for a specific booking
     """
-    try:
+    def build():
         booking = get_object_or_404(Booking, booking_id=booking_id)
-        payments = Payment.objects.filter(booking_ref=booking)
-        serializer = PaymentSerializer(payments, many=True)
-        return Response(serializer.data)
+        payments = PaymentSerializer.setup_eager_loading(Payment.objects.filter(booking_ref=booking))
+        return PaymentSerializer(payments, many=True).data
+
+    try:
+        entry = read_through(booking_payments_key(booking_id), build)
+        return conditional_response(request, entry)
     except Exception as e:
         return Response({
             'error': 'Booking not found'
         }, status=status.HTTP_404_NOT_FOUND)
 
 
-# Create your views here.
+def _sparse(payment, fields):
+    """``payment`` trimmed to ``fields``, all of it when None"""
+    return payment if fields is None else {field: payment[field] for field in fields}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_payment_statuses(request):
+    """
+    Get the status of many payments at once, e.g. for a dashboard
+
+    Query parameters:
+        ids: comma-separated payment ids, up to 100
+        fields: comma-separated payment fields to return, default all;
+            leaving out booking_details makes the response much smaller
+    """
+    serializer = PaymentBatchQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    ids, fields = serializer.validated_data['ids'], serializer.validated_data.get('fields')
+
+    def build(missing):
+        payments = PaymentSerializer.setup_eager_loading(Payment.objects.filter(payment_id__in=missing))
+        return {payment.pk: PaymentSerializer(payment).data for payment in payments}
+
+    entries = read_through_many({pk: payment_status_key(pk) for pk in ids}, build)
+    return conditional_response(request, make_entry({
+        'results': [_sparse(entries[pk]['data'], fields) for pk in ids if pk in entries],
+        'not_found': [pk for pk in ids if pk not in entries],
+    }))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_bookings_payments(request):
+    """
+    Get the payments of many bookings at once
+
+    Query parameters:
+        ids: comma-separated booking ids, up to 100
+        fields: comma-separated payment fields to return, default all
+    """
+    serializer = PaymentBatchQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    ids, fields = serializer.validated_data['ids'], serializer.validated_data.get('fields')
+
+    def build(missing):
+        payments = PaymentSerializer.setup_eager_loading(Payment.objects.all())
+        bookings = Booking.objects.filter(booking_id__in=missing).prefetch_related(Prefetch('payments', payments))
+        return {booking.pk: PaymentSerializer(booking.payments.all(), many=True).data for booking in bookings}
+
+    entries = read_through_many({pk: booking_payments_key(pk) for pk in ids}, build)
+    return conditional_response(request, make_entry({
+        'results': [
+            {'booking_id': pk, 'payments': [_sparse(payment, fields) for payment in entries[pk]['data']]}
+            for pk in ids if pk in entries
+        ],
+        'not_found': [pk for pk in ids if pk not in entries],
+    }))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_revenue(request):
+    """
+    Revenue time series from the hourly or daily rollups
+
+    Query parameters:
+        granularity: hour or day (default)
+        start / end: YYYY-MM-DD, UTC days, inclusive
+        currency / payment_method / listing: optional filters
+    """
+    serializer = RevenueQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    with use_replica():
+        results = revenue_series(
+            params['granularity'], params['start'], params['end'],
+            currency=params.get('currency'), payment_method=params.get('payment_method'),
+            listing_id=params.get('listing'),
+        )
+    return Response({
+        'granularity': params['granularity'],
+        'start': params['start'],
+        'end': params['end'],
+        'results': RevenuePointSerializer(results, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, kind, fmt):
+    """
+    Stream every booking or payment as CSV or NDJSON
+
+    Query parameters:
+        start / end: YYYY-MM-DD, UTC creation days, inclusive
+        status: comma-separated statuses to include
+    """
+    model, status_field, _ = EXPORTS[kind]
+    serializer = ExportQuerySerializer(data=request.query_params, context={
+        'statuses': [value for value, _ in model._meta.get_field(status_field).choices],
+    })
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    with use_replica():
+        # Rows are read after the view returns, outside this block
+        db = router.db_for_read(model)
+    rows = export_rows(kind, params.get('start'), params.get('end'), params.get('status'), using=db)
+    response = StreamingHttpResponse(render_export(kind, rows, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+class ListingSearchView(generics.ListAPIView):
+    """
+    Search listings by location, nightly price range and availability
+
+    Query parameters:
+        location: exact location
+        lat / lng / radius: within ``radius`` km of a point (see ``listings.geo``)
+        bbox: south,west,north,east in degrees; west > east crosses the antimeridian
+        min_price / max_price: nightly price bounds (inclusive)
+        min_rating: minimum average review rating
+        check_in / check_out: YYYY-MM-DD; listings with any booked night
+            in the range are excluded
+        ordering: one of ``keyset_orderings``
+        cursor / page_size: keyset pagination (see ``KeysetPagination``)
+    """
+    serializer_class = ListingSerializer
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    keyset_orderings = ('-created_at', 'pricepernight', '-pricepernight', '-avg_rating', 'distance')
+    max_radius_km = 500
+
+    @method_decorator(read_from_replica)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        listings = Listing.objects.all()
+
+        if params.get('location'):
+            listings = listings.filter(location=params['location'])
+
+        listings = self.filter_area(listings)
+        if params.get('ordering') == 'distance' and 'distance' not in listings.query.annotations:
+            raise ValidationError({'ordering': 'Ordering by distance needs lat, lng and radius'})
+
+        min_price = self.parse_param('min_price', Decimal)
+        max_price = self.parse_param('max_price', Decimal)
+        if min_price is not None:
+            listings = listings.filter(pricepernight__gte=min_price)
+        if max_price is not None:
+            listings = listings.filter(pricepernight__lte=max_price)
+
+        min_rating = self.parse_param('min_rating', Decimal)
+        if min_rating is not None:
+            listings = listings.filter(avg_rating__gte=min_rating)
+
+        check_in = self.parse_param('check_in', date.fromisoformat)
+        check_out = self.parse_param('check_out', date.fromisoformat)
+        if (check_in is None) != (check_out is None):
+            raise ValidationError({'check_out': 'check_in and check_out must be given together'})
+        if check_in is not None:
+            if check_out <= check_in:
+                raise ValidationError({'check_out': 'Must be after check_in'})
+            booked = BookedNight.objects.filter(
+                listing=OuterRef('pk'), night__gte=check_in, night__lt=check_out,
+            )
+            listings = listings.filter(~Exists(booked))
+
+        return listings
+
+    def filter_area(self, listings):
+        params = self.request.query_params
+        if params.get('bbox'):
+            box = self.parse_param('bbox', lambda value: [float(part) for part in value.split(',')])
+            if len(box) != 4 or not all(map(math.isfinite, box)):
+                raise ValidationError({'bbox': 'Must be south,west,north,east'})
+            south, west, north, east = box
+            if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+                raise ValidationError({'bbox': 'Must be south,west,north,east within -90..90 and -180..180'})
+            listings = within_box(listings, south, west, north, east)
+
+        point = [self.parse_param(name, float) for name in ('lat', 'lng', 'radius')]
+        if any(value is not None for value in point):
+            if any(value is None for value in point):
+                raise ValidationError({'radius': 'lat, lng and radius must be given together'})
+            latitude, longitude, radius = point
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValidationError({'lat': 'Coordinates out of range'})
+            if not 0 < radius <= self.max_radius_km:
+                raise ValidationError({'radius': f'Must be between 0 and {self.max_radius_km} km'})
+            listings = within_radius(listings, latitude, longitude, radius)
+        return listings
+
+    def parse_param(self, name, parse):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return parse(value)
+        except (ValueError, ArithmeticError):
+            raise ValidationError({name: f'Invalid value: {value}'})
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_listings_text(request):
+    """
+    Full-text search over listing names, locations and descriptions
+
+    Query parameters:
+        q: words to find; each must match the start of a word
+        limit / offset: page of the ranked results, best first
+    """
+    serializer = ListingTextSearchQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    with use_replica():
+        ids = search_listings(params['q'], limit=params['limit'], offset=params['offset'])
+        listings = Listing.objects.in_bulk(ids)
+    return Response({
+        'query': params['q'],
+        'results': ListingSerializer([listings[pk] for pk in ids if pk in listings], many=True).data,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_booking(request):
+    """
+    Book a listing for the authenticated user
+    """
+    serializer = BookingCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    try:
+        booking = book_listing(request.user, data['property'], data['check_in_date'], data['check_out_date'])
+    except Listing.DoesNotExist:
+        return Response({
+            'error': 'Listing not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except BookingConflict as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_409_CONFLICT)
+    return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_listing_availability(request, property_id):
+    """
+    Check whether a listing is free between check_in and check_out
+    """
+    with use_replica():
+        listing = get_object_or_404(Listing, property_id=property_id)
+    serializer = BookingCreateSerializer(data={
+        'property': property_id,
+        'check_in_date': request.query_params.get('check_in'),
+        'check_out_date': request.query_params.get('check_out'),
+    })
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    with use_replica():
+        available = is_available(listing, data['check_in_date'], data['check_out_date'])
+    return Response({
+        'property_id': str(listing.property_id),
+        'check_in': data['check_in_date'],
+        'check_out': data['check_out_date'],
+        'available': available,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_listing_quote(request, property_id):
+    """
+    Price a stay at a listing, night by night
+
+    Query parameters:
+        check_in / check_out: YYYY-MM-DD
+    """
+    serializer = QuoteQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    with use_replica():
+        quote = quote_many([property_id], params['check_in'], params['check_out']).get(property_id)
+    if quote is None:
+        return Response({
+            'error': 'Listing not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response(QuoteDetailSerializer(quote).data)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_quotes(request):
+    """
+    Price one stay at many listings, e.g. a page of search results
+
+    Query parameters:
+        listings: comma-separated listing ids, up to 100
+        check_in / check_out: YYYY-MM-DD
+    """
+    serializer = QuoteBatchQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    with use_replica():
+        quotes = quote_many(params['listings'], params['check_in'], params['check_out'])
+    return Response({
+        'check_in': params['check_in'],
+        'check_out': params['check_out'],
+        'results': QuoteSerializer([quotes[pk] for pk in params['listings'] if pk in quotes], many=True).data,
+        'not_found': [pk for pk in params['listings'] if pk not in quotes],
+    })
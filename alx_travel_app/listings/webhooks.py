@@ -0,0 +1,116 @@
+"""
+Webhook ingestion for Chapa payment callbacks.
+
+A callback is stored as a ``WebhookEvent`` with a single
+``INSERT ... ON CONFLICT DO NOTHING`` and acknowledged straight away;
+gateway retries of the same event hit the (tx_ref, signature) constraint
+and cost nothing more. ``process_webhook_events``, run by ``run_tasks``,
+works through stored events in arrival order and queues one
+``verify_payment`` per payment, however many events it received.
+"""
+import hashlib
+import hmac
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+from .tasks import enqueue_many
+
+SIGNATURE_HEADERS = ('X-Chapa-Signature', 'Chapa-Signature')
+
+
+class InvalidWebhook(Exception):
+    """Raised for callbacks that are malformed or fail signature checks"""
+
+
+def check_signature(body, headers):
+    """
+    Verify the Chapa signature headers when ``CHAPA_WEBHOOK_SECRET`` is set
+
+    ``X-Chapa-Signature`` is the HMAC-SHA256 of the body and
+    ``Chapa-Signature`` the HMAC-SHA256 of the secret, both keyed with it.
+    """
+    secret = settings.CHAPA_WEBHOOK_SECRET
+    if not secret:
+        return
+    key = secret.encode()
+    expected = {
+        'X-Chapa-Signature': hmac.new(key, body, hashlib.sha256).hexdigest(),
+        'Chapa-Signature': hmac.new(key, key, hashlib.sha256).hexdigest(),
+    }
+    if not any(
+        hmac.compare_digest(headers.get(header, ''), expected[header])
+        for header in SIGNATURE_HEADERS if headers.get(header)
+    ):
+        raise InvalidWebhook('Invalid webhook signature')
+
+
+def _event_from_callback(body, headers):
+    check_signature(body, headers)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise InvalidWebhook('Callback body is not JSON')
+    tx_ref = (data.get('tx_ref') or data.get('trx_ref')) if isinstance(data, dict) else None
+    if not tx_ref:
+        raise InvalidWebhook('tx_ref is required')
+
+    # The body signature when Chapa sends one, else a digest of the body:
+    # both are stable across retries of the same event.
+    signature = headers.get('X-Chapa-Signature') or hashlib.sha256(body).hexdigest()
+    return WebhookEvent(
+        tx_ref=str(tx_ref)[:255], signature=signature[:128],
+        event=str(data.get('event') or data.get('status') or '')[:50], payload=data,
+    )
+
+
+def ingest(body, headers):
+    """Store the callback in ``body``; duplicates are dropped by the database"""
+    event = _event_from_callback(body, headers)
+    WebhookEvent.objects.bulk_create([event], ignore_conflicts=True)
+    if settings.TASK_QUEUE_EAGER:
+        process_webhook_events()
+    return event.tx_ref
+
+
+async def aingest(body, headers):
+    """Async version of ``ingest``"""
+    event = _event_from_callback(body, headers)
+    await WebhookEvent.objects.abulk_create([event], ignore_conflicts=True)
+    if settings.TASK_QUEUE_EAGER:
+        await sync_to_async(process_webhook_events)()
+    return event.tx_ref
+
+
+def process_webhook_events(limit=500):
+    """
+    Handle up to ``limit`` stored events, oldest first; returns how many
+
+    Events of a payment that is still open queue its verification; events
+    for unknown or already settled payments are marked ignored. Claiming
+    is a conditional update, so concurrent workers can share the table.
+    """
+    events = list(
+        WebhookEvent.objects.filter(status='received').order_by('pk').values_list('pk', 'tx_ref')[:limit]
+    )
+    if not events:
+        return 0
+
+    tx_refs = {tx_ref for _, tx_ref in events}
+    open_payments = set(
+        Payment.objects.filter(transaction_id__in=tx_refs, payment_status__in=['pending', 'processing'])
+        .values_list('transaction_id', flat=True)
+    )
+    processed = [pk for pk, tx_ref in events if tx_ref in open_payments]
+    ignored = [pk for pk, tx_ref in events if tx_ref not in open_payments]
+
+    now = timezone.now()
+    with transaction.atomic():
+        enqueue_many('verify_payment', {tx_ref: {'tx_ref': tx_ref} for tx_ref in sorted(open_payments)})
+        WebhookEvent.objects.filter(pk__in=processed, status='received').update(status='processed', processed_at=now)
+        WebhookEvent.objects.filter(pk__in=ignored, status='received').update(status='ignored', processed_at=now)
+    return len(events)
@@ -52,6 +52,7 @@ def main():
         'djangorestframework',
         'python-dotenv',
         'requests',
+        'httpx',
         'django-chapa'
     ]
     
@@ -11,8 +11,8 @@ import json
 import requests
 from datetime import date, timedelta
 
-# Add the project directory to the Python path
-sys.path.append('/home/cyanide/alx_proDev/alx_travel_app_0x02/alx_travel_app')
+# Add the project directory (this script's directory) to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Configure Django settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_travel_app.settings')